@@ -0,0 +1,557 @@
+import os
+import sys
+import time
+import random
+import argparse
+
+import fixture_site
+
+
+def timed(func, *args, repeat=1):
+    """Best wall time of `repeat` runs and the last result."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def count_round_trips(driver):
+    """Wrap driver.execute so every WebDriver command (including WebElement ones) is counted."""
+    counter = {"calls": 0}
+    execute = driver.execute
+
+    def counting_execute(*args, **kwargs):
+        counter["calls"] += 1
+        return execute(*args, **kwargs)
+
+    driver.execute = counting_execute
+    return counter
+
+
+def legacy_skroutz_cards(products):
+    """The per-element extraction the Skroutz card loop used before batching."""
+    from selenium.webdriver.common.by import By
+    import project
+
+    rows = []
+    for product in products:
+        title = None
+        for selector in project.SKROUTZ_TITLE_SELECTORS:
+            try:
+                title = product.find_element(By.XPATH, selector).text.strip()
+                if title:
+                    break
+            except Exception:
+                continue
+        price_text = None
+        for selector in project.SKROUTZ_PRICE_SELECTORS:
+            try:
+                price_text = product.find_element(By.XPATH, selector).text.strip()
+                if price_text:
+                    break
+            except Exception:
+                continue
+        link = None
+        for selector in project.SKROUTZ_LINK_SELECTORS:
+            try:
+                link = product.find_element(By.XPATH, selector).get_attribute("href")
+                if link and project.is_valid_product_link(link):
+                    break
+            except Exception:
+                continue
+        image_url = None
+        for selector in project.SKROUTZ_IMAGE_SELECTORS:
+            for image in product.find_elements(By.XPATH, selector):
+                src = image.get_attribute("src")
+                if src and ('scdn.gr' in src or 'skroutz.gr' in src) and not src.endswith('.png'):
+                    width = image.get_attribute("width")
+                    height = image.get_attribute("height")
+                    if width and height and int(width) > 50 and int(height) > 50:
+                        image_url = src
+                        break
+                data_src = image.get_attribute("data-src")
+                if not image_url and data_src and ('scdn.gr' in data_src or 'skroutz.gr' in data_src):
+                    image_url = data_src
+                    break
+            if image_url:
+                break
+        rows.append((title, price_text, link, image_url))
+    return rows
+
+
+def bench_skroutz_cards(args):
+    """Round trips and wall time: per-element card loop vs one batched execute_script."""
+    from selenium import webdriver
+    from selenium.webdriver.common.by import By
+    import driver_pool
+    import project
+
+    server, base_url = fixture_site.serve()
+    driver = webdriver.Firefox(options=driver_pool.skroutz_options())
+    try:
+        driver.get(f"{base_url}/skroutz/skoop?keyphrase=iphone")
+        products = driver.find_elements(By.XPATH, "//li[contains(@class, 'sku-card')]")
+        counter = count_round_trips(driver)
+
+        counter["calls"] = 0
+        legacy_time, _ = timed(legacy_skroutz_cards, products, repeat=args.repeat)
+        legacy_calls = counter["calls"] // args.repeat
+
+        def batched(cards):
+            return driver.execute_script(
+                project.SKROUTZ_CARDS_SCRIPT, cards,
+                project.SKROUTZ_TITLE_SELECTORS, project.SKROUTZ_PRICE_SELECTORS,
+                project.SKROUTZ_LINK_SELECTORS, project.SKROUTZ_IMAGE_SELECTORS
+            )
+
+        counter["calls"] = 0
+        batched_time, _ = timed(batched, products, repeat=args.repeat)
+        batched_calls = counter["calls"] // args.repeat
+    finally:
+        driver.quit()
+        server.shutdown()
+
+    print(f"{len(products)} cards")
+    print(f"per-element: {legacy_calls:5d} round trips  {legacy_time * 1000:8.1f} ms")
+    print(f"batched:     {batched_calls:5d} round trips  {batched_time * 1000:8.1f} ms")
+
+
+# Bytes μεταφοράς (έγγραφο + πόροι) και χρόνος DOMContentLoaded της τρέχουσας σελίδας
+PAGE_WEIGHT_SCRIPT = """
+    const navigation = performance.getEntriesByType('navigation')[0];
+    const resources = performance.getEntriesByType('resource');
+    return {
+        bytes: navigation.transferSize + resources.reduce((total, entry) => total + entry.transferSize, 0),
+        requests: resources.length + 1,
+        readyMs: navigation.domContentLoadedEventEnd
+    };
+"""
+
+FIXTURE_PAGES = {
+    "skroutz": "/skroutz/skoop?keyphrase=iphone",
+    "vendora": "/vendora/items?q=iphone",
+    "facebook": "/facebook/marketplace/athens/search?query=iphone",
+}
+
+
+def page_weight(builder, allow, url, repeat):
+    """Median bytes/requests/ready time of `repeat` cold loads with the given profile."""
+    from selenium import webdriver
+
+    options = builder(allow=allow)
+    # Χωρίς cache, ώστε κάθε φόρτωση να μετράει όλα τα bytes
+    options.set_preference("browser.cache.disk.enable", False)
+    options.set_preference("browser.cache.memory.enable", False)
+    driver = webdriver.Firefox(options=options)
+    try:
+        samples = []
+        for _ in range(repeat):
+            driver.get("about:blank")
+            driver.get(url)
+            samples.append(driver.execute_script(PAGE_WEIGHT_SCRIPT))
+    finally:
+        driver.quit()
+    samples.sort(key=lambda sample: sample["readyMs"])
+    return samples[len(samples) // 2]
+
+
+def bench_page_weight(args):
+    """Bytes transferred and page-ready time per source: full profile vs resource-blocking profile."""
+    import driver_pool
+
+    server, base_url = fixture_site.serve()
+    try:
+        for source, path in FIXTURE_PAGES.items():
+            builder = driver_pool.PROFILES[source][0]
+            for label, allow in (("full", driver_pool.BLOCKABLE), ("blocking", None)):
+                sample = page_weight(builder, allow, base_url + path, args.repeat)
+                print(f"{source:8s} {label:8s} {sample['bytes'] / 1024:8.1f} KiB  "
+                      f"{sample['requests']:3d} requests  {sample['readyMs']:7.1f} ms to DOMContentLoaded")
+    finally:
+        server.shutdown()
+
+
+def bench_concurrency(args):
+    """Searches per second at 1/10/50 concurrent searches: thread-per-source vs asyncio orchestration.
+
+    Skroutz and Vendora go over the HTTP engine, so the numbers measure the
+    orchestration itself rather than how many Firefox instances fit in memory.
+    The marketplace rate limit is off for the same reason.
+    """
+    import asyncio
+    import threading
+
+    server, base_url = fixture_site.serve()
+    fixture_site.point_scrapers_at(base_url)
+    os.environ["SKROUTZ_ENGINE"] = os.environ["VENDORA_ENGINE"] = "http"
+    # Το fixture site δεν χρειάζεται προστασία· με το rate limit το αποτέλεσμα θα ήταν απλώς το RATE_LIMIT_SKROUTZ
+    os.environ["RATE_LIMIT"] = "0"
+    import project
+
+    sources = ["skroutz", "vendora"]
+
+    def threaded(concurrency):
+        threads = [
+            threading.Thread(target=project.search_sources_threaded, args=("iphone", 0.0, 10000.0), kwargs={"sources": sources})
+            for _ in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def asynchronous(concurrency):
+        async def run():
+            await asyncio.gather(*(
+                project.search_sources_async("iphone", 0.0, 10000.0, sources=sources)
+                for _ in range(concurrency)
+            ))
+        asyncio.run(run())
+
+    try:
+        for concurrency in (1, 10, 50):
+            for label, run in (("threads", threaded), ("asyncio", asynchronous)):
+                elapsed, _ = timed(run, concurrency, repeat=args.repeat)
+                print(f"{concurrency:3d} concurrent  {label:8s} {elapsed * 1000:8.1f} ms  {concurrency / elapsed:7.1f} searches/s")
+    finally:
+        server.shutdown()
+
+
+def bench_pages(args):
+    """Wall time vs maxPages for Skroutz/Vendora over HTTP: pages 2..N one by one vs concurrently."""
+    server, base_url = fixture_site.serve()
+    fixture_site.point_scrapers_at(base_url)
+    os.environ["SKROUTZ_ENGINE"] = os.environ["VENDORA_ENGINE"] = "http"
+    # Το fixture site δεν χρειάζεται προστασία· με το rate limit το αποτέλεσμα θα ήταν απλώς το RATE_LIMIT_SKROUTZ
+    os.environ["RATE_LIMIT"] = "0"
+    import project
+
+    default_concurrency = project.PAGE_CONCURRENCY
+    try:
+        # Το fixture site έχει PAGES σελίδες, οπότε το τελευταίο maxPages δείχνει και το early stop
+        for max_pages in range(1, fixture_site.PAGES + 3):
+            for label, concurrency in (("sequential", 1), ("concurrent", default_concurrency)):
+                project.PAGE_CONCURRENCY = concurrency
+                elapsed, products = timed(
+                    project.search_sources, "iphone", 0, 10000, max_pages, None, ["skroutz", "vendora"],
+                    repeat=args.repeat
+                )
+                print(f"maxPages={max_pages}  {label:10s} {elapsed * 1000:8.1f} ms  {len(products):4d} products")
+    finally:
+        project.PAGE_CONCURRENCY = default_concurrency
+        server.shutdown()
+
+
+def legacy_extract_price(text):
+    """The extract_price that Skroutz/Facebook used before the prices module."""
+    if not text:
+        return None
+    text = text.strip()
+    text = text.replace('€', '').replace('ευρώ', '').strip()
+    if '.' in text and ',' not in text:
+        text = text.replace('.', '')
+    elif '.' in text and ',' in text:
+        if text.rindex('.') < text.rindex(','):
+            text = text.replace('.', '').replace(',', '.')
+        else:
+            text = text.replace(',', '')
+    elif ',' in text:
+        text = text.replace(',', '.')
+    try:
+        return float(text)
+    except (ValueError, TypeError):
+        return None
+
+
+# Κείμενα τιμών όπως εμφανίζονται στις πηγές, με την αναμενόμενη τιμή
+PRICE_CORPUS = [
+    ("150 €", 150.0),
+    ("1.234,56 €", 1234.56),
+    ("1.500 €", 1500.0),
+    ("€1,200", 1200.0),
+    ("12,50 €", 12.5),
+    ("12.50 €", 12.5),
+    ("1 500 €", 1500.0),
+    ("από 50 €", 50.0),
+    ("Από 1.099,00 €", 1099.0),
+    ("50-80 €", 50.0),
+    ("50 € - 80 €", 50.0),
+    ("από 50 έως 80 ευρώ", 50.0),
+    ("Δωρεάν", 0.0),
+    ("FREE", 0.0),
+    ("2 τεμ. 35 €", 35.0),
+    ("$120", 120.0),
+    ("90€", 90.0),
+    ("", None),
+    ("Τιμή κατόπιν επικοινωνίας", None),
+]
+
+
+def random_price_text(rng):
+    """A random amount written the way one of the marketplaces might, and the amount it stands for."""
+    amount = rng.choice((rng.randint(0, 99), rng.randint(100, 999_999), round(rng.uniform(0, 5000), 2)))
+    whole, cents = divmod(round(amount * 100), 100)
+    grouped = f"{whole:,}"
+    style = rng.choice(("greek", "english", "plain", "space"))
+    if style == "greek":
+        number = grouped.replace(",", ".") + (f",{cents:02d}" if cents else "")
+    elif style == "english":
+        number = grouped + (f".{cents:02d}" if cents else "")
+    elif style == "space":
+        number = grouped.replace(",", "\u00a0") + (f",{cents:02d}" if cents else "")
+    else:
+        number = str(whole) + (f",{cents:02d}" if cents else "")
+    template = rng.choice(("{} €", "€{}", "{}€", "{} ευρώ", "από {} €", "{} - {high} €"))
+    return template.format(number, high=whole + 10), whole + cents / 100
+
+
+def bench_prices(args):
+    """Correctness over the corpus + random formats, then per-text vs batch parsing against the old extract_price.
+
+    Exits with status 1, before timing anything, when the prices module misreads any of them.
+    """
+    import prices
+
+    rng = random.Random(args.seed)
+    generated = [random_price_text(rng) for _ in range(args.count)]
+    for label, parse in (("legacy", legacy_extract_price), ("prices", prices.parse_price)):
+        corpus_ok = sum(parse(text) == expected for text, expected in PRICE_CORPUS)
+        generated_ok = sum(parse(text) is not None and abs(parse(text) - expected) < 0.005 for text, expected in generated)
+        print(f"{label:8s} corpus {corpus_ok:3d}/{len(PRICE_CORPUS)}  random {generated_ok:6d}/{len(generated)}")
+
+    # Το corpus ελέγχεται και μέσω του parse(): το parse_price έχει δικό του fast path
+    mismatches = [(text, expected, prices.parse_price(text)) for text, expected in PRICE_CORPUS
+                  if prices.parse_price(text) != expected or (prices.parse(text) or prices.Price(None)).amount != expected]
+    mismatches += [(text, expected, prices.parse_price(text)) for text, expected in generated
+                   if prices.parse_price(text) is None or abs(prices.parse_price(text) - expected) >= 0.005]
+    for text, expected, parsed in mismatches[:10]:
+        print(f"  mismatch: {text!r} expected {expected} got {parsed}")
+    if mismatches:
+        sys.exit(f"prices: {len(mismatches)} mismatches")
+
+    # Σελίδες αγγελιών επαναλαμβάνουν τιμές, οπότε το batch μετριέται και σε δείγμα με επαναλήψεις
+    texts = [text for text, _ in generated]
+    repeated = [rng.choice(texts[:50]) for _ in texts]
+    for sample_label, sample in (("distinct", texts), ("repeated", repeated)):
+        for label, run in (
+            ("legacy", lambda: [legacy_extract_price(text) for text in sample]),
+            ("parse_price", lambda: [prices.parse_price(text) for text in sample]),
+            ("parse_prices", lambda: prices.parse_prices(sample)),
+        ):
+            elapsed, _ = timed(run, repeat=args.repeat)
+            print(f"{sample_label:8s} {label:12s} {elapsed * 1000:8.1f} ms  {elapsed / len(sample) * 1e6:6.2f} µs/price")
+
+
+def legacy_safe_print(message):
+    """The safe_print the scrapers used for every log line before the logs module."""
+    try:
+        print(message, file=sys.stderr)
+    except Exception:
+        try:
+            print(str(message).encode('utf-8', errors='replace').decode('utf-8'), file=sys.stderr)
+        except Exception:
+            pass
+
+
+def bench_logging(args):
+    """Logging cost of a result set: the old per-item safe_print lines vs sampled ItemLog at INFO/DEBUG."""
+    import logs
+
+    items = [(f"Προϊόν {index}", f"{index},50 €", float(index) + 0.5, f"https://example.com/items/{index}") for index in range(args.items)]
+
+    def legacy():
+        # Skroutz JS fallback: 4 γραμμές ανά προϊόν· Facebook: μία ανά προσθήκη και ξανά όλα στο τέλος
+        for title, price_text, price, link in items:
+            legacy_safe_print(f"Debug - Τιμή κειμένου: {price_text}")
+            legacy_safe_print(f"Debug - Εξαγμένη τιμή: {price}, Τύπος: {type(price)}")
+            legacy_safe_print(f"Debug - min_price: {0.0}, Τύπος: {type(0.0)}")
+            legacy_safe_print(f"Debug - max_price: {10000.0}, Τύπος: {type(10000.0)}")
+            legacy_safe_print(f"  ✅ Προστέθηκε: {title} - {price}€")
+        legacy_safe_print(f"\n📊 Συνολικά βρέθηκαν {len(items)} προϊόντα")
+        for index, (title, _, price, link) in enumerate(items, 1):
+            legacy_safe_print(f"{index}. {title} - {price}€ - {link}")
+
+    def structured():
+        logger = logs.get_logger("bench")
+        item_log = logs.ItemLog(logger)
+        for title, price_text, price, link in items:
+            item_log("Τιμή κειμένου %r -> %s (εύρος %s-%s)", price_text, price, 0.0, 10000.0)
+            item_log("Προστέθηκε: %s - %s€", title, price)
+        logger.info("Βρέθηκαν %d προϊόντα", len(items))
+
+    stderr = sys.stderr
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        sys.stderr = devnull
+        try:
+            legacy_time, _ = timed(legacy, repeat=args.repeat)
+            timings = []
+            for level in ("INFO", "DEBUG"):
+                for fmt in ("text", "json"):
+                    logs.configure(level=level, fmt=fmt, stream=devnull)
+                    timings.append((f"logs {level.lower()}/{fmt}", timed(structured, repeat=args.repeat)[0]))
+        finally:
+            sys.stderr = stderr
+            logs.configure()
+
+    print(f"{len(items)} items, debug lines sampled 1/{logs.SAMPLE_EVERY}")
+    print(f"{'safe_print':16s} {legacy_time * 1000:8.2f} ms")
+    for label, elapsed in timings:
+        print(f"{label:16s} {elapsed * 1000:8.2f} ms")
+
+
+def synthetic_products(count, rng):
+    """(source, [(title, price, link, image)]) for the three sources, `count` products in all."""
+    words = ["iphone", "samsung", "κινητό", "θήκη", "φορτιστής", "ποδήλατο", "καναπές", "ps5", "laptop", "οθόνη"]
+    per_source = {}
+    for index in range(count):
+        source = ("skroutz", "vendora", "facebook")[index % 3]
+        title = " ".join(rng.choice(words) for _ in range(4)) + f" {index}"
+        per_source.setdefault(source, []).append((
+            title, round(rng.uniform(1, 2000), 2), f"https://{source}.example/items/{index}", f"https://img.example/{index}.jpg"
+        ))
+    return list(per_source.items())
+
+
+def legacy_records(per_source, near_duplicates=True):
+    """The dict-per-product path search_sources used before ProductBatch."""
+    import dedup
+
+    all_products = []
+    for source, products in per_source:
+        all_products.extend(
+            {"title": title, "price": price, "link": link, "source": source, "imageUrl": image_url}
+            for title, price, link, image_url in products
+        )
+    if near_duplicates:
+        all_products = dedup.drop_near_duplicates(all_products)
+    all_products.sort(key=lambda x: x['price'])
+    return all_products
+
+
+def columnar_records(batches, near_duplicates=True):
+    """The ProductBatch path; the per-source batches are what the collector fills during extraction."""
+    from results import ProductBatch
+
+    batch = ProductBatch.concat(batches)
+    if near_duplicates:
+        batch = batch.drop_near_duplicates()
+    return batch.sorted_by_price()
+
+
+def bench_records(args):
+    """Memory and time of merging, sorting (and near-duplicate dedup): one dict per product vs ProductBatch columns.
+
+    "batch+records" adds building the output dicts, which the worker does when it serializes.
+    """
+    import tracemalloc
+
+    from results import ProductBatch
+
+    rng = random.Random(args.seed)
+    for count in (10_000, 100_000):
+        per_source = synthetic_products(count, rng)
+        batches = [ProductBatch.from_products(source, products) for source, products in per_source]
+        for near_duplicates in (False, True):
+            stage = "merge+dedup+sort" if near_duplicates else "merge+sort"
+            for label, build, products in (
+                ("dicts", legacy_records, per_source),
+                ("batch", columnar_records, batches),
+                ("batch+records", lambda batches, dedup: columnar_records(batches, dedup).records(), batches),
+            ):
+                elapsed, _ = timed(build, products, near_duplicates, repeat=args.repeat)
+                tracemalloc.start()
+                result = build(products, near_duplicates)
+                retained, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                del result
+                print(f"{count:7d} {stage:16s} {label:14s} {elapsed * 1000:8.1f} ms  "
+                      f"retained {retained / 2**20:6.1f} MiB  peak {peak / 2**20:6.1f} MiB")
+
+
+def cpu_per_run(func, repeat):
+    """Best process CPU time of `repeat` runs."""
+    best = None
+    for _ in range(repeat):
+        started = time.process_time()
+        func()
+        elapsed = time.process_time() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_wire(args):
+    """CPU time per 1k products from the worker's record to the client's bytes, per wire and output format.
+
+    Worker → front end: the old JSON lines (encode, decode, encode again for the client),
+    JSON frames forwarded as received, and msgpack frames (when msgpack is installed).
+    Front end → client: the JSON array, NDJSON and the columnar body, from parsed items.
+    """
+    import io
+    import json as stdlib_json
+
+    import wire
+    from results import ProductBatch
+
+    rng = random.Random(args.seed)
+    count = 1000
+    batch = ProductBatch.concat(ProductBatch.from_products(source, products) for source, products in synthetic_products(count, rng))
+    record = {"type": "products", "source": "skroutz", "items": batch.records(), "status": "complete", "elapsedMs": 1200}
+    loops = max(1, args.count // count)
+
+    def json_lines():
+        for _ in range(loops):
+            line = wire.json.dumps(dict(record, id="1-1"), ensure_ascii=False) + "\n"
+            message = stdlib_json.loads(line)
+            message.pop("id")
+            stdlib_json.dumps(dict(message, items=message["items"]), ensure_ascii=False)
+
+    def frames(fmt):
+        def run():
+            for _ in range(loops):
+                _, message = wire.read_frame(io.BytesIO(wire.encode(record, fmt, "1-1")))
+                getattr(message, "raw", None) or stdlib_json.dumps(message, ensure_ascii=False)
+        return run
+
+    paths = [("json lines (before)", json_lines), ("json frames, pass-through", frames("json"))]
+    if wire.available("msgpack"):
+        paths.append(("msgpack frames", frames("msgpack")))
+    else:
+        print("msgpack is not installed: skipping msgpack frames")
+    items = record["items"]
+    paths += [
+        ("client json array", lambda: [stdlib_json.dumps(sorted(items, key=lambda x: x['price']), ensure_ascii=False) for _ in range(loops)]),
+        ("client ndjson", lambda: [stdlib_json.dumps(record, ensure_ascii=False) for _ in range(loops)]),
+        ("client columnar", lambda: [stdlib_json.dumps(ProductBatch.from_records(items).sorted_by_price().columns(), ensure_ascii=False)
+                                     for _ in range(loops)]),
+    ]
+    for label, run in paths:
+        elapsed = cpu_per_run(run, args.repeat)
+        print(f"{label:28s} {elapsed / loops * 1000:8.2f} ms CPU per {count} products")
+
+
+BENCHMARKS = {
+    "skroutz-cards": bench_skroutz_cards,
+    "page-weight": bench_page_weight,
+    "concurrency": bench_concurrency,
+    "pages": bench_pages,
+    "prices": bench_prices,
+    "logging": bench_logging,
+    "records": bench_records,
+    "wire": bench_wire,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scraper micro/macro benchmarks against the local fixture site")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--count", type=int, default=10000, help="random price texts (prices) or products encoded in all (wire)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--items", type=int, default=500, help="result set size for the logging benchmark")
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
+    sys.exit(0)
@@ -0,0 +1,110 @@
+import time
+import threading
+
+import jobs
+import metrics
+
+
+class Flight:
+    """One in-flight search whose records are replayed to every subscriber."""
+
+    def __init__(self, key):
+        self.key = key
+        self.job = None
+        self.subscribers = 1
+        self.records = []
+        self.done = False
+        self._cond = threading.Condition()
+
+    def publish(self, record):
+        with self._cond:
+            self.records.append(record)
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self.done = True
+            self._cond.notify_all()
+
+    def subscribe(self, deadline=None):
+        """Yield every record published so far, then follow new ones until the flight ends.
+
+        With a `deadline` (time.monotonic() value) the subscriber stops following
+        at that point even if the flight is still running.
+        """
+        index = 0
+        while True:
+            with self._cond:
+                while index >= len(self.records) and not self.done:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return
+                    self._cond.wait(remaining)
+                if index >= len(self.records):
+                    return
+                batch = self.records[index:]
+                index = len(self.records)
+            yield from batch
+
+
+class FlightTable:
+    """Single-flight registry: identical concurrent searches share one scraper job."""
+
+    def __init__(self, manager):
+        self.manager = manager
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def run(self, key, client_id, params, on_record=None):
+        """Attach to the in-flight search for `key` or start a new one.
+
+        Raises jobs.Overloaded when a new search cannot get a slot; anyone
+        who attached in the meantime receives an error record instead.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.subscribers += 1
+                if flight.job is not None:
+                    flight.job.subscribers = flight.subscribers
+                metrics.inc("search_coalesced_total")
+                return flight
+            flight = self._flights[key] = Flight(key)
+
+        try:
+            job = self.manager.submit(client_id, params)
+            with self._lock:
+                job.subscribers = flight.subscribers
+                flight.job = job
+            self.manager.wait_for_slot(job)
+        except jobs.Overloaded as e:
+            if flight.job is not None:
+                self.manager.finish(flight.job)
+            self._end(flight, {"type": "error", "error": str(e)})
+            raise
+
+        threading.Thread(target=self._drive, args=(flight, on_record), daemon=True).start()
+        return flight
+
+    def _drive(self, flight, on_record):
+        # Το job τρέχει ανεξάρτητα από τους clients, ώστε η αποσύνδεση ενός να μην κόβει τους άλλους
+        try:
+            for reply in self.manager.run(flight.job):
+                if on_record:
+                    on_record(reply)
+                flight.publish(reply)
+        except Exception as e:
+            flight.publish({"type": "error", "error": str(e)})
+        finally:
+            self._end(flight)
+
+    def _end(self, flight, record=None):
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+        if record is not None:
+            flight.publish(record)
+        flight.close()
+
+
+flights = FlightTable(jobs.manager)
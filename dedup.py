@@ -0,0 +1,156 @@
+import os
+import re
+import math
+import unicodedata
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+
+# Query params που δεν αλλάζουν την αγγελία (analytics/παραπομπές)
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "ref", "ref_src", "referral", "referrer",
+    "source", "src", "from", "tracking", "tracking_id", "__tn__", "__cft__", "mibextid",
+    "product_position", "position", "sponsored", "campaign",
+}
+# Το ID αγγελίας σε Skroutz/Vendora (/items/123-...) και Facebook (/marketplace/item/123/)
+ITEM_ID_PATTERN = re.compile(r'/items?/(\d+)')
+# Τόνοι/διαλυτικά και λατινικά accents μετά το NFD (Combining Diacritical Marks)
+COMBINING_PATTERN = re.compile('[\u0300-\u036f]')
+WORD_PATTERN = re.compile(r'\w+')
+NEAR_DUPLICATE_SIMILARITY = float(os.environ.get('NEAR_DUPLICATE_SIMILARITY', 0.8))
+# Μέγιστη διαφορά τιμής (€) για να θεωρηθούν δύο αγγελίες ίδιες
+NEAR_DUPLICATE_PRICE_TOLERANCE = float(os.environ.get('NEAR_DUPLICATE_PRICE_TOLERANCE', 1.0))
+
+
+def _host(parts):
+    host = parts.netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def link_key(link):
+    """Canonical form of a listing URL: host + item id, or host + path + non-tracking params."""
+    parts = urlsplit((link or "").strip())
+    match = ITEM_ID_PATTERN.search(parts.path)
+    if match:
+        return f"{_host(parts)}/item/{match.group(1)}"
+    query = urlencode(sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name.lower() not in TRACKING_PARAMS and not name.lower().startswith("utm_")
+    ))
+    key = _host(parts) + (parts.path.rstrip("/") or "/")
+    return f"{key}?{query}" if query else key
+
+
+def image_key(url):
+    """Image URLs differ only in size/signature params between placements, so those are dropped."""
+    parts = urlsplit((url or "").strip())
+    if parts.scheme == "data":
+        return url
+    return _host(parts) + parts.path
+
+
+def title_tokens(title):
+    """Case- and accent-folded word set of a title: 'Κινητό iPhone 12' -> {'κινητο', 'iphone', '12'}."""
+    text = unicodedata.normalize('NFD', (title or '').casefold())
+    return frozenset(WORD_PATTERN.findall(COMBINING_PATTERN.sub('', text)))
+
+
+def similarity(first, second):
+    """Jaccard similarity of two token sets."""
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+class DedupIndex:
+    """Seen-sets over canonical links and image URLs, plus cross-source near-duplicate lookup.
+
+    Listings are bucketed by price in steps of `price_tolerance` and, within a
+    bucket, by title token. A lookup reads only its own and the two adjacent
+    buckets, and only the postings of the few tokens a match must share (a
+    title with Jaccard similarity >= threshold to n tokens shares at least one
+    of any n - ceil(threshold * n) + 1 of them), rarest first.
+    Not thread-safe; callers hold their own lock.
+    """
+
+    def __init__(self, threshold=NEAR_DUPLICATE_SIMILARITY, price_tolerance=NEAR_DUPLICATE_PRICE_TOLERANCE):
+        self.threshold = threshold
+        self.price_tolerance = price_tolerance
+        self._links = set()
+        self._images = set()
+        self._by_price = {}
+
+    def has_link(self, link):
+        return link_key(link) in self._links
+
+    def add_link(self, link):
+        """Remember a link; returns False if it (or an equivalent URL) was already seen."""
+        key = link_key(link)
+        if key in self._links:
+            return False
+        self._links.add(key)
+        return True
+
+    def has_image(self, url):
+        return bool(url) and image_key(url) in self._images
+
+    def add_image(self, url):
+        if url:
+            self._images.add(image_key(url))
+
+    def _bucket(self, price):
+        return math.floor(price / self.price_tolerance) if self.price_tolerance > 0 else price
+
+    def _matches(self, source, tokens, price):
+        if not tokens:
+            return False
+        key = self._bucket(price)
+        buckets = [self._by_price[k] for k in (key - 1, key, key + 1) if k in self._by_price]
+        if not buckets:
+            return False
+        # Αρκούν τα λιγότερο συχνά tokens: κάθε όμοιος τίτλος περιέχει τουλάχιστον ένα από αυτά
+        needed = len(tokens) - math.ceil(self.threshold * len(tokens) - 1e-9) + 1
+        rarest = sorted(tokens, key=lambda token: sum(len(bucket.get(token, ())) for bucket in buckets))
+        checked = set()
+        for token in rarest[:max(1, needed)]:
+            for entry in (entry for bucket in buckets for entry in bucket.get(token, ())):
+                other_source, other_tokens, other_price = entry
+                if other_source == source or id(entry) in checked:
+                    continue
+                checked.add(id(entry))
+                if abs(other_price - price) <= self.price_tolerance and similarity(tokens, other_tokens) >= self.threshold:
+                    return True
+        return False
+
+    def _add(self, source, tokens, price):
+        entry = (source, tokens, price)
+        bucket = self._by_price.setdefault(self._bucket(price), {})
+        for token in tokens:
+            bucket.setdefault(token, []).append(entry)
+
+    def near_duplicate(self, source, title, price):
+        """True if another source already has a listing within price_tolerance with a (nearly) identical title."""
+        return price is not None and self._matches(source, title_tokens(title), price)
+
+    def add_listing(self, source, title, price):
+        if price is not None:
+            self._add(source, title_tokens(title), price)
+
+    def add_unless_near_duplicate(self, source, title, price):
+        """near_duplicate() and add_listing() with one tokenization; returns False for a near duplicate."""
+        if price is None:
+            return True
+        tokens = title_tokens(title)
+        if self._matches(source, tokens, price):
+            return False
+        self._add(source, tokens, price)
+        return True
+
+
+def drop_near_duplicates(records, index=None):
+    """Keep the first of each group of cross-source duplicates among output records (dicts)."""
+    index = index if index is not None else DedupIndex()
+    kept = []
+    for record in records:
+        if index.add_unless_near_duplicate(record["source"], record["title"], record["price"]):
+            kept.append(record)
+    return kept
@@ -0,0 +1,330 @@
+import os
+import time
+import atexit
+import threading
+from urllib.parse import quote
+from selenium import webdriver
+
+import logs
+import metrics
+
+
+log = logs.get_logger("pool")
+
+# Ρυθμίσεις pool από το περιβάλλον
+# Ένας driver ανά σελίδα που ανακτάται ταυτόχρονα (SEARCH_PAGE_CONCURRENCY), ώστε οι σελίδες 2..N
+# και οι πόλεις του Facebook (FACEBOOK_REGION_CONCURRENCY, προεπιλογή το μέγεθος του pool) να μην περιμένουν η μία την άλλη
+POOL_SIZE = int(os.environ.get('DRIVER_POOL_SIZE', os.environ.get('SEARCH_PAGE_CONCURRENCY', 3)))
+# Οι drivers ξεκινούν μαζί με τον worker, όχι στο πρώτο search
+POOL_WARMUP = os.environ.get('DRIVER_POOL_WARMUP', '1') == '1'
+LEASE_TIMEOUT = float(os.environ.get('DRIVER_POOL_LEASE_TIMEOUT', 30))
+MAX_USES = int(os.environ.get('DRIVER_POOL_MAX_USES', 20))
+
+
+# Μπλοκάρισμα πόρων που δεν χρειάζονται για την εξαγωγή αγγελιών
+BLOCKING_ENABLED = os.environ.get('BROWSER_BLOCKING', '1') == '1'
+BLOCKABLE = ("images", "fonts", "media", "trackers")
+TRACKER_DOMAINS = (
+    "google-analytics.com", "googletagmanager.com", "googlesyndication.com", "doubleclick.net",
+    "adservice.google.com", "connect.facebook.net", "hotjar.com", "clarity.ms", "bat.bing.com",
+    "criteo.com", "criteo.net", "scorecardresearch.com", "taboola.com", "outbrain.com",
+    "analytics.tiktok.com", "adnxs.com", "quantserve.com",
+)
+# Ανά πηγή: είδη πόρων από το BLOCKABLE ή hosts από το TRACKER_DOMAINS που δεν μπλοκάρονται
+ALLOW = {
+    source: {item.strip() for item in os.environ.get(f'BROWSER_ALLOW_{source.upper()}', '').split(',') if item.strip()}
+    for source in ("skroutz", "vendora", "facebook")
+}
+
+
+class LeaseTimeout(Exception):
+    """No driver became available within the lease wait time."""
+
+
+def tracker_pac(hosts):
+    """PAC script sending the given hosts (and their subdomains) to a dead proxy."""
+    return """
+        function FindProxyForURL(url, host) {
+            var blocked = %s;
+            for (var i = 0; i < blocked.length; i++) {
+                if (host === blocked[i] || dnsDomainIs(host, "." + blocked[i])) {
+                    return "PROXY 127.0.0.1:9";
+                }
+            }
+            return "DIRECT";
+        }
+    """ % ("[" + ", ".join('"%s"' % host for host in hosts) + "]")
+
+
+def apply_blocking(options, allow=()):
+    """Block images, fonts, media and tracker hosts in the profile, except what `allow` names.
+
+    Everything is set as a profile preference, so it is in force before the first
+    navigation. Blocked images are never fetched but keep their src/data-src attributes.
+    """
+    if not BLOCKING_ENABLED:
+        return options
+    allow = set(allow)
+    if "images" not in allow:
+        options.set_preference("permissions.default.image", 2)
+    if "fonts" not in allow:
+        options.set_preference("browser.display.use_document_fonts", 0)
+        options.set_preference("gfx.downloadable_fonts.enabled", False)
+    if "media" not in allow:
+        options.set_preference("media.autoplay.default", 5)
+        options.set_preference("media.preload.default", 0)
+        options.set_preference("media.preload.auto", 0)
+    if "trackers" not in allow:
+        hosts = [host for host in TRACKER_DOMAINS if host not in allow]
+        options.set_preference("network.proxy.type", 2)
+        options.set_preference("network.proxy.autoconfig_url", "data:application/x-ns-proxy-autoconfig," + quote(tracker_pac(hosts)))
+        # Αν ο "proxy" δεν απαντά, το αίτημα αποτυγχάνει αντί να πάει απευθείας
+        options.set_preference("network.proxy.failover_direct", False)
+    return options
+
+
+def skroutz_options(allow=None):
+    options = webdriver.FirefoxOptions()
+    options.add_argument('--headless')
+    options.add_argument('--window-size=1920,1080')
+    return apply_blocking(options, ALLOW["skroutz"] if allow is None else allow)
+
+
+def facebook_options(allow=None):
+    options = webdriver.FirefoxOptions()
+    options.add_argument('--headless')  # Σχόλιο για εμφάνιση του browser κατά την εκτέλεση
+    options.add_argument('--disable-gpu')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.set_preference("general.useragent.override", "Mozilla/5.0 (Windows NT 10.0; Win64; x64)")
+    options.page_load_strategy = 'eager'  # Φόρτωση μόνο του βασικού περιεχομένου
+    return apply_blocking(options, ALLOW["facebook"] if allow is None else allow)
+
+
+def vendora_options(allow=None):
+    options = webdriver.FirefoxOptions()
+    options.add_argument('--headless')  # Enable headless mode
+    options.add_argument('--disable-gpu')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--window-size=1920,1080')  # Larger window for headless mode
+    options.set_preference("general.useragent.override", "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/99.0.9999.99 Safari/537.36")
+
+    # Βελτιστοποίηση φόρτωσης σελίδας
+    options.set_preference("network.cookie.cookieBehavior", 0)  # Accept all cookies
+    options.set_preference("network.cookie.lifetimePolicy", 0)  # Keep cookies until expiration
+    options.set_preference("privacy.cookies.cookieBehavior", 0)  # Accept all cookies
+    options.set_preference("dom.disable_beforeunload", True)  # Disable pre-exit warnings
+    options.set_preference("browser.tabs.disableBackgroundZombification", False)  # Speed up tab switching
+    options.set_preference("network.http.pipelining", True)  # Enable HTTP pipelining
+    options.set_preference("network.http.proxy.pipelining", True)
+    options.set_preference("network.http.max-connections", 256)  # Increase max connections
+    options.set_preference("network.http.max-connections-per-server", 32)
+    return apply_blocking(options, ALLOW["vendora"] if allow is None else allow)
+
+
+def skroutz_setup(driver):
+    # Ορισμός timeout φόρτωσης σελίδας
+    driver.set_page_load_timeout(2)
+
+
+# Κάθε πηγή έχει το δικό της σετ επιλογών και (προαιρετικά) ρυθμίσεις μετά την εκκίνηση
+PROFILES = {
+    "skroutz": (skroutz_options, skroutz_setup),
+    "vendora": (vendora_options, None),
+    "facebook": (facebook_options, None),
+}
+
+
+class DriverPool:
+    """Pool of pre-launched Firefox drivers for a single source profile."""
+
+    def __init__(self, source, size=POOL_SIZE, max_uses=MAX_USES, lease_timeout=LEASE_TIMEOUT):
+        self.source = source
+        self.size = size
+        self.max_uses = max_uses
+        self.lease_timeout = lease_timeout
+        self._build_options, self._setup = PROFILES[source]
+        self._cond = threading.Condition()
+        self._idle = []
+        self._uses = {}
+        self._live = 0
+        self._closed = False
+        metrics.set_gauge("driver_pool_size", size, source=source)
+        self._update_gauges()
+
+    def _update_gauges(self):
+        metrics.set_gauge("driver_pool_live", self._live, source=self.source)
+        metrics.set_gauge("driver_pool_idle", len(self._idle), source=self.source)
+
+    def _launch(self):
+        driver = webdriver.Firefox(options=self._build_options())
+        if self._setup:
+            self._setup(driver)
+        with self._cond:
+            self._uses[id(driver)] = 0
+        metrics.inc("driver_pool_launches_total", source=self.source)
+        return driver
+
+    def _quit(self, driver):
+        with self._cond:
+            self._uses.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def _reset(self, driver):
+        """Bring a returned driver back to a clean state for the next search."""
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        driver.delete_all_cookies()
+        # Νέο έγγραφο: χάνονται τα scripts που έκανε inject η προηγούμενη αναζήτηση
+        driver.get("about:blank")
+
+    def acquire(self, timeout=None):
+        """Lease a driver, launching one if the pool has not reached its size yet."""
+        if timeout is None:
+            timeout = self.lease_timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        driver = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError(f"{self.source} driver pool is shut down")
+                if self._idle:
+                    driver = self._idle.pop()
+                    break
+                if self._live < self.size:
+                    self._live += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    metrics.inc("driver_pool_lease_timeouts_total", source=self.source)
+                    raise LeaseTimeout(f"No {self.source} driver available after {timeout}s")
+                self._cond.wait(remaining)
+            self._update_gauges()
+
+        if driver is None:
+            try:
+                driver = self._launch()
+            except Exception:
+                with self._cond:
+                    self._live -= 1
+                    self._update_gauges()
+                    self._cond.notify()
+                raise
+
+        metrics.inc("driver_pool_leases_total", source=self.source)
+        metrics.observe("driver_pool_lease_wait_seconds", time.monotonic() - started, source=self.source)
+        return driver
+
+    def release(self, driver, broken=False):
+        """Return a leased driver; it is reset, or recycled when worn out or crashed."""
+        with self._cond:
+            uses = self._uses.get(id(driver), 0) + 1
+            self._uses[id(driver)] = uses
+            closed = self._closed
+
+        reason = None
+        if broken:
+            reason = "crash"
+        elif uses >= self.max_uses:
+            reason = "max_uses"
+        elif closed:
+            reason = "shutdown"
+        else:
+            try:
+                self._reset(driver)
+            except Exception:
+                reason = "crash"
+
+        if reason:
+            self._quit(driver)
+            metrics.inc("driver_pool_recycled_total", source=self.source, reason=reason)
+
+        with self._cond:
+            if reason:
+                self._live -= 1
+            else:
+                self._idle.append(driver)
+            self._update_gauges()
+            self._cond.notify()
+
+    def warm_up(self):
+        """Launch drivers until the pool holds `size` idle drivers."""
+        launched = []
+        try:
+            while True:
+                with self._cond:
+                    if self._closed or self._live >= self.size:
+                        break
+                    self._live += 1
+                try:
+                    launched.append(self._launch())
+                except Exception:
+                    with self._cond:
+                        self._live -= 1
+                    raise
+        finally:
+            with self._cond:
+                self._idle.extend(launched)
+                self._update_gauges()
+                self._cond.notify_all()
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._live -= len(idle)
+            self._update_gauges()
+            self._cond.notify_all()
+        for driver in idle:
+            self._quit(driver)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(source):
+    with _pools_lock:
+        pool = _pools.get(source)
+        if pool is None:
+            pool = _pools[source] = DriverPool(source)
+        return pool
+
+
+def acquire(source, timeout=None):
+    return get_pool(source).acquire(timeout)
+
+
+def release(source, driver, broken=False):
+    get_pool(source).release(driver, broken)
+
+
+def warm_up(sources=None):
+    """Pre-launch drivers for the given sources (default: all) in parallel."""
+    def run(source):
+        try:
+            get_pool(source).warm_up()
+        except Exception as e:
+            log.warning("Driver warm-up failed for %s: %s", source, e)
+
+    threads = [threading.Thread(target=run, args=(source,)) for source in (sources or PROFILES)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+@atexit.register
+def shutdown_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.shutdown()
@@ -0,0 +1,206 @@
+import os
+import sys
+import json
+import html
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+
+ITEMS_PER_PAGE = 12
+PAGES = 3
+
+# Ελάχιστο έγκυρο GIF, γεμισμένο ώστε να μοιάζει με πραγματική φωτογραφία σε μέγεθος
+IMAGE_BYTES = (b"GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00"
+               b",\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;") + b"\x00" * 20000
+# Web font στο μέγεθος ενός τυπικού woff2, για να φαίνεται η διαφορά όταν μπλοκάρονται τα fonts
+FONT_BYTES = b"wOF2" + b"\x00" * 40000
+PAGE_HEAD = "<head><style>@font-face { font-family: Site; src: url(/font/site.woff2); } body { font-family: Site; }</style></head>"
+
+
+def make_items(source, query, page):
+    """Deterministic listings for a query: same input, same products."""
+    seed = sum(ord(c) for c in f"{source}:{query}")
+    items = []
+    for i in range(ITEMS_PER_PAGE):
+        item_id = seed * 1000 + page * 100 + i
+        price = 10 + (item_id * 37) % 1990
+        items.append({
+            "id": item_id,
+            "title": f"{query} {source} #{item_id}",
+            "price": price,
+            "image": f"/img/{source}/{item_id}.jpg"
+        })
+    return items
+
+
+def greek_price(value):
+    # Ελληνική μορφοποίηση: τελεία για χιλιάδες
+    return f"{value:,}".replace(",", ".")
+
+
+def skroutz_page(query, page):
+    cards = "".join(f"""
+        <li class="sku-card" id="sku-{item['id']}">
+          <div class="image-container"><img src="{item['image']}" width="200" height="200"></div>
+          <h2>{html.escape(item['title'])}</h2>
+          <span class="price">{greek_price(item['price'])},00 €</span>
+          <a class="js-sku-link" href="/skoop/items/{item['id']}-{item['id']}">{html.escape(item['title'])}</a>
+        </li>""" for item in make_items("skroutz", query, page))
+    return f"<ul class='list'>{cards}</ul><footer>skroutz fixture</footer>"
+
+
+def vendora_page(query, page):
+    cards = "".join(f"""
+        <div class="item">
+          <a href="/items/{item['id']}-{item['id']}">
+            <img src="{item['image']}">
+            <h3>{html.escape(item['title'])}</h3>
+          </a>
+          <span>{greek_price(item['price'])} €</span>
+        </div>""" for item in make_items("vendora", query, page))
+    return f"<main>{cards}</main>"
+
+
+def facebook_listings(query, pages):
+    return "".join(f"""
+        <div>
+          <a href="/marketplace/item/{item['id']}/">
+            <img src="{item['image']}">
+            <span class="x193iq5w">€{greek_price(item['price'])}</span>
+            <span class="x1lliihq">{html.escape(item['title'])}</span>
+          </a>
+        </div>""" for page_number in pages for item in make_items("facebook", query, page_number))
+
+
+# Όπως το πραγματικό feed: η επόμενη σελίδα φορτώνεται όταν το scroll φτάσει στο τέλος
+FACEBOOK_SCROLL_SCRIPT = """
+<script>
+  let next = %d, loading = false;
+  window.addEventListener('scroll', () => {
+    if (loading || next > %d || window.innerHeight + window.scrollY < document.body.scrollHeight - 50) return;
+    loading = true;
+    const url = new URL(location.href);
+    url.searchParams.set('page', next);
+    url.searchParams.set('fragment', '1');
+    fetch(url).then(response => response.text()).then(listings => {
+      document.querySelector("[role='feed']").insertAdjacentHTML('beforeend', listings);
+      next += 1;
+      loading = false;
+    });
+  });
+</script>
+"""
+
+
+def facebook_page(query, page):
+    listings = facebook_listings(query, range(1, page + 1))
+    return f"<div role='main'><div role='feed'>{listings}</div></div>" + FACEBOOK_SCROLL_SCRIPT % (page + 1, PAGES)
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Serves Skroutz/Vendora/Facebook look-alike search pages under /<source>/..."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, body, content_type="text/html; charset=utf-8", status=200):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        page = int(params.get("page", ["1"])[0])
+
+        if url.path.startswith("/img/"):
+            self._send(IMAGE_BYTES, "image/gif")
+        elif url.path.startswith("/font/"):
+            self._send(FONT_BYTES, "font/woff2")
+        elif page > PAGES:
+            self._send("<html><body><footer>empty</footer></body></html>")
+        elif url.path == "/skroutz/skoop":
+            self._send(f"<html>{PAGE_HEAD}<body>{skroutz_page(params.get('keyphrase', [''])[0], page)}</body></html>")
+        elif url.path == "/vendora/items":
+            self._send(f"<html>{PAGE_HEAD}<body>{vendora_page(params.get('q', [''])[0], page)}</body></html>")
+        elif url.path.startswith("/facebook/marketplace/") and url.path.endswith("/search") and "fragment" in params:
+            self._send(facebook_listings(params.get('query', [''])[0], [page]))
+        elif url.path.startswith("/facebook/marketplace/") and url.path.endswith("/search"):
+            self._send(f"<html>{PAGE_HEAD}<body>{facebook_page(params.get('query', [''])[0], page)}</body></html>")
+        else:
+            self._send("Not found", "text/plain", 404)
+
+
+def serve(port=0):
+    """Start the fixture site in a background thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def point_scrapers_at(base_url):
+    """Environment overrides that make project.py scrape the fixture site."""
+    os.environ["SKROUTZ_BASE_URL"] = f"{base_url}/skroutz"
+    os.environ["VENDORA_BASE_URL"] = f"{base_url}/vendora"
+    os.environ["FACEBOOK_BASE_URL"] = f"{base_url}/facebook"
+
+
+def check(term="iphone"):
+    """End-to-end run: fixture site -> worker pool -> project.py workers -> results."""
+    server, base_url = serve()
+    point_scrapers_at(base_url)
+
+    import worker_pool
+    pool = worker_pool.WorkerPool(1)
+    try:
+        replies = list(pool.search({"searchTerm": term, "minPrice": "0", "maxPrice": "10000", "maxPages": "1"}))
+        print(json.dumps(pool.health(), indent=2))
+    finally:
+        pool.shutdown()
+        server.shutdown()
+
+    summary = replies[-1] if replies else {}
+    counts = {reply["source"]: len(reply["items"]) for reply in replies if reply.get("type") == "products"}
+    print(f"Result: {summary.get('type')} {json.dumps(summary)}")
+    return summary.get("type") == "summary" and all(counts.get(source) for source in ("skroutz", "vendora", "facebook"))
+
+
+def check_http(term="iphone"):
+    """Parse the fixture pages with the plain-HTTP engine (no browser needed)."""
+    server, base_url = serve()
+    import http_engine
+    try:
+        counts = {
+            "skroutz": len(http_engine.fetch_listings("skroutz", f"{base_url}/skroutz/skoop?keyphrase={term}")),
+            "vendora": len(http_engine.fetch_listings("vendora", f"{base_url}/vendora/items?q={term}"))
+        }
+    finally:
+        server.shutdown()
+    print(f"HTTP engine listings: {counts}")
+    return all(count == ITEMS_PER_PAGE for count in counts.values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local fixture marketplace site")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--check", action="store_true", help="run an end-to-end search through the worker pool and exit")
+    parser.add_argument("--check-http", action="store_true", help="parse the fixture pages with the HTTP engine and exit")
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(0 if check() else 1)
+    if args.check_http:
+        sys.exit(0 if check_http() else 1)
+
+    server, base_url = serve(args.port)
+    print(f"Fixture site on {base_url} (SKROUTZ_BASE_URL={base_url}/skroutz, ...)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,256 @@
+import os
+import re
+import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+import urllib3
+
+import metrics
+
+
+# selenium | http | auto (HTTP πρώτα, Selenium αν δεν βρεθεί τίποτα)
+ENGINES = {
+    source: os.environ.get(f'{source.upper()}_ENGINE', 'auto')
+    for source in ("skroutz", "vendora")
+}
+HTTP_TIMEOUT = float(os.environ.get('HTTP_ENGINE_TIMEOUT', 5))
+HTTP_THREADS = int(os.environ.get('HTTP_ENGINE_THREADS', 8))
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:124.0) Gecko/20100101 Firefox/124.0"
+
+# Ένα κοινό keep-alive pool συνδέσεων για όλα τα αιτήματα της διεργασίας
+_http = urllib3.PoolManager(
+    num_pools=8,
+    maxsize=HTTP_THREADS,
+    block=False,
+    headers={
+        "User-Agent": USER_AGENT,
+        "Accept": "text/html,application/xhtml+xml",
+        "Accept-Language": "el-GR,el;q=0.9,en;q=0.8"
+    },
+    timeout=urllib3.Timeout(connect=2, read=HTTP_TIMEOUT),
+    retries=urllib3.Retry(total=1, redirect=3)
+)
+
+PRICE_PATTERN = re.compile(r'(\d+[.,]?\d*)\s*€|€\s*(\d+[.,]?\d*)|\b(\d+[.,]?\d*)\s*ευρώ\b', re.IGNORECASE)
+
+
+def engine_for(source):
+    return ENGINES.get(source, 'selenium')
+
+
+class Node:
+    __slots__ = ("tag", "attrs", "children", "parent")
+
+    def __init__(self, tag, attrs, parent):
+        self.tag = tag
+        self.attrs = attrs
+        self.children = []
+        self.parent = parent
+
+    @property
+    def classes(self):
+        return (self.attrs.get("class") or "").split()
+
+    def has_class(self, *fragments):
+        return any(fragment in name for name in self.classes for fragment in fragments)
+
+    def text(self):
+        parts = []
+        stack = [self]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                parts.append(item)
+            elif item.tag not in ("script", "style"):
+                stack.extend(reversed(item.children))
+        return " ".join(" ".join(parts).split())
+
+    def iter(self):
+        """Descendant elements in document order."""
+        stack = list(reversed([c for c in self.children if not isinstance(c, str)]))
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed([c for c in node.children if not isinstance(c, str)]))
+
+    def find(self, predicate):
+        return next((node for node in self.iter() if predicate(node)), None)
+
+    def find_all(self, predicate):
+        return [node for node in self.iter() if predicate(node)]
+
+
+class TreeBuilder(HTMLParser):
+    """Builds a minimal element tree; lenient about unclosed tags like browsers are."""
+
+    VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Node("#document", {}, None)
+        self._current = self.root
+
+    def handle_starttag(self, tag, attrs):
+        node = Node(tag, {name: value or "" for name, value in attrs}, self._current)
+        self._current.children.append(node)
+        if tag not in self.VOID_TAGS:
+            self._current = node
+
+    def handle_startendtag(self, tag, attrs):
+        self._current.children.append(Node(tag, {name: value or "" for name, value in attrs}, self._current))
+
+    def handle_endtag(self, tag):
+        node = self._current
+        while node is not None and node.tag != tag:
+            node = node.parent
+        if node is not None and node.parent is not None:
+            self._current = node.parent
+
+    def handle_data(self, data):
+        self._current.children.append(data)
+
+
+def parse_html(html):
+    builder = TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+
+def image_of(node, base_url):
+    img = node if node.tag == "img" else node.find(lambda n: n.tag == "img")
+    if img is None:
+        return None
+    src = img.attrs.get("src") or img.attrs.get("data-src")
+    return urljoin(base_url, src) if src else None
+
+
+def json_ld_listings(root, base_url):
+    """Listings from embedded schema.org JSON state (ItemList / Product)."""
+    listings = []
+    for script in root.find_all(lambda n: n.tag == "script" and n.attrs.get("type") == "application/ld+json"):
+        try:
+            data = json.loads("".join(c for c in script.children if isinstance(c, str)))
+        except ValueError:
+            continue
+        entries = data if isinstance(data, list) else [data]
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            if entry.get("@type") == "ItemList":
+                entries.extend(element.get("item", element) for element in entry.get("itemListElement", []) if isinstance(element, dict))
+            elif entry.get("@type") == "Product":
+                offers = entry.get("offers") or {}
+                if isinstance(offers, list):
+                    offers = offers[0] if offers else {}
+                image = entry.get("image")
+                if isinstance(image, list):
+                    image = image[0] if image else None
+                # Οι τιμές του schema.org είναι αριθμοί με τελεία δεκαδικών· γράφονται με δύο δεκαδικά
+                # ώστε το prices.parse_price να μην τις διαβάσει ως χιλιάδες ("12.500")
+                price = offers.get("price") or offers.get("lowPrice") or ""
+                try:
+                    price = f"{float(price):.2f}"
+                except (TypeError, ValueError):
+                    price = str(price)
+                listings.append({
+                    "title": entry.get("name", ""),
+                    "price": price,
+                    "link": urljoin(base_url, entry.get("url", "")),
+                    "image": urljoin(base_url, image) if image else None
+                })
+    return listings
+
+
+def parse_skroutz(html, base_url):
+    root = parse_html(html)
+    listings = json_ld_listings(root, base_url)
+    seen = {listing["link"] for listing in listings}
+
+    cards = root.find_all(lambda n: n.tag in ("li", "div", "article")
+                          and n.has_class("sku-card", "c2c-item-card", "product-card", "skoop-item"))
+    for card in cards:
+        link_node = card.find(lambda n: n.tag == "a" and ("js-sku-link" in n.classes or "/skoop/items/" in n.attrs.get("href", "")))
+        if link_node is None:
+            continue
+        link = urljoin(base_url, link_node.attrs.get("href", ""))
+        if link in seen:
+            continue
+        seen.add(link)
+
+        title_node = card.find(lambda n: n.tag in ("h2", "h3") or n.has_class("sku-name", "product-name"))
+        title = (title_node or link_node).text()
+        price_node = card.find(lambda n: n.has_class("price", "amount"))
+        listings.append({
+            "title": title,
+            "price": price_node.text() if price_node is not None else "",
+            "link": link,
+            "image": image_of(card, base_url)
+        })
+    return listings
+
+
+def parse_vendora(html, base_url):
+    root = parse_html(html)
+    listings = json_ld_listings(root, base_url)
+    seen = {listing["link"] for listing in listings}
+
+    for anchor in root.find_all(lambda n: n.tag == "a" and "/items/" in n.attrs.get("href", "")):
+        href = anchor.attrs["href"]
+        if "/user/items/" in href or "/items/create" in href:
+            continue
+        link = urljoin(base_url, href)
+        if link in seen:
+            continue
+        seen.add(link)
+
+        heading = anchor.find(lambda n: n.tag in ("h2", "h3", "h4"))
+        title = (heading.text() if heading is not None else "") or anchor.text() or link.rstrip("/").split("/")[-1].replace("-", " ")
+
+        # Η τιμή βρίσκεται στο ίδιο το link ή στο αμέσως επόμενο επίπεδο πάνω
+        match = PRICE_PATTERN.search(anchor.text())
+        if not match and anchor.parent is not None:
+            match = PRICE_PATTERN.search(anchor.parent.text())
+
+        listings.append({
+            "title": title[:200],
+            "price": match.group(0) if match else "",
+            "link": link,
+            "image": image_of(anchor, base_url) or (image_of(anchor.parent, base_url) if anchor.parent is not None else None)
+        })
+    return listings
+
+
+PARSERS = {
+    "skroutz": parse_skroutz,
+    "vendora": parse_vendora,
+}
+
+
+def fetch(url):
+    response = _http.request("GET", url)
+    metrics.inc("http_engine_requests_total", status=str(response.status))
+    if response.status != 200:
+        raise urllib3.exceptions.HTTPError(f"HTTP {response.status} for {url}")
+    charset = response.headers.get("Content-Type", "").partition("charset=")[2] or "utf-8"
+    return response.data.decode(charset, errors="replace")
+
+
+def fetch_listings(source, url):
+    """Fetch a search page over plain HTTP and parse its listings into dicts."""
+    listings = PARSERS[source](fetch(url), url)
+    metrics.inc("http_engine_listings_total", len(listings), source=source)
+    return listings
+
+
+# Το urllib3 είναι blocking· τα async αιτήματα τρέχουν σε δικά τους threads πάνω στο ίδιο keep-alive pool
+_executor = ThreadPoolExecutor(max_workers=HTTP_THREADS, thread_name_prefix="http-engine")
+
+
+async def fetch_listings_async(source, url):
+    """fetch_listings without blocking the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(_executor, fetch_listings, source, url)
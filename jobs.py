@@ -0,0 +1,150 @@
+import os
+import time
+import uuid
+import threading
+
+import metrics
+import worker_pool
+
+
+MAX_CONCURRENT = int(os.environ.get('SEARCH_MAX_CONCURRENT', worker_pool.WORKER_COUNT))
+MAX_QUEUE = int(os.environ.get('SEARCH_MAX_QUEUE', 16))
+QUEUE_TIMEOUT = float(os.environ.get('SEARCH_QUEUE_TIMEOUT', 30))
+RETRY_AFTER = int(os.environ.get('SEARCH_RETRY_AFTER', 5))
+# Client ids of the front end's own searches (refresh, index, prewarm): labels only, never superseded
+INTERNAL_CLIENT_PREFIX = "internal:"
+
+
+class Overloaded(Exception):
+    """The search queue is full or a job waited too long for a slot."""
+
+    def __init__(self, message, retry_after=RETRY_AFTER):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Job:
+    def __init__(self, client_id, params):
+        self.id = uuid.uuid4().hex
+        self.client_id = client_id
+        self.params = params
+        self.created = time.monotonic()
+        self.cancelled = threading.Event()
+        self.worker = None
+        self.subscribers = 1  # Requests sharing this job's results (see coalesce.py)
+        self.running = False
+        self.finished = False
+
+
+class JobManager:
+    """Bounded-concurrency search jobs with a wait queue and per-client supersede."""
+
+    def __init__(self, pool, max_concurrent=MAX_CONCURRENT, max_queue=MAX_QUEUE, queue_timeout=QUEUE_TIMEOUT):
+        self.pool = pool
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._running = 0
+        self._waiting = 0
+        self._by_client = {}
+        self._update_gauges()
+
+    def _update_gauges(self):
+        metrics.set_gauge("search_jobs_running", self._running)
+        metrics.set_gauge("search_queue_depth", self._waiting)
+
+    def submit(self, client_id, params):
+        """Create a job and cancel the same client's previous (superseded) one.
+
+        A job without a client_id, or with an INTERNAL_CLIENT_PREFIX one, never
+        supersedes and is never superseded.
+        """
+        if client_id is not None and client_id.startswith(INTERNAL_CLIENT_PREFIX):
+            client_id = None
+        with self._cond:
+            previous = self._by_client.get(client_id) if client_id is not None else None
+            # Μια αναζήτηση που αντικαθιστά την προηγούμενη του ίδιου client ελευθερώνει τη δική της θέση
+            if previous is None and self._running >= self.max_concurrent and self._waiting >= self.max_queue:
+                metrics.inc("search_jobs_rejected_total", reason="queue_full")
+                raise Overloaded("Search queue is full")
+            job = Job(client_id, params)
+            if client_id is not None:
+                self._by_client[client_id] = job
+        # Μια κοινή (coalesced) αναζήτηση δεν ακυρώνεται, άλλοι clients περιμένουν τα αποτελέσματά της
+        if previous is not None and not previous.finished and previous.subscribers <= 1:
+            self.cancel(previous)
+        metrics.inc("search_jobs_submitted_total")
+        return job
+
+    def cancel(self, job):
+        with self._cond:
+            if job.finished or job.cancelled.is_set():
+                return
+            job.cancelled.set()
+            worker = job.worker
+            self._cond.notify_all()
+        metrics.inc("search_jobs_cancelled_total")
+        if worker is not None:
+            # Ο worker σταματά το scrape και μένει ζεστός· τερματίζεται μόνο αν δεν τελειώσει σε SCRAPER_CANCEL_TIMEOUT
+            worker.cancel()
+
+    def wait_for_slot(self, job):
+        """Block until the job may run; raises Overloaded when the queue wait runs out."""
+        deadline = time.monotonic() + self.queue_timeout
+        with self._cond:
+            self._waiting += 1
+            self._update_gauges()
+            try:
+                while self._running >= self.max_concurrent and not job.cancelled.is_set():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        metrics.inc("search_jobs_rejected_total", reason="queue_timeout")
+                        raise Overloaded(f"No search slot free after {self.queue_timeout}s")
+                    self._cond.wait(remaining)
+                if not job.cancelled.is_set():
+                    self._running += 1
+                    job.running = True
+            finally:
+                self._waiting -= 1
+                self._update_gauges()
+        metrics.observe("search_queue_wait_seconds", time.monotonic() - job.created)
+
+    def run(self, job):
+        """Run a job that holds a slot, yielding the worker replies."""
+        worker = None
+        try:
+            if job.cancelled.is_set():
+                yield {"type": "error", "error": "Search cancelled"}
+                return
+            worker = self.pool.acquire(timeout=worker_pool.STARTUP_TIMEOUT)
+            with self._cond:
+                job.worker = worker
+            if job.cancelled.is_set():
+                yield {"type": "error", "error": "Search cancelled"}
+                return
+            for reply in worker.run(job.params, cancelled=job.cancelled):
+                if reply.get("type") == "error" and job.cancelled.is_set():
+                    reply = {"type": "error", "error": "Search cancelled"}
+                yield reply
+        finally:
+            if worker is not None:
+                self.pool.release(worker)
+            self.finish(job)
+
+    def finish(self, job):
+        """Free the job's slot; safe to call more than once."""
+        with self._cond:
+            if job.finished:
+                return
+            job.finished = True
+            if job.running:
+                self._running -= 1
+            if self._by_client.get(job.client_id) is job:
+                del self._by_client[job.client_id]
+            self._update_gauges()
+            self._cond.notify_all()
+        metrics.observe("search_job_seconds", time.monotonic() - job.created)
+
+
+manager = JobManager(worker_pool.pool)
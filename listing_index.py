@@ -0,0 +1,269 @@
+import os
+import time
+import queue
+import atexit
+import sqlite3
+import threading
+
+import logs
+import metrics
+from result_cache import normalize_term
+from results import SOURCES
+
+
+INDEX_ENABLED = os.environ.get('LISTING_INDEX', '1') == '1'
+INDEX_PATH = os.environ.get('LISTING_INDEX_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'listing_index.sqlite3'))
+# Μέγιστος αριθμός αποτελεσμάτων ενός /search?mode=index
+INDEX_LIMIT = int(os.environ.get('LISTING_INDEX_LIMIT', 1000))
+# Αγγελίες που δεν έχουν ξαναφανεί τόσες ημέρες θεωρούνται κατεβασμένες και σβήνονται
+INDEX_MAX_AGE = float(os.environ.get('LISTING_INDEX_MAX_AGE_DAYS', 7)) * 86400
+
+# Ο refresher ξαναψάχνει όρους που ζητήθηκαν από το index μέσα στο REFRESH_WINDOW
+# και δεν έχουν ψαχτεί live εδώ και STALE_AFTER δευτερόλεπτα
+STALE_AFTER = float(os.environ.get('LISTING_INDEX_STALE_AFTER', 3600))
+REFRESH_WINDOW = float(os.environ.get('LISTING_INDEX_REFRESH_WINDOW', 86400))
+REFRESH_INTERVAL = float(os.environ.get('LISTING_INDEX_REFRESH_INTERVAL', 300))
+REFRESH_BATCH = int(os.environ.get('LISTING_INDEX_REFRESH_BATCH', 3))
+# Αναζητήσεις που περιμένουν το thread εγγραφής· πέρα από τόσες, οι νέες δεν γράφονται στο index
+WRITE_QUEUE_SIZE = int(os.environ.get('LISTING_INDEX_WRITE_QUEUE', 100))
+
+log = logs.get_logger("index")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    id INTEGER PRIMARY KEY,
+    link TEXT NOT NULL UNIQUE,
+    source TEXT NOT NULL,
+    title TEXT NOT NULL,
+    folded TEXT NOT NULL,
+    price REAL NOT NULL,
+    image TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS listings_price ON listings (price);
+CREATE INDEX IF NOT EXISTS listings_last_seen ON listings (last_seen);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS listings_fts USING fts5(
+    folded, content='listings', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS listings_ai AFTER INSERT ON listings BEGIN
+    INSERT INTO listings_fts (rowid, folded) VALUES (new.id, new.folded);
+END;
+CREATE TRIGGER IF NOT EXISTS listings_ad AFTER DELETE ON listings BEGIN
+    INSERT INTO listings_fts (listings_fts, rowid, folded) VALUES ('delete', old.id, old.folded);
+END;
+CREATE TRIGGER IF NOT EXISTS listings_au AFTER UPDATE OF folded ON listings BEGIN
+    INSERT INTO listings_fts (listings_fts, rowid, folded) VALUES ('delete', old.id, old.folded);
+    INSERT INTO listings_fts (rowid, folded) VALUES (new.id, new.folded);
+END;
+
+CREATE TABLE IF NOT EXISTS terms (
+    term TEXT PRIMARY KEY,
+    query TEXT NOT NULL,
+    last_scraped REAL,
+    last_searched REAL,
+    searches INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def match_expression(term):
+    """FTS5 query for a search term: every folded word as a prefix ('iphone 13' -> '"iphone"* "13"*').
+
+    Titles are folded the same way before indexing: unicode61 strips Latin
+    accents but leaves the Greek tonos and final sigma alone, so both sides
+    go through normalize_term.
+    """
+    words = normalize_term(term).split()
+    return " ".join('"{}"*'.format(word.replace('"', '""')) for word in words)
+
+
+class ListingIndex:
+    """Every product the scrapers have seen, searchable by title words and price.
+
+    Listings are keyed on their link and keep when they were first and last
+    seen. Titles go into an FTS5 table; price ranges and the price order
+    come from a B-tree index on price. Worker processes write, the front end
+    reads; both open the same WAL database.
+    """
+
+    def __init__(self, path=INDEX_PATH, queue_size=WRITE_QUEUE_SIZE):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+        self._writes = queue.Queue(maxsize=queue_size)
+        self._writer = None
+        # Αναζητήσεις ανά όρο που δεν έχουν γραφτεί ακόμα στον πίνακα terms (βλ. flush_searches)
+        self._searches = {}
+
+    def add(self, term, batch, scraped=None):
+        """Upsert a search's ProductBatch and mark `term` as scraped now."""
+        now = scraped if scraped is not None else time.time()
+        rows = [
+            (link, SOURCES[code], title, normalize_term(title), price, image, now, now)
+            for title, price, link, image, code in zip(batch.titles, batch.prices, batch.links, batch.images, batch.sources)
+        ]
+        with self._lock:
+            self._db.executemany("""
+                INSERT INTO listings (link, source, title, folded, price, image, first_seen, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (link) DO UPDATE SET
+                    title = excluded.title, folded = excluded.folded, price = excluded.price,
+                    image = COALESCE(excluded.image, image), last_seen = excluded.last_seen
+            """, rows)
+            self._db.execute("""
+                INSERT INTO terms (term, query, last_scraped) VALUES (?, ?, ?)
+                ON CONFLICT (term) DO UPDATE SET query = excluded.query, last_scraped = excluded.last_scraped
+            """, (normalize_term(term), term, now))
+            self._db.commit()
+        metrics.inc("listing_index_upserts_total", len(rows))
+
+    def add_later(self, term, batch):
+        """add() on a background thread, so a search does not wait on SQLite; the batch must not change afterwards."""
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write, daemon=True)
+                self._writer.start()
+        try:
+            self._writes.put_nowait((term, batch, time.time()))
+        except queue.Full:
+            metrics.inc("listing_index_dropped_total")
+            log.warning("Index write queue full, dropping the results of %r", term)
+
+    def flush(self):
+        """Wait until every queued write is in the database."""
+        if self._writer is not None:
+            self._writes.join()
+
+    def _write(self):
+        while True:
+            term, batch, scraped = self._writes.get()
+            try:
+                with metrics.span("index", "search"):
+                    self.add(term, batch, scraped)
+            except sqlite3.Error as e:
+                log.warning("Listing index update failed: %s", e)
+            finally:
+                self._writes.task_done()
+
+    def search(self, term, min_price, max_price, sources=SOURCES, limit=INDEX_LIMIT):
+        """{source: items} of the listings matching every word of `term`, cheapest first.
+
+        A common term is answered by reading rows in order off the price index,
+        checking each against the FTS matches, and stopping at `limit`. A rarer
+        term is answered from its matches, sorted. The scan reads about
+        limit * total / matches rows and the sort touches all the matches, so the
+        price index is used when matches² > limit * total.
+
+        The query is counted in memory; flush_searches() writes the counts.
+        """
+        expression = match_expression(term)
+        if not expression or not sources:
+            return {}
+        placeholders = ",".join("?" * len(sources))
+        key = normalize_term(term)
+        with self._lock:
+            _, count, _ = self._searches.get(key, (term, 0, None))
+            self._searches[key] = (term, count + 1, time.time())
+            matches = self._db.execute("SELECT count(*) FROM listings_fts WHERE listings_fts MATCH ?", (expression,)).fetchone()[0]
+            # max(id) αντί για count(*): δεν σαρώνει τον πίνακα και για την εκτίμηση αρκεί
+            total = self._db.execute("SELECT COALESCE(MAX(id), 0) FROM listings").fetchone()[0]
+            # Χωρίς υπόδειξη ο planner ξεκινά πάντα από το FTS
+            plan = "INDEXED BY listings_price" if matches * matches > limit * total else ""
+            rows = self._db.execute(f"""
+                SELECT title, price, link, source, image, first_seen, last_seen FROM listings {plan}
+                WHERE price BETWEEN ? AND ? AND source IN ({placeholders})
+                  AND id IN (SELECT rowid FROM listings_fts WHERE listings_fts MATCH ?)
+                ORDER BY price
+                LIMIT ?
+            """, (min_price, max_price, *sources, expression, limit)).fetchall()
+        metrics.inc("listing_index_queries_total", plan="price" if plan else "match")
+        found = {}
+        for title, price, link, source, image, first_seen, last_seen in rows:
+            found.setdefault(source, []).append({
+                "title": title, "price": price, "link": link, "source": source, "imageUrl": image,
+                "firstSeen": int(first_seen), "lastSeen": int(last_seen)
+            })
+        return found
+
+    def flush_searches(self):
+        """Add the in-memory query counts to the terms table, which stale_terms() ranks by."""
+        with self._lock:
+            pending, self._searches = self._searches, {}
+            if not pending:
+                return
+            self._db.executemany("""
+                INSERT INTO terms (term, query, last_searched, searches) VALUES (?, ?, ?, ?)
+                ON CONFLICT (term) DO UPDATE SET
+                    last_searched = MAX(COALESCE(last_searched, 0), excluded.last_searched),
+                    searches = searches + excluded.searches
+            """, [(key, query, searched, count) for key, (query, count, searched) in pending.items()])
+            self._db.commit()
+
+    def stale_terms(self, stale_after=STALE_AFTER, window=REFRESH_WINDOW, limit=REFRESH_BATCH):
+        """Queries asked of the index lately whose last live scrape is older than `stale_after`, most asked first."""
+        now = time.time()
+        with self._lock:
+            rows = self._db.execute("""
+                SELECT query FROM terms
+                WHERE last_searched >= ? AND (last_scraped IS NULL OR last_scraped < ?)
+                ORDER BY searches DESC, last_searched DESC
+                LIMIT ?
+            """, (now - window, now - stale_after, limit)).fetchall()
+        return [row[0] for row in rows]
+
+    def prune(self, older_than=None):
+        """Drop listings not seen since `older_than` (default: INDEX_MAX_AGE ago); returns how many."""
+        older_than = older_than if older_than is not None else time.time() - INDEX_MAX_AGE
+        with self._lock:
+            deleted = self._db.execute("DELETE FROM listings WHERE last_seen < ?", (older_than,)).rowcount
+            self._db.commit()
+        return deleted
+
+
+class Refresher:
+    """Background thread that re-scrapes the index's stale terms, a few per round.
+
+    `refresh(query)` runs one live search and returns once it has finished
+    (its results reach the index through the worker that scraped them).
+    """
+
+    def __init__(self, index, refresh, interval=REFRESH_INTERVAL):
+        self.index = index
+        self.refresh = refresh
+        self.interval = interval
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                pruned = self.index.prune()
+                if pruned:
+                    log.info("Pruned %d listings not seen for %d days", pruned, INDEX_MAX_AGE // 86400)
+                self.index.flush_searches()
+                for query in self.index.stale_terms():
+                    if self._stopping.is_set():
+                        return
+                    self.refresh(query)
+                    metrics.inc("listing_index_refreshes_total")
+            except Exception:
+                log.exception("Index refresh round failed")
+
+
+index = ListingIndex() if INDEX_ENABLED else None
+if index is not None:
+    # Ένας worker που κλείνει γράφει πρώτα ό,τι έχει στην ουρά· το front end τις μετρήσεις αναζητήσεων
+    atexit.register(index.flush)
+    atexit.register(index.flush_searches)
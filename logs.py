@@ -0,0 +1,71 @@
+import os
+import sys
+import json
+import logging
+import itertools
+
+
+# DEBUG | INFO | WARNING | ERROR
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+# text (για ανθρώπους) ή json (μία εγγραφή ανά γραμμή, για συλλογή logs)
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text').lower()
+# Από τα per-item debug μηνύματα γράφεται ένα στα N (1 = όλα)
+SAMPLE_EVERY = max(1, int(os.environ.get('LOG_SAMPLE_EVERY', 50)))
+
+ROOT = "scraper"
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, plus any `fields` passed via extra."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure(level=None, fmt=None, stream=None):
+    """(Re)attach the single handler of the scraper loggers; safe to call more than once.
+
+    Logs go to stderr: a worker's stdout carries the JSON-lines protocol.
+    """
+    logger = logging.getLogger(ROOT)
+    handler = logging.StreamHandler(stream if stream is not None else sys.stderr)
+    handler.setFormatter(JsonFormatter() if (fmt or LOG_FORMAT) == "json" else logging.Formatter(TEXT_FORMAT))
+    logger.handlers[:] = [handler]
+    logger.setLevel(level or LOG_LEVEL)
+    logger.propagate = False
+    return logger
+
+
+def get_logger(name=None):
+    """The scraper root logger, or a child per source/component ('scraper.facebook')."""
+    return logging.getLogger(f"{ROOT}.{name}" if name else ROOT)
+
+
+class ItemLog:
+    """Debug lines emitted once per product, sampled to one in `every`.
+
+    Below DEBUG a call costs a level check and nothing is formatted, so these
+    can stay in the scrapers' per-item loops.
+    """
+
+    def __init__(self, logger, every=SAMPLE_EVERY):
+        self.logger = logger
+        self.every = every
+        self._calls = itertools.count()
+
+    def __call__(self, message, *args):
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
+        if next(self._calls) % self.every:
+            return
+        self.logger.debug(message, *args)
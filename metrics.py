@@ -0,0 +1,142 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+
+# Όρια (δευτερόλεπτα) των histogram buckets όλων των observe()
+BUCKETS = tuple(
+    float(bound) for bound in
+    os.environ.get('METRICS_BUCKETS', '0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30,60,120').split(',')
+)
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_summaries = {}
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+def inc(name, value=1, **labels):
+    """Increase a counter."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    """Set a gauge to the given value."""
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name, value, **labels):
+    """Record one observation (count, sum, max and histogram bucket) for a summary metric."""
+    key = _key(name, labels)
+    with _lock:
+        summary = _summaries.get(key)
+        if summary is None:
+            summary = _summaries[key] = {"count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * len(BUCKETS)}
+        summary["count"] += 1
+        summary["sum"] += value
+        if value > summary["max"]:
+            summary["max"] = value
+        for index, bound in enumerate(BUCKETS):
+            if value <= bound:
+                summary["buckets"][index] += 1
+                break
+
+
+# Κάθε πηγή ενός search τρέχει στο δικό της thread, οπότε τα spans αναφέρονται ανά thread (όπως στο waits)
+_local = threading.local()
+
+
+def track(on_span):
+    """Report every span of the current thread to on_span(phase, seconds); returns the previous callback."""
+    previous = getattr(_local, "on_span", None)
+    _local.on_span = on_span
+    return previous
+
+
+def record_span(phase, source, seconds):
+    """One timed phase of a search: into scraper_phase_seconds{source, phase} and the thread's tracker."""
+    observe("scraper_phase_seconds", seconds, source=source, phase=phase)
+    on_span = getattr(_local, "on_span", None)
+    if on_span is not None:
+        on_span(phase, seconds)
+
+
+@contextmanager
+def span(phase, source):
+    """Time a block as one phase."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(phase, source, time.perf_counter() - started)
+
+
+class Phases:
+    """Lap timer for straight-line scraper code: mark(phase) closes the phase since the previous mark."""
+
+    def __init__(self, source):
+        self.source = source
+        self._last = time.perf_counter()
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        record_span(phase, self.source, now - self._last)
+        self._last = now
+
+
+def snapshot():
+    """JSON-serializable copy of every metric in this process."""
+    with _lock:
+        return {
+            "counters": [{"name": name, "labels": dict(labels), "value": value}
+                         for (name, labels), value in _counters.items()],
+            "gauges": [{"name": name, "labels": dict(labels), "value": value}
+                       for (name, labels), value in _gauges.items()],
+            "summaries": [dict(summary, name=name, labels=dict(labels), buckets=list(summary["buckets"]))
+                          for (name, labels), summary in _summaries.items()],
+        }
+
+
+def _labels(labels, extra=None):
+    labels = dict(labels, **(extra or {}))
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+def prometheus(snapshots):
+    """Prometheus text exposition of (extra_labels, snapshot) pairs, e.g. one per process.
+
+    Summaries are exposed as histograms (cumulative `le` buckets plus +Inf).
+    """
+    families = {}
+    for extra, data in snapshots:
+        for kind, metric_type in (("counters", "counter"), ("gauges", "gauge")):
+            for metric in data.get(kind, []):
+                lines = families.setdefault(metric["name"], (metric_type, []))[1]
+                lines.append(f'{metric["name"]}{_labels(metric["labels"], extra)} {metric["value"]}')
+        for metric in data.get("summaries", []):
+            name = metric["name"]
+            lines = families.setdefault(name, ("histogram", []))[1]
+            cumulative = 0
+            for bound, count in zip(BUCKETS, metric.get("buckets", ())):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(dict(metric["labels"], le=repr(bound)), extra)} {cumulative}')
+            lines.append(f'{name}_bucket{_labels(dict(metric["labels"], le="+Inf"), extra)} {metric["count"]}')
+            lines.append(f'{name}_sum{_labels(metric["labels"], extra)} {metric["sum"]}')
+            lines.append(f'{name}_count{_labels(metric["labels"], extra)} {metric["count"]}')
+
+    output = []
+    for name, (metric_type, lines) in sorted(families.items()):
+        output.append(f"# TYPE {name} {metric_type}")
+        output.extend(lines)
+    return "\n".join(output) + "\n"
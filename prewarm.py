@@ -0,0 +1,276 @@
+import os
+import time
+import random
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import logs
+import metrics
+from result_cache import normalize_term
+from results import SOURCES
+
+
+# record: μόνο μετρά (τους ζεσταίνει μία ξεχωριστή διεργασία, `python prewarm.py`)
+# inline: μετρά και ζεσταίνει μέσα στο front end· μόνο για ένα process (κάθε gunicorn process θα είχε δικό του Scheduler)
+# off: τίποτα
+PREWARM = os.environ.get('PREWARM', 'record').lower()
+PREWARM_STATS_PATH = os.environ.get('PREWARM_STATS_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prewarm.sqlite3'))
+# Πόσοι από τους συχνότερους όρους κρατιούνται ζεστοί
+PREWARM_TOP_K = int(os.environ.get('PREWARM_TOP_K', 100))
+# Ηλικία (δευτερόλεπτα) μετά την οποία ένα ζεστό αποτέλεσμα ξαναψάχνεται· κάτω από τα TTL του result cache
+PREWARM_INTERVAL = float(os.environ.get('PREWARM_INTERVAL', 600))
+# ±20%: οι όροι δεν λήγουν όλοι μαζί
+PREWARM_JITTER = float(os.environ.get('PREWARM_JITTER', 0.2))
+PREWARM_TICK = float(os.environ.get('PREWARM_TICK', 15))
+PREWARM_PAGES = int(os.environ.get('PREWARM_PAGES', 1))
+# Budget ανά marketplace: ταυτόχρονα prewarm jobs και εκκινήσεις ανά λεπτό
+PREWARM_CONCURRENCY = int(os.environ.get('PREWARM_CONCURRENCY', 1))
+PREWARM_RATE = float(os.environ.get('PREWARM_RATE_PER_MINUTE', 6))
+# Μετά από σφάλμα ή άδειο αποτέλεσμα μιας πηγής: αναμονή BACKOFF, διπλάσια σε κάθε επόμενο, έως BACKOFF_MAX
+PREWARM_BACKOFF = float(os.environ.get('PREWARM_BACKOFF', 60))
+PREWARM_BACKOFF_MAX = float(os.environ.get('PREWARM_BACKOFF_MAX', 1800))
+# Η συχνότητα ενός όρου μισοχάνεται κάθε HALF_LIFE δευτερόλεπτα
+PREWARM_HALF_LIFE = float(os.environ.get('PREWARM_HALF_LIFE', 3600))
+# Κάθε πόσο ένα process που μόνο μετρά γράφει τις μετρήσεις του στον κοινό πίνακα
+PREWARM_FLUSH_INTERVAL = float(os.environ.get('PREWARM_FLUSH_INTERVAL', 30))
+
+log = logs.get_logger("prewarm")
+
+
+class TermStats:
+    """Query frequency per normalized term, decaying with a half-life.
+
+    record() only counts in memory; flush() adds the counts to a SQLite table,
+    so the front end's processes (and a separate prewarm process) share one
+    ranking. A term that is not searched again for ten half-lives is dropped.
+    """
+
+    def __init__(self, path=PREWARM_STATS_PATH, half_life=PREWARM_HALF_LIFE):
+        self.half_life = half_life
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._flusher = None
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.create_function("decayed", 2, self._decayed, deterministic=True)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS terms (
+                term TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                score REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+        """)
+        self._db.commit()
+
+    def _decayed(self, score, age):
+        return score * 0.5 ** (max(0.0, age) / self.half_life)
+
+    def record(self, term):
+        key = normalize_term(term)
+        if not key:
+            return
+        with self._lock:
+            _, count = self._pending.get(key, (term, 0))
+            self._pending[key] = (term, count + 1)
+
+    def start_flushing(self, interval=PREWARM_FLUSH_INTERVAL):
+        """flush() every `interval` seconds on a background thread, for processes without a Scheduler."""
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_every, args=(interval,), daemon=True)
+            self._flusher.start()
+
+    def _flush_every(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                log.warning("Flushing term counts failed: %s", e)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        now = time.time()
+        with self._lock:
+            self._db.executemany("""
+                INSERT INTO terms (term, query, score, updated) VALUES (?, ?, ?, ?)
+                ON CONFLICT (term) DO UPDATE SET
+                    query = excluded.query,
+                    score = decayed(score, excluded.updated - updated) + excluded.score,
+                    updated = excluded.updated
+            """, [(key, query, count, now) for key, (query, count) in pending.items()])
+            self._db.execute("DELETE FROM terms WHERE updated < ?", (now - 10 * self.half_life,))
+            self._db.commit()
+
+    def top(self, k=PREWARM_TOP_K):
+        """The `k` most searched queries right now, most searched first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT query FROM terms ORDER BY decayed(score, ? - updated) DESC LIMIT ?", (time.time(), k)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+
+class Scheduler:
+    """Keeps the top-K terms' cached results younger than a (jittered) interval.
+
+    Every tick it checks each top term's cache age per source and starts one
+    scrape per term for the sources that are due, within each marketplace's
+    budget: PREWARM_CONCURRENCY jobs at a time and PREWARM_RATE starts per
+    minute. A source that errors or comes back empty is left alone for an
+    exponentially growing backoff.
+
+    `warm(query, sources)` runs a scrape that stores into the result cache and
+    returns {source: (status, count)}; `age(source, query)` is the cached
+    entry's age in seconds or None.
+    """
+
+    def __init__(self, stats, warm, age, sources=SOURCES, top_k=PREWARM_TOP_K, interval=PREWARM_INTERVAL,
+                 jitter=PREWARM_JITTER, tick=PREWARM_TICK, concurrency=PREWARM_CONCURRENCY, rate=PREWARM_RATE,
+                 backoff=PREWARM_BACKOFF, backoff_max=PREWARM_BACKOFF_MAX):
+        self.stats = stats
+        self.warm = warm
+        self.age = age
+        self.sources = tuple(sources)
+        self.top_k = top_k
+        self.interval = interval
+        self.jitter = jitter
+        self.tick_seconds = tick
+        self.concurrency = concurrency
+        self.spacing = 60.0 / rate if rate > 0 else 0.0
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self._running = set()
+        self._active = {source: 0 for source in self.sources}
+        self._last_start = {source: 0.0 for source in self.sources}
+        self._failures = {source: 0 for source in self.sources}
+        self._backoff_until = {source: 0.0 for source in self.sources}
+        self._factors = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, concurrency * len(self.sources)), thread_name_prefix="prewarm")
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._executor.shutdown(wait=False)
+
+    def _run(self):
+        while not self._stopping.wait(self.tick_seconds):
+            try:
+                self.tick()
+            except Exception:
+                log.exception("Prewarm tick failed")
+
+    def _factor(self, query, source):
+        """This term/source's interval multiplier, redrawn after each warm-up."""
+        key = (query, source)
+        if key not in self._factors:
+            self._factors[key] = random.uniform(1 - self.jitter, 1 + self.jitter)
+        return self._factors[key]
+
+    def _reserve(self, source, now):
+        """Take one slot of the source's budget, or say why not (caller holds the lock)."""
+        if now < self._backoff_until[source]:
+            return "backoff"
+        if self._active[source] >= self.concurrency:
+            return "concurrency"
+        if now - self._last_start[source] < self.spacing:
+            return "rate"
+        self._active[source] += 1
+        self._last_start[source] = now
+        return None
+
+    def tick(self):
+        self.stats.flush()
+        queries = self.stats.top(self.top_k)
+        now = time.time()
+        pairs = fresh = 0
+        with self._lock:
+            # Όροι που έπεσαν από το top-K δεν χρειάζονται πια jitter
+            keep = set(queries) | self._running
+            self._factors = {key: factor for key, factor in self._factors.items() if key[0] in keep}
+            for query in queries:
+                due = []
+                for source in self.sources:
+                    pairs += 1
+                    age = self.age(source, query)
+                    if age is not None:
+                        metrics.observe("prewarm_cache_age_seconds", age, source=source)
+                        if age < self.interval * self._factor(query, source):
+                            fresh += 1
+                            continue
+                    if query in self._running:
+                        continue
+                    reason = self._reserve(source, now)
+                    if reason is not None:
+                        metrics.inc("prewarm_skipped_total", source=source, reason=reason)
+                        continue
+                    due.append(source)
+                if due:
+                    self._running.add(query)
+                    self._executor.submit(self._warm, query, due)
+            for source in self.sources:
+                metrics.set_gauge("prewarm_backoff_seconds", max(0.0, self._backoff_until[source] - now), source=source)
+        metrics.set_gauge("prewarm_terms", len(queries))
+        metrics.set_gauge("prewarm_fresh_ratio", fresh / pairs if pairs else 1.0)
+
+    def _warm(self, query, sources):
+        started = time.monotonic()
+        try:
+            results = self.warm(query, sources)
+        except Exception as e:
+            log.warning("Prewarm of %r failed: %s", query, e)
+            results = {source: ("error", 0) for source in sources}
+        metrics.observe("prewarm_seconds", time.monotonic() - started)
+        now = time.time()
+        with self._lock:
+            self._running.discard(query)
+            for source in sources:
+                self._active[source] -= 1
+                self._factors.pop((query, source), None)
+                if source not in results:
+                    # Δεν έτρεξε (π.χ. γεμάτη ουρά jobs): δεν φταίει η πηγή
+                    metrics.inc("prewarm_runs_total", source=source, status="not_run")
+                    continue
+                status, count = results[source]
+                # Ένα άδειο "complete" είναι συνήθως block/CAPTCHA
+                failed = status == "error" or count == 0
+                metrics.inc("prewarm_runs_total", source=source, status="empty" if status != "error" and not count else status)
+                if not failed:
+                    self._failures[source] = 0
+                    continue
+                self._failures[source] += 1
+                delay = min(self.backoff_max, self.backoff * 2 ** (self._failures[source] - 1))
+                self._backoff_until[source] = now + delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+                log.info("%s: backing off prewarm for %ds after %d failures", source, delay, self._failures[source])
+
+
+def main():
+    """Separate prewarm process: uses the front end's search plumbing (worker pool, result cache) without serving HTTP."""
+    import search
+    import result_cache
+
+    if result_cache.cache is None:
+        log.error("The result cache is disabled: nothing to prewarm")
+        return
+    if result_cache.CACHE_BACKEND != "sqlite":
+        log.warning("RESULT_CACHE_BACKEND is not sqlite: the front end will not see what this process warms")
+    scheduler = search.prewarm_scheduler or search.create_prewarm_scheduler()
+    scheduler.start()
+    log.info("Prewarming the top %d terms every %ds", scheduler.top_k, scheduler.interval)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
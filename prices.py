@@ -0,0 +1,125 @@
+import re
+from typing import NamedTuple, Optional
+
+
+# Ένας αριθμός με διαχωριστικά χιλιάδων/δεκαδικών (τελεία, κόμμα, non-breaking space ή κενό πριν από τριάδα ψηφίων)
+_NUMBER = r'\d+(?:(?:[.,  ]| (?=\d{3}\b))\d+)*'
+_CURRENCY = r'€|\$|£|eur\b|euro\b|ευρώ|ευρω|usd\b|gbp\b'
+# Προαιρετικό νόμισμα πριν/μετά, και προαιρετικά δεύτερος αριθμός για εύρος ("50-80 €", "από 50 έως 80")
+PRICE_PATTERN = re.compile(
+    rf'(?P<before>{_CURRENCY})?\s*(?P<low>{_NUMBER})\s*(?P<after>{_CURRENCY})?'
+    rf'(?:\s*(?:[-–—]|έως|εως|to\b)\s*(?:{_CURRENCY})?\s*(?P<high>{_NUMBER})\s*(?P<high_after>{_CURRENCY})?)?',
+    re.IGNORECASE
+)
+# Η συνηθισμένη περίπτωση ("150 €", "€1.234,56", "από 50 ευρώ", "50 - 80 €"): ένας αριθμός ή εύρος σε ευρώ, χωρίς τίποτε άλλο
+_SIMPLE_NUMBER = r'\d+(?:[.,]\d+)*'
+SIMPLE_PATTERN = re.compile(
+    rf'\s*(?:[Αα]πό\s*)?(?:€\s*)?(?P<low>{_SIMPLE_NUMBER})\s*(?:€|ευρώ)?'
+    rf'(?:\s*[-–]\s*(?:€\s*)?(?P<high>{_SIMPLE_NUMBER})\s*(?:€|ευρώ)?)?\s*'
+)
+FREE_PATTERN = re.compile(r'δωρε[άα]ν|\bfree\b|\bgratis\b|\bχαρίζεται\b', re.IGNORECASE)
+_DIGITS = "0123456789"
+
+CURRENCIES = {
+    "€": "EUR", "eur": "EUR", "euro": "EUR", "ευρώ": "EUR", "ευρω": "EUR",
+    "$": "USD", "usd": "USD",
+    "£": "GBP", "gbp": "GBP",
+}
+# Τα marketplaces είναι ελληνικά: χωρίς σύμβολο η τιμή θεωρείται σε ευρώ
+DEFAULT_CURRENCY = "EUR"
+
+
+class Price(NamedTuple):
+    """A parsed price: `amount` is the (lower) value, `high` the upper end of a range."""
+    amount: float
+    currency: str = DEFAULT_CURRENCY
+    high: Optional[float] = None
+    free: bool = False
+
+
+def parse_number(token):
+    """'1.234,56' -> 1234.56, '1.500' -> 1500, '12,50' -> 12.5, '€1,200' -> 1200.
+
+    The last separator is the decimal point unless it is a space, repeats
+    ('1.234.567') or is followed by exactly three digits: prices never have
+    three decimals, so '1,500' is read as thousands whichever the locale.
+    Hence '12.50' is 12.5; the extract_price this replaced read it as 1250.
+    """
+    if token.isdigit():
+        return float(token)
+    # Μόνο μέθοδοι του str (σε C): αυτό τρέχει για κάθε τιμή κάθε σελίδας
+    decimals = len(token) - len(token.rstrip(_DIGITS))
+    last = token[-decimals - 1]
+    digits = token.replace(".", "").replace(",", "")
+    if not digits.isdigit():
+        # Κενά ως διαχωριστικά χιλιάδων ('1 500'), μόνο από το PRICE_PATTERN
+        digits = digits.replace("\u00a0", "").replace("\u202f", "").replace(" ", "")
+    thousands = last not in ".," or decimals == 3 or token.count(last) > 1
+    if thousands:
+        return float(digits)
+    return float(digits[:-decimals] + "." + digits[-decimals:])
+
+
+def _currency(*symbols):
+    for symbol in symbols:
+        if symbol:
+            return CURRENCIES.get(symbol.lower(), DEFAULT_CURRENCY)
+    return None
+
+
+def parse(text):
+    """Full parse of a price text, or None when it holds no price.
+
+    'Δωρεάν'/'free' is 0; 'από 50 €' is 50; '50-80 €' is 50 with high=80. When
+    the text has several numbers ('2 τεμ. 35 €'), the first one next to a
+    currency symbol wins.
+    """
+    if not text:
+        return None
+    simple = SIMPLE_PATTERN.fullmatch(text)
+    if simple is not None:
+        low = parse_number(simple["low"])
+        high = parse_number(simple["high"]) if simple["high"] else None
+        return Price(low, high=high if high is not None and high >= low else None)
+    fallback = None
+    for match in PRICE_PATTERN.finditer(text):
+        currency = _currency(match["before"], match["after"], match["high_after"])
+        if currency is None and fallback is not None:
+            continue
+        try:
+            low = parse_number(match["low"])
+            high = parse_number(match["high"]) if match["high"] else None
+        except ValueError:
+            continue
+        if high is not None and high < low:
+            high = None
+        price = Price(low, currency or DEFAULT_CURRENCY, high)
+        if currency is not None:
+            return price
+        fallback = price
+    if fallback is None and FREE_PATTERN.search(text):
+        return Price(0.0, free=True)
+    return fallback
+
+
+def parse_price(text):
+    """The amount of a price text as a float, or None."""
+    if text:
+        # Το ίδιο fast path με το parse(), χωρίς το Price
+        simple = SIMPLE_PATTERN.fullmatch(text)
+        if simple is not None:
+            return parse_number(simple["low"])
+    price = parse(text)
+    return price.amount if price is not None else None
+
+
+def parse_prices(texts):
+    """parse_price over a batch of texts.
+
+    A listing page repeats the same price strings ('Δωρεάν', '10 €'), so every
+    distinct text is parsed once and the batch is answered from that table.
+    """
+    parsed = dict.fromkeys(texts)
+    for text in parsed:
+        parsed[text] = parse_price(text)
+    return list(map(parsed.__getitem__, texts))
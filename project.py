@@ -1,50 +1,73 @@
 import sys
 import time
+import asyncio
 import re
 import threading
 import traceback
 import io
+import os
 import ujson as json
-from selenium import webdriver
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 
+import driver_pool
+import http_engine
+import listing_index
+import logs
+import metrics
+import prices
+import rate_limit
+import urls
+import waits
+import wire
+from results import ResultCollector, ProductBatch
+
 
 
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
 sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
     
-def safe_print(message):
-    try:
-        print(message, file=sys.stderr)
-    except Exception:
-        try:
-            # Try to encode and decode manually
-            safe_message = str(message).encode('utf-8', errors='replace').decode('utf-8')
-            print(safe_message, file=sys.stderr)
-        except Exception:
-            try:
-                # Last fallback: pure ASCII only, replace non-ASCII with ?
-                safe_message = ''.join(c if ord(c) < 128 else '?' for c in str(message))
-                print(safe_message, file=sys.stderr)
-            except Exception:
-                # Ultimate fallback: skip printing
-                pass
-            
-def safe_thread_run(func, *args, **kwargs):
-    try:
-        func(*args, **kwargs)
-    except Exception as e:
-        safe_print(f"⚠️ Thread error: {str(e)}")
+# Μετά την αντικατάσταση του stderr, ώστε τα logs να γράφονται σε UTF-8
+logs.configure()
+log = logs.get_logger()
+skroutz_log = logs.get_logger("skroutz")
+facebook_log = logs.get_logger("facebook")
+vendora_log = logs.get_logger("vendora")
+# Per-item debug γραμμές, με δειγματοληψία (LOG_SAMPLE_EVERY)
+skroutz_items = logs.ItemLog(skroutz_log)
+facebook_items = logs.ItemLog(facebook_log)
+vendora_items = logs.ItemLog(vendora_log)
 
 
-# Global lists to store products from different sources
-skroutz_products = []
-vendora_products = []
-facebook_products = []
-products_lock = threading.Lock()
+# Εκτέλεση των πηγών: asyncio (προεπιλογή) ή threads (το παλιό μοντέλο, ως fallback)
+ORCHESTRATION = os.environ.get('SEARCH_ORCHESTRATION', 'asyncio')
+# Συνολική προθεσμία ενός search και προθεσμία ανά πηγή (δευτερόλεπτα)
+SEARCH_DEADLINE = float(os.environ.get('SEARCH_DEADLINE', 120))
+SOURCE_DEADLINES = {
+    source: float(os.environ.get(f'SEARCH_DEADLINE_{source.upper()}', default))
+    for source, default in (("skroutz", 30), ("vendora", 30), ("facebook", 60))
+}
+# Μερίδιο του budget ενός search (budgetMs) για κάθε πηγή· το υπόλοιπο μένει για τη συναρμολόγηση και αποστολή
+BUDGET_SHARES = {
+    source: float(os.environ.get(f'SEARCH_BUDGET_SHARE_{source.upper()}', 0.9))
+    for source in ("skroutz", "vendora", "facebook")
+}
+# Threads για τους (blocking) Selenium scrapers στη λειτουργία asyncio
+SCRAPER_THREADS = int(os.environ.get('SEARCH_SCRAPER_THREADS', 16))
+# Πόσες σελίδες (2..N) ανακτώνται ταυτόχρονα όταν maxPages > 1
+PAGE_CONCURRENCY = int(os.environ.get('SEARCH_PAGE_CONCURRENCY', 3))
+# Πόσες πόλεις του Facebook ψάχνονται ταυτόχρονα (περισσότερες από τους drivers του pool απλώς περιμένουν)
+REGION_CONCURRENCY = int(os.environ.get('FACEBOOK_REGION_CONCURRENCY', driver_pool.POOL_SIZE))
+
+# CSS των αγγελιών που παρακολουθούν οι αναμονές (waits) για να ξέρουν πότε φόρτωσε η σελίδα
+SKROUTZ_CARDS_CSS = "li.sku-card, [class*='c2c-item-card'], [class*='product-card'], [class*='skoop-item']"
+VENDORA_LISTINGS_CSS = 'a[href*="/items/"]'
+FACEBOOK_LISTINGS_CSS = "div[role='feed'] > div, [data-testid='marketplace_feed_item'], a[href*='/marketplace/item/']"
+
 
 def is_valid_product_link(link):
     """Validate if the link is a valid product link."""
@@ -75,57 +98,131 @@ def is_valid_product_link(link):
         len(link.split("/")[-1]) > 2  # Αποκλείει πολύ σύντομα URLs
     )
 
-def extract_price(text):
-    """Εκτεταμένη εξαγωγή τιμών για ελληνική μορφοποίηση."""
-    if not text:
-        return None
-    
-    # Καθαρισμός κειμένου
-    text = text.strip()
-    
-    # Αφαίρεση συμβόλου νομίσματος
-    text = text.replace('€', '').replace('ευρώ', '').strip()
-    
-    # Για την ελληνική μορφοποίηση όπου η τελεία είναι διαχωριστικό χιλιάδων
-    if '.' in text and ',' not in text:
-        # Αφαίρεση τελειών (διαχωριστικά χιλιάδων)
-        text = text.replace('.', '')
-    elif '.' in text and ',' in text:
-        # Περίπτωση 1.234,56
-        if text.rindex('.') < text.rindex(','):
-            text = text.replace('.', '')
-            text = text.replace(',', '.')
-        # Περίπτωση 1,234.56
-        else:
-            text = text.replace(',', '')
-    elif ',' in text:
-        # Αντικατάσταση κόμματος με τελεία για δεκαδικά
-        text = text.replace(',', '.')
-    
+# Επιλογείς πεδίων μέσα σε κάθε κάρτα Skroutz, με σειρά προτεραιότητας
+SKROUTZ_TITLE_SELECTORS = [
+    ".//h2",
+    ".//h3",
+    ".//*[contains(@class, 'title')]",
+    ".//*[contains(@class, 'name')]",
+    ".//a[contains(@class, 'js-sku-link')]",
+    ".//a[contains(@href, '/skoop/items/')]"
+]
+
+SKROUTZ_PRICE_SELECTORS = [
+    ".//span[contains(text(),'€')]",
+    ".//*[contains(@class, 'price')]",
+    ".//*[contains(text(),'€')]",
+    ".//*[contains(@class, 'amount')]"
+]
+
+SKROUTZ_LINK_SELECTORS = [
+    ".//a[contains(@class, 'js-sku-link')]",
+    ".//a[contains(@href, '/skoop/items/')]",
+    ".//a[contains(@href, '/products/')]",
+    ".//a"
+]
+
+SKROUTZ_IMAGE_SELECTORS = [
+    ".//div[contains(@class, 'image-container')]//img",  # Βασικός επιλογέας από την ανάλυση
+    ".//div[contains(@class, 'sku-card-pic')]//img",     # Βασικός επιλογέας από την ανάλυση
+    ".//img",                                            # Όποια εικόνα υπάρχει
+    ".//*[contains(@class, 'image')]//img"
+]
+
+# Εξαγωγή όλων των καρτών μέσα στη σελίδα. Για κάθε επιλογέα επιστρέφει ό,τι θα έδινε
+# το αντίστοιχο find_element (το πρώτο στοιχείο, ή null/false αν δεν υπάρχει), ώστε η
+# σειρά fallback να εφαρμόζεται στην Python όπως πριν.
+SKROUTZ_CARDS_SCRIPT = """
+    const [cards, titleXPaths, priceXPaths, linkXPaths, imageXPaths] = arguments;
+    const first = (xpath, card) => document.evaluate(
+        xpath, card, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    const all = (xpath, card) => {
+        const result = document.evaluate(xpath, card, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        const nodes = [];
+        for (let i = 0; i < result.snapshotLength; i++) nodes.push(result.snapshotItem(i));
+        return nodes;
+    };
+    const text = (xpath, card) => {
+        const el = first(xpath, card);
+        return el ? (el.innerText || '').trim() : null;
+    };
+
+    return cards.map(card => ({
+        titles: titleXPaths.map(xpath => text(xpath, card)),
+        cardText: card.innerText || '',
+        prices: priceXPaths.map(xpath => text(xpath, card)),
+        links: linkXPaths.map(xpath => {
+            const el = first(xpath, card);
+            return el ? (el.getAttribute('href') !== null ? el.href : null) : false;
+        }),
+        images: imageXPaths.map(xpath => all(xpath, card).map(img => ({
+            src: img.getAttribute('src') !== null ? img.src : null,
+            width: img.width || Number(img.getAttribute('width')) || 0,
+            height: img.height || Number(img.getAttribute('height')) || 0,
+            dataSrc: img.getAttribute('data-src')
+        })))
+    }));
+"""
+
+
+def listings_to_products(listings, min_price, max_price):
+    """Μετατροπή των listings του HTTP engine σε tuples (title, price, link, image_url)."""
+    products = []
+    seen_links = set()
+    amounts = prices.parse_prices([listing.get("price") or "" for listing in listings])
+    for listing, price in zip(listings, amounts):
+        title = (listing.get("title") or "").strip()
+        link = listing.get("link") or ""
+        if not title or link in seen_links or not is_valid_product_link(link):
+            continue
+        
+        if price is not None and min_price <= price <= max_price:
+            seen_links.add(link)
+            products.append((title, price, link, listing.get("image")))
+    return products
+
+
+def http_fast_path(source, url, min_price, max_price):
+    """Αναζήτηση με απλό HTTP (χωρίς browser). Επιστρέφει [] αν αποτύχει ή δεν βρει τίποτα."""
     try:
-        return float(text)
-    except (ValueError, TypeError): 
-        return None
+        with metrics.span("http_fetch", source):
+            listings = http_engine.fetch_listings(source, url)
+        with metrics.span("process", source):
+            products = listings_to_products(listings, min_price, max_price)
+    except Exception as e:
+        logs.get_logger(source).warning("HTTP fast path error: %s", e)
+        products = []
+    
+    if not products:
+        metrics.inc("http_engine_fallbacks_total", source=source)
+        logs.get_logger(source).info("HTTP fast path found no products")
+    return products
 
 
-def search_skroutz(search_term, min_price, max_price):
-    global skroutz_products
-    skroutz_products = []  # Reset for each search
+def search_skroutz(search_term, min_price, max_price, results=None, use_http=True, page=1, sort=None):
+    results = results if results is not None else ResultCollector()
+    
+    # Τα όρια τιμής και η ταξινόμηση πάνε στο ίδιο το Skroutz· το φίλτρο παρακάτω μένει ως δίχτυ ασφαλείας
+    url = urls.skroutz(search_term, page, min_price, max_price, sort)
     
-    options = webdriver.FirefoxOptions()
-    options.add_argument('--headless')
-    options.add_argument('--window-size=1920,1080')
-    driver = webdriver.Firefox(options=options)
+    # Γρήγορη διαδρομή χωρίς browser, με fallback στο Selenium αν δεν βρει τίποτα
+    if use_http and http_engine.engine_for("skroutz") != "selenium":
+        products = http_fast_path("skroutz", url, min_price, max_price)
+        if products or http_engine.engine_for("skroutz") == "http":
+            results.extend("skroutz", products)
+            return results.products("skroutz")
     
-    # Ορισμός timeout φόρτωσης σελίδας
-    driver.set_page_load_timeout(2)
+    # Δανεισμός έτοιμου driver από το pool (το timeout φόρτωσης ορίζεται στο profile)
+    phases = metrics.Phases("skroutz")
+    driver = driver_pool.acquire("skroutz")
+    broken = False
+    phases.mark("driver")
     
     # Δημιουργία αντικειμένων αναμονής με διαφορετικά timeouts
     short_wait = WebDriverWait(driver, 1)   # Σύντομη αναμονή
     wait = WebDriverWait(driver, 1)        # Κανονική αναμονή
     
     try:
-        url = f"https://www.skroutz.gr/skoop?keyphrase={search_term.replace(' ', '+')}"        
         # Φόρτωση της σελίδας
         driver.get(url)
         
@@ -140,22 +237,12 @@ def search_skroutz(search_term, min_price, max_price):
                 )
             )
         except:
-            safe_print("Basic page load detection timed out, continuing anyway")
+            skroutz_log.debug("Basic page load detection timed out, continuing anyway")
         
         # Σταμάτησε επιπλέον αιτήματα δικτύου μετά τη φόρτωση βασικών στοιχείων
-        driver.execute_script("""
-            window.stop();
-            // Απενεργοποίηση άλλων αιτημάτων που δεν είναι σημαντικά
-            const originalFetch = window.fetch;
-            window.fetch = function() {
-                const url = arguments[0];
-                if (url.includes('analytics') || url.includes('tracking') || url.includes('ads')) {
-                    console.log('Blocked fetch:', url);
-                    return new Promise(() => {});
-                }
-                return originalFetch.apply(this, arguments);
-            }
-        """)
+        # (trackers, εικόνες και fonts μπλοκάρονται ήδη από το profile του driver_pool)
+        driver.execute_script("window.stop();")
+        phases.mark("page_load")
         
         # Χειρισμός cookie banner - με σύντομο timeout
         try:
@@ -170,20 +257,17 @@ def search_skroutz(search_term, min_price, max_price):
                 try:
                     cookie_button = short_wait.until(EC.element_to_be_clickable((By.XPATH, selector)))
                     cookie_button.click()
-                    safe_print("Cookie accepted", file=sys.stderr)
+                    skroutz_log.debug("Cookie accepted")
                     break
                 except:
                     continue
         except:
-            safe_print("No cookie banner or couldn't accept", file=sys.stderr)
+            skroutz_log.debug("No cookie banner or couldn't accept")
+        phases.mark("cookies")
         
-        # Γρήγορο scroll για φόρτωση δυναμικού περιεχομένου
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight * 0.3);")
-        time.sleep(0.05)  # Μικρότερος χρόνος αναμονής
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight * 0.6);")
-        time.sleep(0.05)
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(0.05)
+        # Scroll στο τέλος και αναμονή μόνο όσο η σελίδα φορτώνει ακόμα δυναμικό περιεχόμενο
+        waits.settle(driver, "skroutz", SKROUTZ_CARDS_CSS, scroll_to=1.0, idle_ms=150)
+        phases.mark("scroll")
         
         # Βελτιωμένοι επιλογείς προϊόντων για Skroutz Skoop
         product_selectors = [
@@ -242,11 +326,14 @@ def search_skroutz(search_term, min_price, max_price):
                     }
                 }).filter(item => item && item.title && item.link);
             """)
+            phases.mark("extract")
             
             
             # Μετατροπή των JavaScript αποτελεσμάτων σε προϊόντα
             if products_data and len(products_data) > 0:
-                for product_data in products_data:
+                # Όλες οι τιμές της σελίδας σε ένα batch
+                amounts = prices.parse_prices([(product_data.get('price') or '').strip() for product_data in products_data])
+                for product_data, price in zip(products_data, amounts):
                     try:
                         title = product_data.get('title', '').strip()
                         price_text = product_data.get('price', '').strip()
@@ -256,16 +343,7 @@ def search_skroutz(search_term, min_price, max_price):
                         if not title or not link or not is_valid_product_link(link):
                             continue
                         
-                        # Προσθήκη debug logging για έλεγχο
-                        safe_print(f"Debug - Τιμή κειμένου: {price_text}")
-                        
-                        # Εξαγωγή τιμής
-                        price = extract_price(price_text)
-                        
-                        # Προσθήκη debug logging
-                        safe_print(f"Debug - Εξαγμένη τιμή: {price}, Τύπος: {type(price)}")
-                        safe_print(f"Debug - min_price: {min_price}, Τύπος: {type(min_price)}")
-                        safe_print(f"Debug - max_price: {max_price}, Τύπος: {type(max_price)}")
+                        skroutz_items("Τιμή κειμένου %r -> %s (εύρος %s-%s)", price_text, price, min_price, max_price)
                         
                         # Βεβαιωθείτε ότι όλες οι τιμές είναι αριθμοί
                         if price is not None:
@@ -275,17 +353,14 @@ def search_skroutz(search_term, min_price, max_price):
                             
                             if price is not None and min_price <= price <= max_price:
 
-                                # Έλεγχος αν είναι διπλότυπο
-                                is_duplicate = any(link == existing[2] for existing in skroutz_products)
-                                if not is_duplicate:
-                                    with products_lock:
-                                        skroutz_products.append((title, price, link, image_url))
+                                # Ο collector απορρίπτει τα διπλότυπα links
+                                results.add("skroutz", title, price, link, image_url)
                     except Exception as e:
-                        safe_print(f"Σφάλμα: {e}")  # Εμφάνιση σφάλματος αντί για σιωπηρή συνέχιση
+                        skroutz_items("Σφάλμα προϊόντος: %s", e)
                         continue
             
             # Δοκιμή απευθείας εξαγωγής εικόνων με βάση την ανάλυση JSON
-            if not skroutz_products or len(skroutz_products) < 3:
+            if results.count("skroutz") < 3:
                 # Εξαγωγή όλων των εικόνων
                 all_images = driver.execute_script("""
                     return Array.from(document.querySelectorAll('img')).map(img => {
@@ -295,8 +370,8 @@ def search_skroutz(search_term, min_price, max_price):
                         return {
                             src: img.src,
                             dataSrc: img.getAttribute('data-src'),
-                            width: img.width,
-                            height: img.height,
+                            width: img.width || Number(img.getAttribute('width')) || 0,
+                            height: img.height || Number(img.getAttribute('height')) || 0,
                             alt: img.alt,
                             inViewport: (
                                 rect.top >= 0 &&
@@ -368,124 +443,72 @@ def search_skroutz(search_term, min_price, max_price):
                             
                             # Τελευταία προσπάθεια: πάρε οποιαδήποτε εικόνα προϊόντος που δεν έχει χρησιμοποιηθεί
                             if not image_url and all_images:
-                                # Έλεγχος αν η εικόνα έχει ήδη χρησιμοποιηθεί
-                                used_images = [item[3] for item in skroutz_products if item[3]]
+                                # Έλεγχος αν η εικόνα έχει ήδη χρησιμοποιηθεί (O(1) στο index του collector)
                                 for img in all_images:
                                     img_src = img.get('src', '')
-                                    if img_src not in used_images and 'thumbnail' in img_src:
+                                    if not results.has_image(img_src) and 'thumbnail' in img_src:
                                         image_url = img_src
                                         break
                             
-                            price = extract_price(price_text)
+                            price = prices.parse_price(price_text)
                             if price is not None and min_price <= price <= max_price:
-                                is_duplicate = any(link == existing[2] for existing in skroutz_products)
-                                if not is_duplicate:
-                                    with products_lock:
-                                        skroutz_products.append((title, price, link, image_url))
+                                results.add("skroutz", title, price, link, image_url)
                         except Exception as e:
-                            safe_print("Error processing product link")
+                            skroutz_items("Error processing product link: %s", e)
         
         # Αν έχουμε product cards, επεξεργασία με την κανονική ροή
         else:
-            for product in products:
+            # Όλα τα πεδία όλων των καρτών με ένα μόνο execute_script αντί για ένα round trip ανά επιλογέα
+            cards_data = driver.execute_script(
+                SKROUTZ_CARDS_SCRIPT, products,
+                SKROUTZ_TITLE_SELECTORS, SKROUTZ_PRICE_SELECTORS, SKROUTZ_LINK_SELECTORS, SKROUTZ_IMAGE_SELECTORS
+            )
+            phases.mark("extract")
+            amounts = prices.parse_prices([next((text for text in card['prices'] if text), None) for card in cards_data])
+            for card, price in zip(cards_data, amounts):
                 try:
-                    # Βελτιωμένη εξαγωγή τίτλου
-                    title_selectors = [
-                        ".//h2",
-                        ".//h3",
-                        ".//*[contains(@class, 'title')]",
-                        ".//*[contains(@class, 'name')]",
-                        ".//a[contains(@class, 'js-sku-link')]",
-                        ".//a[contains(@href, '/skoop/items/')]"
-                    ]
-                    
-                    title = None
-                    for title_selector in title_selectors:
-                        try:
-                            title_element = product.find_element(By.XPATH, title_selector)
-                            title = title_element.text.strip()
-                            if title:
-                                break
-                        except:
-                            continue
+                    # Βελτιωμένη εξαγωγή τίτλου: ο πρώτος επιλογέας με μη κενό κείμενο
+                    title = next((text for text in card['titles'] if text), None)
                     
                     if not title:
                         # Fallback: try getting text from the entire product card
-                        title = product.text.split('\n')[0].strip()
-                    
-                    # Βελτιωμένη εξαγωγή τιμής
-                    price_selectors = [
-                        ".//span[contains(text(),'€')]",
-                        ".//*[contains(@class, 'price')]",
-                        ".//*[contains(text(),'€')]",
-                        ".//*[contains(@class, 'amount')]"
-                    ]
-                    
-                    price_text = None
-                    for price_selector in price_selectors:
-                        try:
-                            price_element = product.find_element(By.XPATH, price_selector)
-                            price_text = price_element.text.strip()
-                            if price_text:
-                                break
-                        except:
-                            continue
-                    
-                    # Εξαγωγή συνδέσμου
-                    link_selectors = [
-                        ".//a[contains(@class, 'js-sku-link')]",
-                        ".//a[contains(@href, '/skoop/items/')]",
-                        ".//a[contains(@href, '/products/')]",
-                        ".//a"
-                    ]
+                        title = card['cardText'].split('\n')[0].strip()
                     
+                    # Εξαγωγή συνδέσμου (False: ο επιλογέας δεν βρήκε στοιχείο)
                     link = None
-                    for link_selector in link_selectors:
-                        try:
-                            link_element = product.find_element(By.XPATH, link_selector)
-                            link = link_element.get_attribute("href")
-                            if link and is_valid_product_link(link):
-                                break
-                        except:
+                    for candidate in card['links']:
+                        if candidate is False:
                             continue
+                        link = candidate
+                        if link and is_valid_product_link(link):
+                            break
                     
                     # Βελτιωμένη εξαγωγή εικόνας με βάση το JSON ανάλυσης
                     image_url = None
-                    image_selectors = [
-                        ".//div[contains(@class, 'image-container')]//img",  # Βασικός επιλογέας από την ανάλυση
-                        ".//div[contains(@class, 'sku-card-pic')]//img",     # Βασικός επιλογέας από την ανάλυση
-                        ".//img",                                            # Όποια εικόνα υπάρχει
-                        ".//*[contains(@class, 'image')]//img"
-                    ]
-
-                    for image_selector in image_selectors:
-                        try:
-                            image_elements = product.find_elements(By.XPATH, image_selector)
-                            for image_element in image_elements:
-                                # Έλεγχος για συγκεκριμένα μοτίβα εικόνων Skroutz
-                                src = image_element.get_attribute("src")
-                                if src and ('scdn.gr' in src or 'skroutz.gr' in src) and not src.endswith('.png'):
-                                    # Φιλτράρισμα των favicon και άλλων μικρών εικόνων
-                                    width = image_element.get_attribute("width")
-                                    height = image_element.get_attribute("height")
-                                    try:
-                                        if width and height and int(width) > 50 and int(height) > 50:
-                                            image_url = src
-                                            break
-                                    except:
-                                        # Αν δεν μπορούμε να μετατρέψουμε τις διαστάσεις, δεχόμαστε την εικόνα αν περιέχει 'thumbnail'
-                                        if 'thumbnail' in src:
-                                            image_url = src
-                                            break
-                                # Έλεγχος για data-src
-                                data_src = image_element.get_attribute("data-src")
-                                if not image_url and data_src and ('scdn.gr' in data_src or 'skroutz.gr' in data_src):
-                                    image_url = data_src
-                                    break
-                            if image_url:
+                    for image_elements in card['images']:
+                        for image_element in image_elements:
+                            # Έλεγχος για συγκεκριμένα μοτίβα εικόνων Skroutz
+                            src = image_element.get('src')
+                            if src and ('scdn.gr' in src or 'skroutz.gr' in src) and not src.endswith('.png'):
+                                # Φιλτράρισμα των favicon και άλλων μικρών εικόνων
+                                width = image_element.get('width')
+                                height = image_element.get('height')
+                                try:
+                                    if width and height and int(width) > 50 and int(height) > 50:
+                                        image_url = src
+                                        break
+                                except:
+                                    # Αν δεν μπορούμε να μετατρέψουμε τις διαστάσεις, δεχόμαστε την εικόνα αν περιέχει 'thumbnail'
+                                    if 'thumbnail' in src:
+                                        image_url = src
+                                        break
+                            # Έλεγχος για data-src
+                            data_src = image_element.get('dataSrc')
+                            if not image_url and data_src and ('scdn.gr' in data_src or 'skroutz.gr' in data_src):
+                                image_url = data_src
                                 break
-                        except Exception as e:
-                            continue
+                        if image_url:
+                            break
                     
                     # Αν δεν βρέθηκε εικόνα, δοκιμή να κατασκευαστεί το URL εικόνας από το ID του προϊόντος
                     if not image_url and link:
@@ -497,94 +520,87 @@ def search_skroutz(search_term, min_price, max_price):
                                 domain = 'a.scdn.gr' if int(item_id) % 3 == 0 else ('b.scdn.gr' if int(item_id) % 3 == 1 else 'c.scdn.gr')
                                 image_url = f"https://{domain}/ds/c2c/item_images/h-{item_id}/thumbnail_recent.jpeg"
                         except Exception as e:
-                            safe_print(" URL construction error")
-                    
-                    # Εξαγωγή τιμής και προσθήκη στα αποτελέσματα
-                    price = extract_price(price_text)
+                            skroutz_items("Image URL construction error: %s", e)
                     
+                    # Προσθήκη στα αποτελέσματα (η τιμή έχει ήδη εξαχθεί στο batch)
                     if price is not None and title and link:
                         if price is not None and min_price <= price <= max_price:
 
-                            with products_lock:
-                                skroutz_products.append((title, price, link, image_url))
+                            results.add("skroutz", title, price, link, image_url)
                 
                 except Exception as e:
-                    safe_print("Skroutz product error")
+                    skroutz_items("Skroutz product error: %s", e)
+    
+        phases.mark("process")
     
     except Exception as e:
-        safe_print("Skroutz search error")
+        skroutz_log.warning("Skroutz search error: %s", e)
+        results.fail("skroutz", str(e))
+        # Ο driver έμεινε σε άγνωστη κατάσταση (π.χ. σελίδα που φορτώνει ακόμα): δεν επιστρέφει στο pool
+        broken = True
     
     finally:
-        driver.quit()
+        driver_pool.release("skroutz", driver, broken=broken)
+    
+    return results.products("skroutz")
 
 
-def search_facebook(search_term, min_price, max_price, location="athens", max_pages=5):
+def search_facebook(search_term, min_price, max_price, location=urls.DEFAULT_LOCATION, max_pages=5, results=None, sort=None):
     """
     Αναζήτηση στο Facebook Marketplace με βάση τον όρο αναζήτησης και εύρος τιμής.
     """
-    global facebook_products
-    facebook_products = []  # Reset για κάθε αναζήτηση
-    
-    # Ρυθμίσεις Firefox
-    options = webdriver.FirefoxOptions()
-    options.add_argument('--headless')  # Σχόλιο για εμφάνιση του browser κατά την εκτέλεση
-    options.add_argument('--disable-gpu')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.set_preference("general.useragent.override", "Mozilla/5.0 (Windows NT 10.0; Win64; x64)")
-    options.page_load_strategy = 'eager'  # Φόρτωση μόνο του βασικού περιεχομένου
+    results = results if results is not None else ResultCollector()
     
-    # Εκκίνηση WebDriver
-    driver = webdriver.Firefox(options=options)
+    # Δανεισμός WebDriver από το pool του Facebook profile
+    phases = metrics.Phases("facebook")
+    driver = driver_pool.acquire("facebook")
+    broken = False
     wait = WebDriverWait(driver, 5.0)
+    phases.mark("driver")
     
     try:
         # Άνοιγμα του Facebook Marketplace με τον όρο αναζήτησης
-        base_url = f"https://www.facebook.com/marketplace/athens/search?query={search_term.replace(' ', '%20')}"
-        safe_print(f"🔄 Άνοιγμα του Facebook Marketplace με αναζήτηση: {search_term}...")
+        base_url = urls.facebook(search_term, location, min_price, max_price, sort)
+        facebook_log.info("Άνοιγμα του Facebook Marketplace (%s) με αναζήτηση: %s", location, search_term)
         driver.get(base_url)
         
-        # Περιμένουμε λίγο να φορτώσει η σελίδα
-        time.sleep(5)
+        # Αναμονή μέχρι να εμφανιστούν οι αγγελίες και να σταθεροποιηθεί η σελίδα
+        waits.settle(driver, "facebook", FACEBOOK_LISTINGS_CSS, min_count=1)
+        phases.mark("page_load")
         
         # Κλείσιμο του παραθύρου σύνδεσης/cookie αν εμφανιστεί
         try:
             close_buttons = driver.find_elements(By.XPATH, "//div[@aria-label='Close'] | //button[contains(@data-testid, 'cookie-policy')] | //button[contains(text(), 'Decline') or contains(text(), 'Απόρριψη')]")
             if close_buttons:
                 close_buttons[0].click()
-                safe_print("✅ Έκλεισε το παράθυρο σύνδεσης/cookie")
-                time.sleep(2)
+                facebook_log.debug("Έκλεισε το παράθυρο σύνδεσης/cookie")
+                waits.until_gone(driver, "facebook", close_buttons[0])
         except Exception as e:
-            safe_print(f"⚠️ Δεν βρέθηκε παράθυρο σύνδεσης ή προέκυψε σφάλμα: {str(e)}")
+            facebook_log.debug("Δεν βρέθηκε παράθυρο σύνδεσης ή προέκυψε σφάλμα: %s", e)
+        phases.mark("cookies")
         
-        # Για κάθε σελίδα αποτελεσμάτων (simulating pagination through scrolling)
+        # Το feed του Facebook δεν έχει σελίδες στο URL: κάθε "σελίδα" είναι ένα scroll στο τέλος του feed
+        processed = 0
         for page in range(1, max_pages + 1):
-            safe_print(f"📃 Επεξεργασία σελίδας {page}...")
+            if results.is_closed("facebook"):
+                break
+            facebook_log.debug("Επεξεργασία σελίδας %d", page)
             
-            # Προσθήκη κώδικα για σταδιακό scroll
-            try:
-                last_height = driver.execute_script("return document.body.scrollHeight")
-                scroll_pause_time = 1.0
-                scroll_attempts = 3
-                max_scroll_attempts = 3  # Μέγιστος αριθμός προσπαθειών scroll ανά "σελίδα"
-                
-                while scroll_attempts < max_scroll_attempts:
-                    # Scroll προς τα κάτω
-                    driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                    time.sleep(scroll_pause_time)
-                    
-                    # Υπολογισμός νέου ύψους scroll
-                    new_height = driver.execute_script("return document.body.scrollHeight")
+            if page > 1:
+                try:
+                    # Scroll προς τα κάτω και αναμονή για νέες αγγελίες
+                    loaded = waits.settle(driver, "facebook", FACEBOOK_LISTINGS_CSS, scroll_to=1.0)
                     
-                    # Αν δεν αλλάξει το ύψος, έχουμε φτάσει στο τέλος
-                    if new_height == last_height:
+                    # Αν δεν προστέθηκε τίποτα, έχουμε φτάσει στο τέλος
+                    if not loaded["grew"]:
                         break
-                    
-                    last_height = new_height
-                    scroll_attempts += 1
-                    safe_print(f"  ↓ Scroll {scroll_attempts}/{max_scroll_attempts}")
-            except Exception as e:
-                safe_print(f"⚠️ Σφάλμα κατά το scroll: {str(e)}")
+                except Exception as e:
+                    facebook_log.warning("Σφάλμα κατά το scroll: %s", e)
+                    break
+                finally:
+                    phases.mark("scroll")
+            
+            found_before = results.count("facebook")
             
             # Εύρεση όλων των αγγελιών στην τρέχουσα "σελίδα"
             try:
@@ -597,7 +613,10 @@ def search_facebook(search_term, min_price, max_price, location="athens", max_pa
                 if not listings:
                     listings = driver.find_elements(By.CSS_SELECTOR, "div.x1iorvi4")  # Πιθανός επιλογέας Facebook
                 
-                safe_print(f"  🔍 Βρέθηκαν {len(listings)} αγγελίες για επεξεργασία")
+                # Οι αγγελίες των προηγούμενων σελίδων είναι ακόμα στο feed· επεξεργάζονται μόνο οι νέες
+                listings, processed = listings[processed:], len(listings)
+                facebook_log.debug("Βρέθηκαν %d αγγελίες για επεξεργασία", len(listings))
+                phases.mark("extract")
                 
                 for listing in listings:
                     try:
@@ -623,7 +642,7 @@ def search_facebook(search_term, min_price, max_price, location="athens", max_pa
                                 continue
 
                             price_text = price_element[0].text.strip()
-                            price = extract_price(price_text)
+                            price = prices.parse_price(price_text)
 
                             if price is None:
                                 continue
@@ -633,7 +652,7 @@ def search_facebook(search_term, min_price, max_price, location="athens", max_pa
                                 continue
                                 
                         except Exception as e:
-                            safe_print(f"⚠️ Σφάλμα εξαγωγής τιμής: {str(e)}")
+                            facebook_items("Σφάλμα εξαγωγής τιμής: %s", e)
                             continue
                         
                         # Εξαγωγή συνδέσμου
@@ -648,7 +667,7 @@ def search_facebook(search_term, min_price, max_price, location="athens", max_pa
                                         link = href
                                         break
                         except Exception as e:
-                            safe_print(f"⚠️ Σφάλμα εξαγωγής συνδέσμου: {str(e)}")
+                            facebook_items("Σφάλμα εξαγωγής συνδέσμου: %s", e)
                         
                         # Εξαγωγή εικόνας
                         image_url = None
@@ -665,92 +684,79 @@ def search_facebook(search_term, min_price, max_price, location="athens", max_pa
                                         src = "https:" + src
                                     image_url = src
                         except Exception as e:
-                            safe_print(f"⚠️ Σφάλμα εξαγωγής εικόνας: {str(e)}")
+                            facebook_items("Σφάλμα εξαγωγής εικόνας: %s", e)
                         
                         # Προσθήκη προϊόντος στη λίστα αν δεν υπάρχει ήδη και έχει όλα τα απαραίτητα στοιχεία
-                        if title and price and link and (not any(link == existing[2] for existing in facebook_products)):
-                            with products_lock:
-                                facebook_products.append((title, price, link, image_url))
-                                safe_print(f"  ✅ Προστέθηκε: {title} - {price}€")
+                        if title and price is not None and link and results.add("facebook", title, price, link, image_url):
+                            facebook_items("Προστέθηκε: %s - %s€", title, price)
                     
                     except Exception as e:
-                        safe_print(f"⚠️ Σφάλμα επεξεργασίας αγγελίας: {str(e)}")
+                        facebook_items("Σφάλμα επεξεργασίας αγγελίας: %s", e)
                         continue
             
             except Exception as e:
-                safe_print(f"⚠️ Σφάλμα εύρεσης αγγελιών: {str(e)}")
+                facebook_log.warning("Σφάλμα εύρεσης αγγελιών: %s", e)
+            # Στο Facebook η ανάγνωση των πεδίων γίνεται ανά αγγελία (WebElement), άρα μετράει ως process
+            phases.mark("process")
+            
+            # Σταματάμε όταν μια σελίδα δεν φέρνει καμία νέα αγγελία στο εύρος τιμής
+            if page > 1 and results.count("facebook") == found_before:
+                break
         
         # Τελική αναφορά
-        safe_print(f"\n📊 Συνολικά βρέθηκαν {len(facebook_products)} προϊόντα στο εύρος τιμής {min_price}€ - {max_price}€")
-        for idx, (title, price, link, _) in enumerate(facebook_products, 1):
-            safe_print(f"{idx}. {title} - {price}€ - {link}")
+        facebook_log.info("Βρέθηκαν %d προϊόντα στο εύρος τιμής %s€ - %s€", results.count("facebook"), min_price, max_price)
     
     except Exception as e:
-        import traceback
-        traceback.print_exc(file=sys.stderr)
-        safe_print(f"❌ Κρίσιμο σφάλμα: {str(e)}")
+        facebook_log.exception("Κρίσιμο σφάλμα: %s", e)
+        results.fail("facebook", str(e))
+        broken = True
     
     finally:
-        try:
-            driver.quit()
-        except:
-            pass
+        driver_pool.release("facebook", driver, broken=broken)
     
-    return facebook_products
+    return results.products("facebook")
 
-def search_vendora(search_term, min_price, max_price):
-    global vendora_products
-    vendora_products = []  # Reset for each search
+def search_vendora(search_term, min_price, max_price, results=None, use_http=True, page=1, sort=None):
+    results = results if results is not None else ResultCollector()
     
-    # Redirect stderr to handle encoding issues
-    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+    # Direct search URL (με όρια τιμής και ταξινόμηση στα query params)
+    direct_url = urls.vendora(search_term, page, min_price, max_price, sort)
     
-    options = webdriver.FirefoxOptions()
-    options.add_argument('--headless')  # Enable headless mode
-    options.add_argument('--disable-gpu')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_argument('--window-size=1920,1080')  # Larger window for headless mode
-    options.set_preference("general.useragent.override", "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/99.0.9999.99 Safari/537.36")
+    # Γρήγορη διαδρομή χωρίς browser, με fallback στο Selenium αν δεν βρει τίποτα
+    if use_http and http_engine.engine_for("vendora") != "selenium":
+        products = http_fast_path("vendora", direct_url, min_price, max_price)
+        if products or http_engine.engine_for("vendora") == "http":
+            results.extend("vendora", products)
+            return results.products("vendora")
     
-    # Βελτιστοποίηση φόρτωσης σελίδας
-    options.set_preference("network.cookie.cookieBehavior", 0)  # Accept all cookies
-    options.set_preference("network.cookie.lifetimePolicy", 0)  # Keep cookies until expiration
-    options.set_preference("privacy.cookies.cookieBehavior", 0)  # Accept all cookies
-    options.set_preference("dom.disable_beforeunload", True)  # Disable pre-exit warnings
-    options.set_preference("browser.tabs.disableBackgroundZombification", False)  # Speed up tab switching
-    options.set_preference("network.http.pipelining", True)  # Enable HTTP pipelining
-    options.set_preference("network.http.proxy.pipelining", True)
-    options.set_preference("network.http.max-connections", 256)  # Increase max connections
-    options.set_preference("network.http.max-connections-per-server", 32)
-
-    driver = webdriver.Firefox(options=options)
+    phases = metrics.Phases("vendora")
+    driver = driver_pool.acquire("vendora")
+    broken = False
     wait = WebDriverWait(driver, 2)  # Μειωμένος χρόνος αναμονής για πιο επιθετική αναζήτηση
+    phases.mark("driver")
 
     try:
-        # Direct search URL
-        direct_url = f"https://vendora.gr/items?q={search_term.replace(' ', '+')}"
         driver.get(direct_url)
-        safe_print(f"Navigating to URL: {direct_url}")
-        time.sleep(3)  # Μειωμένος χρόνος αναμονής αρχικής φόρτωσης
+        vendora_log.debug("Navigating to URL: %s", direct_url)
+        waits.settle(driver, "vendora", VENDORA_LISTINGS_CSS, min_count=1)
+        phases.mark("page_load")
 
         # Scroll to load more results
-        safe_print("Loading more results...")
         previous_product_count = 0
         max_attempts = 3  # Μειώσαμε τον αριθμό των προσπαθειών για ταχύτερη εκτέλεση
         attempts = 0
         no_new_products_count = 0
 
-        while attempts < max_attempts:
+        while attempts < max_attempts and not results.is_closed("vendora"):
             # Μετρήστε τον τρέχοντα αριθμό προϊόντων
             current_count = len(driver.find_elements(By.CSS_SELECTOR, 'a[href*="/items/"]'))
-            safe_print(f"Current product count: {current_count}")
+            vendora_log.debug("Current product count: %d", current_count)
             
             # Εάν δεν προστέθηκαν νέα προϊόντα, αυξήστε τον μετρητή
             if current_count == previous_product_count:
                 no_new_products_count += 1
                 if no_new_products_count >= 2:  # Τερματισμός μετά από 2 συνεχόμενες προσπάθειες χωρίς νέα προϊόντα
-                    safe_print("No new products after multiple scrolls. Finished loading.")
+                    vendora_log.debug("No new products after multiple scrolls. Finished loading.")
                     break
             else:
                 no_new_products_count = 0  # Επαναφορά μετρητή αν βρέθηκαν νέα προϊόντα
@@ -758,21 +764,13 @@ def search_vendora(search_term, min_price, max_price):
             # Αποθηκεύστε τον τρέχοντα αριθμό προϊόντων για σύγκριση
             previous_product_count = current_count
             
-            # Πιο επιθετικό scrolling για ταχύτερη φόρτωση
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight * 0.2);")
-            time.sleep(0.3)
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight * 0.4);")
-            time.sleep(0.3)
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight * 0.6);")
-            time.sleep(0.3)
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight * 0.8);")
-            time.sleep(0.3)
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(0.1)
+            # Scroll στο τέλος· η αναμονή τελειώνει μόλις η σελίδα σταματήσει να φορτώνει
+            waits.settle(driver, "vendora", VENDORA_LISTINGS_CSS, scroll_to=1.0)
             
             attempts += 1
 
-        safe_print(f"Finished loading after {attempts} scroll attempts. Found {previous_product_count} potential product links.")
+        vendora_log.debug("Finished loading after %d scroll attempts. Found %d potential product links.", attempts, previous_product_count)
+        phases.mark("scroll")
                 
         # JavaScript to extract products with images - βελτιστοποιημένο για ταχύτητα
         js_products = driver.execute_script("""
@@ -819,9 +817,11 @@ def search_vendora(search_term, min_price, max_price):
         
         return products;
         """)
+        phases.mark("extract")
 
-        # Process products extracted by JavaScript
-        for product in js_products:
+        # Process products extracted by JavaScript (οι τιμές όλων σε ένα batch)
+        amounts = prices.parse_prices([(product.get('price') or '').strip() for product in js_products])
+        for product, parsed_price in zip(js_products, amounts):
             try:
                 title = product.get('title', '').strip()
                 price_text = product.get('price', '').strip()
@@ -832,39 +832,12 @@ def search_vendora(search_term, min_price, max_price):
                 if not link or '/items/' not in link:
                     continue
                 
-                # Extract price - βελτιωμένη έκδοση για σωστή διαχείριση διαχωριστικών χιλιάδων
+                # Χωρίς κείμενο τιμής η αγγελία κρατιέται με τιμή 0, όπως πριν· με μη αναγνώσιμη τιμή παραλείπεται
                 price = 0
                 if price_text:
-                    # Καθαρισμός κειμένου
-                    clean_price_text = price_text.replace(' ', '').replace('€', '').replace('ευρώ', '')
-                    
-                    # Έλεγχος για μορφοποίηση με τελεία ως διαχωριστικό χιλιάδων (π.χ. 1.500)
-                    if '.' in clean_price_text and ',' not in clean_price_text:
-                        # Αφαιρούμε τις τελείες που είναι διαχωριστικά χιλιάδων
-                        price_str = clean_price_text.replace('.', '')
-                    elif '.' in clean_price_text and ',' in clean_price_text:
-                        # Περίπτωση 1.234,56
-                        if clean_price_text.rindex('.') < clean_price_text.rindex(','):
-                            price_str = clean_price_text.replace('.', '').replace(',', '.')
-                        # Περίπτωση 1,234.56
-                        else:
-                            price_str = clean_price_text.replace(',', '')
-                    elif ',' in clean_price_text:
-                        # Μετατροπή κόμματος σε τελεία για δεκαδικά
-                        price_str = clean_price_text.replace(',', '.')
-                    else:
-                        # Απλός αριθμός χωρίς διαχωριστικά
-                        price_str = clean_price_text
-                    
-                    try:
-                        # Εξαγωγή μόνο των αριθμών και τελείας (δεκαδικά) αν υπάρχουν άλλοι χαρακτήρες
-                        price_match = re.search(r'(\d+\.?\d*)', price_str)
-                        if price_match:
-                            price = float(price_match.group(1))
-                        else:
-                            continue
-                    except ValueError:
-                        continue  # Παραλείπουμε αντί να καταγράφουμε σφάλμα για ταχύτητα
+                    if parsed_price is None:
+                        continue
+                    price = parsed_price
                 
                 # Βεβαιωθείτε ότι min_price και max_price είναι float πριν τη σύγκριση
                 min_price_float = float(min_price) if min_price is not None else None
@@ -872,100 +845,546 @@ def search_vendora(search_term, min_price, max_price):
                 
                 # Check if price is within the specified range
                 if (min_price_float is None or max_price_float is None) or (min_price_float <= price <= max_price_float):
-                    # Παραλείπουμε τον έλεγχο διπλότυπων για απλοποίηση και ταχύτητα
-                    # καθώς έχουμε ήδη ελέγξει στο JavaScript με το processedUrls Set
-                    vendora_products.append((title, price, link, image_url))
+                    # Ο έλεγχος διπλότυπων στο collector είναι O(1), οπότε δεν κοστίζει
+                    results.add("vendora", title, price, link, image_url)
 
             except Exception as e:
-                # Σε παραγωγικό περιβάλλον μπορείτε να αφαιρέσετε την εκτύπωση για ταχύτητα
-                # safe_print(f"Σφάλμα επεξεργασίας προϊόντος: {e}")
+                vendora_items("Σφάλμα επεξεργασίας προϊόντος: %s", e)
                 continue
 
-        # Print diagnostic information
-        safe_print(f"Total products found: {len(vendora_products)}")
+        phases.mark("process")
+        vendora_log.info("Total products found: %d", results.count("vendora"))
 
     except Exception as e:
-        safe_print("Vendora search error")
+        vendora_log.warning("Vendora search error: %s", e)
+        results.fail("vendora", str(e))
+        broken = True
+    finally:
+        driver_pool.release("vendora", driver, broken=broken)
+    
+    return results.products("vendora")
+
+
+SCRAPERS = {
+    "skroutz": search_skroutz,
+    "vendora": search_vendora,
+    "facebook": search_facebook
+}
+# Πηγές που ψάχνουν σε συγκεκριμένη τοποθεσία
+LOCATED_SOURCES = {"facebook"}
+# Πηγές με plain-HTTP fast path
+SEARCH_URLS = {
+    "skroutz": urls.skroutz,
+    "vendora": urls.vendora
+}
+
+_scraper_executor = ThreadPoolExecutor(max_workers=SCRAPER_THREADS, thread_name_prefix="scraper")
+
+
+@contextmanager
+def tracked(source, results):
+    """Οι αναμονές και τα spans του τρέχοντος thread καταγράφονται στο collector της πηγής."""
+    previous_wait = waits.track(lambda seconds: results.add_wait(source, seconds))
+    previous_span = metrics.track(lambda phase, seconds: results.add_span(source, phase, seconds))
+    try:
+        yield
     finally:
-        driver.quit()
+        waits.track(previous_wait)
+        metrics.track(previous_span)
+
+
+def call_scraper(source, *args, expect_products=True, **kwargs):
+    """Μία κλήση scraper (σελίδα, πόλη ή ολόκληρη αναζήτηση) μέσα στο rate limit της πηγής.
+
+    Για το adaptive concurrency ένα σφάλμα στο collector ή ένα άδειο αποτέλεσμα (συνήθως
+    block/CAPTCHA) μετρά ως αποτυχία, εκτός αν δεν αναμένονται προϊόντα (σελίδες μετά την πρώτη).
+    """
+    with rate_limit.request(source) as outcome:
+        products = SCRAPERS[source](*args, **kwargs)
+        outcome.report(len(products or ()) if expect_products else 1)
+        collector = kwargs.get("results")
+        if collector is not None and collector.error(source) is not None:
+            outcome.fail()
+    return products
+
+
+def merge_pages(source, results, pages):
+    """Προσθήκη των προϊόντων των σελίδων με τη σειρά τους.
+
+    Επιστρέφει False στην πρώτη σελίδα που δεν φέρνει κανένα νέο προϊόν στο
+    εύρος τιμής (οι επόμενες σελίδες αγνοούνται), ώστε να σταματήσει η σελιδοποίηση.
+    """
+    for products in pages:
+        if not results.extend(source, products):
+            return False
+    return True
+
+
+def scrape_page(source, search_term, min_price, max_price, results, page, **kwargs):
+    """Μία σελίδα μιας πηγής σε δικό της collector· επιστρέφει τα προϊόντα της."""
+    page_results = ResultCollector(parent=results)
+    try:
+        with tracked(source, results):
+            call_scraper(source, search_term, min_price, max_price, results=page_results, page=page, expect_products=page == 1, **kwargs)
+    except Exception as e:
+        if page == 1:
+            raise
+        # Μια σελίδα πέρα από την πρώτη που αποτυγχάνει απλώς τερματίζει τη σελιδοποίηση
+        logs.get_logger(source).warning("page %d error: %s", page, e)
+    if page_results.error(source) is not None and page == 1:
+        results.fail(source, page_results.error(source))
+    return page_results.products(source)
+
+
+def scrape_pages(source, search_term, min_price, max_price, results, max_pages, **kwargs):
+    """Σελίδα 1 και μετά οι 2..N ανά PAGE_CONCURRENCY ταυτόχρονα (κάθε μία με δικό της driver/αίτημα)."""
+    if not merge_pages(source, results, [scrape_page(source, search_term, min_price, max_price, results, 1, **kwargs)]):
+        return
+    if max_pages < 2:
+        return
+    with ThreadPoolExecutor(max_workers=PAGE_CONCURRENCY, thread_name_prefix=f"{source}-pages") as executor:
+        for first in range(2, max_pages + 1, PAGE_CONCURRENCY):
+            if results.is_closed(source):
+                return
+            pages = range(first, min(first + PAGE_CONCURRENCY, max_pages + 1))
+            batch = executor.map(lambda page: scrape_page(source, search_term, min_price, max_price, results, page, **kwargs), pages)
+            if not merge_pages(source, results, batch):
+                return
+
+
+def scrape_region(source, search_term, min_price, max_price, results, location, **kwargs):
+    """Μία πόλη σε δικό της collector (και δικό της driver)· επιστρέφει τον collector."""
+    region_results = ResultCollector(parent=results)
+    try:
+        with tracked(source, results):
+            call_scraper(source, search_term, min_price, max_price, location=location, results=region_results, **kwargs)
+    except Exception as e:
+        region_results.fail(source, str(e))
+    return region_results
+
+
+def scrape_regions(source, search_term, min_price, max_price, results, locations, **kwargs):
+    """Πολλές πόλεις παράλληλα, έως REGION_CONCURRENCY τη φορά.
+
+    Τα προϊόντα κάθε πόλης συγχωνεύονται στο collector μόλις τελειώσει, οπότε
+    μια αγγελία που εμφανίζεται σε γειτονικές πόλεις κρατιέται μία φορά. Το πρώτο
+    σφάλμα πόλης καταγράφεται στην πηγή· αν άλλες πόλεις βρήκαν κάτι, βγαίνει partial.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, min(REGION_CONCURRENCY, len(locations))), thread_name_prefix=f"{source}-regions") as executor:
+        futures = {
+            executor.submit(scrape_region, source, search_term, min_price, max_price, results, location, **kwargs): location
+            for location in locations
+        }
+        for future in as_completed(futures):
+            region_results = future.result()
+            added = results.extend(source, region_results.products(source))
+            metrics.inc("search_region_products_total", added, source=source)
+            if region_results.error(source) is not None:
+                logs.get_logger(source).warning("%s error: %s", futures[future], region_results.error(source))
+                results.fail(source, f"{futures[future]}: {region_results.error(source)}")
+
+
+def run_scraper(source, search_term, min_price, max_price, results, max_pages=1, locations=None, **kwargs):
+    """Τρέχει τον scraper μιας πηγής στο τρέχον thread, καταγράφοντας αναμονές και spans στο collector."""
+    try:
+        with tracked(source, results):
+            if source in SEARCH_URLS:
+                # Σελίδες με αριθμό στο URL: ανάκτηση σε παράλληλες ομάδες
+                scrape_pages(source, search_term, min_price, max_price, results, max_pages, **kwargs)
+            elif source in LOCATED_SOURCES and locations and len(locations) > 1:
+                scrape_regions(source, search_term, min_price, max_price, results, locations, max_pages=max_pages, **kwargs)
+            elif source in LOCATED_SOURCES and locations:
+                call_scraper(source, search_term, min_price, max_price, location=locations[0], results=results, max_pages=max_pages, **kwargs)
+            else:
+                call_scraper(source, search_term, min_price, max_price, results=results, max_pages=max_pages, **kwargs)
+    except Exception as e:
+        logs.get_logger(source).warning("Scraper error: %s", e)
+        results.fail(source, str(e))
+
+
+def source_timeout(source, budget=None):
+    """Χρόνος (δευτερόλεπτα) που δικαιούται μια πηγή: η προθεσμία της, περιορισμένη από το budget του search."""
+    timeout = SOURCE_DEADLINES.get(source, SEARCH_DEADLINE)
+    if budget is not None:
+        timeout = min(timeout, budget * BUDGET_SHARES.get(source, 1.0))
+    return timeout
+
+
+def source_status(source, results, batch, timed_out):
+    """complete | partial (κόπηκε ή απέτυχε αφού βρήκε κάτι) | timed_out | error."""
+    failed = results.error(source) is not None
+    if not timed_out and not failed:
+        return "complete"
+    if len(batch):
+        return "partial"
+    return "timed_out" if timed_out else "error"
+
+
+def finish_source(source, results, source_started, timed_out=False):
+    """Κλείνει την πηγή στο collector και επιστρέφει (ProductBatch, summary) της."""
+    results.close(source)
+    batch = results.batch(source)
+    summary = {
+        "status": source_status(source, results, batch, timed_out),
+        "count": len(batch),
+        "elapsedMs": int((time.monotonic() - source_started) * 1000),
+        "waitMs": int(results.wait_seconds(source) * 1000)
+    }
+    if results.error(source) is not None:
+        summary["error"] = results.error(source)
+    phases = results.span_seconds(source)
+    if phases:
+        # Χρόνος ανά φάση (driver, page_load, scroll, extract, process, ...), αθροισμένος σε σελίδες/πόλεις
+        summary["phasesMs"] = {phase: int(seconds * 1000) for phase, seconds in phases.items()}
+    return batch, summary
+
+
+def products_record(source, batch, summary):
+    # Τα dicts εξόδου φτιάχνονται μόνο εδώ, ακριβώς πριν τη σειριοποίηση
+    record = {"type": "products", "source": source, "items": batch.records()}
+    record.update((key, value) for key, value in summary.items() if key != "count")
+    return record
+
+
+def complete_search(batches, sources_summary, started, on_record):
+    """Ένωση των πηγών σε ένα ProductBatch ταξινομημένο κατά τιμή."""
+    with metrics.span("merge", "search"):
+        # Η ίδια αγγελία ανεβασμένη σε πολλές πηγές εμφανίζεται μία φορά
+        all_products = ProductBatch.concat(batches).drop_near_duplicates()
         
+        # TimSort πάνω στη στήλη τιμών (floats), χωρίς αναζητήσεις σε dicts
+        all_products = all_products.sorted_by_price()
+    metrics.observe("search_seconds", time.monotonic() - started)
+    
+    if on_record:
+        on_record({
+            "type": "summary",
+            "count": len(all_products),
+            "elapsedMs": int((time.monotonic() - started) * 1000),
+            "sources": sources_summary
+        })
+    
+    return all_products
 
 
+def search_sources(search_term, min_price, max_price, max_pages=1, on_record=None, sources=None, budget=None, sort=None, locations=None, results=None):
+    """Search across multiple sources.
 
-def search_sources(search_term, min_price, max_price, max_pages=1):
-    """Search across multiple sources."""
+    Αν δοθεί `on_record`, καλείται με ένα record {"type": "products", ...} μόλις
+    τελειώσει κάθε πηγή και με ένα τελικό {"type": "summary", ...} με χρόνους και πλήθη.
+    Το `sources` περιορίζει την αναζήτηση σε συγκεκριμένες πηγές (προεπιλογή: όλες).
+    Το `budget` (δευτερόλεπτα) είναι η συνολική προθεσμία· κάθε πηγή παίρνει μέρος της
+    και όσες δεν προλάβουν επιστρέφουν ό,τι βρήκαν με status partial/timed_out.
+    Το `sort` (ένα από τα urls.SORT_ORDERS) ζητείται από τα ίδια τα marketplaces.
+    Το `locations` (λίστα πόλεων, προεπιλογή urls.DEFAULT_LOCATION) αφορά το Facebook·
+    με περισσότερες από μία, οι πόλεις ψάχνονται παράλληλα και τα αποτελέσματα συγχωνεύονται.
+    Με SEARCH_ORCHESTRATION=threads χρησιμοποιείται το παλιό μοντέλο ενός thread ανά πηγή.
+    Το `results` (ένα άδειο ResultCollector) επιτρέπει στον caller να σταματήσει το search (cancel_search).
+    Επιστρέφει ένα ProductBatch ταξινομημένο κατά τιμή (records() για dicts).
+    """
     try:
         min_price = float(min_price)
         max_price = float(max_price)
+    except ValueError:
+        log.error("Invalid prices provided. Please enter valid numbers for minimum and maximum prices.")
+        return None, None
+    
+    try:
+        max_pages = max(1, int(max_pages))
+    except (TypeError, ValueError):
+        max_pages = 1
 
-        safe_print(f"Processing prices: {min_price} - {max_price}")
-        
-        # Εκκινήστε τα threads
-        skroutz_thread = threading.Thread(target=lambda: safe_thread_run(search_skroutz, search_term, min_price, max_price))
-        vendora_thread = threading.Thread(target=lambda: safe_thread_run(search_vendora, search_term, min_price, max_price))
-        facebook_thread = threading.Thread(target=lambda: safe_thread_run(search_facebook, search_term, min_price, max_price))
-
-        skroutz_thread.start()
-        vendora_thread.start()
-        facebook_thread.start()
-
-        skroutz_thread.join()
-        vendora_thread.join()
-        facebook_thread.join()
-
-        # Pre-allocate list with estimated size for better performance
-        estimated_size = len(skroutz_products) + len(vendora_products) + len(facebook_products)
-        all_products = []
-        all_products.reserve(estimated_size) if hasattr(all_products, 'reserve') else None  # Only in Python 3.12+
-
-        # Streamlined filtering and conversion
-        for source, products_list in [
-            ("skroutz", skroutz_products), 
-            ("vendora", vendora_products),
-            ("facebook", facebook_products)
-        ]:
-            for product_data in products_list:
-                title, price, link = product_data[0], product_data[1], product_data[2]
-                image_url = product_data[3] if len(product_data) > 3 else None
-                
-                if price is not None and min_price <= price <= max_price:
-
-                    all_products.append({
-                        "title": title, 
-                        "price": price, 
-                        "link": link,
-                        "source": source,
-                        "imageUrl": image_url
-                    })
-
-        # Χρήση της TimSort (υλοποίηση της Python) άμεσα για καλύτερη απόδοση
-        all_products.sort(key=lambda x: x['price'])
+    log.debug("Processing prices: %s - %s", min_price, max_price)
+    
+    if ORCHESTRATION == "threads":
+        products = search_sources_threaded(search_term, min_price, max_price, max_pages, on_record, sources, budget, sort, locations, results)
+    else:
+        products = asyncio.run(search_sources_async(search_term, min_price, max_price, max_pages, on_record, sources, budget, sort, locations, results))
+    index_products(search_term, products)
+    return products
+
+
+def index_products(search_term, products):
+    """Γράφει τα προϊόντα ενός search στο τοπικό listing index (αν είναι ενεργό).
+
+    Κι ένα άδειο αποτέλεσμα σημειώνει τον όρο ως ψαγμένο, ώστε ο refresher να μην τον ξαναζητά σε κάθε γύρο.
+    Η εγγραφή γίνεται στο thread του index: το job (και το summary του) δεν την περιμένει.
+    """
+    if listing_index.index is None or not isinstance(products, ProductBatch):
+        return
+    listing_index.index.add_later(search_term, products)
+
+
+def cancel_search(results):
+    """Σταματά ένα search που τρέχει: οι scrapers βγαίνουν στο επόμενο σημείο ελέγχου.
+
+    Κάθε πηγή κρατά ό,τι έχει ήδη βρει, με status partial/error, ώστε να μην περάσει για πλήρης.
+    """
+    for source in SCRAPERS:
+        results.fail(source, "Search cancelled")
+        results.close(source)
+
+
+def search_sources_threaded(search_term, min_price, max_price, max_pages=1, on_record=None, sources=None, budget=None, sort=None, locations=None, results=None):
+    """Ένα thread ανά πηγή· το join κάθε πηγής περιμένει μέχρι την προθεσμία της."""
+    started = time.monotonic()
+    results = results if results is not None else ResultCollector()
+    batches = []
+    sources_summary = {}
+    records_lock = threading.Lock()
+
+    def report(source, source_started, timed_out=False):
+        with records_lock:
+            # Μια πηγή που έληξε αναφέρεται μία φορά, ακόμα κι αν το thread της τελειώσει αργότερα
+            if source in sources_summary:
+                return
+            batch, summary = finish_source(source, results, source_started, timed_out)
+            batches.append(batch)
+            sources_summary[source] = summary
+            # Αποστολή των αποτελεσμάτων της πηγής αμέσως, χωρίς αναμονή για τις υπόλοιπες
+            if on_record:
+                on_record(products_record(source, batch, summary))
+
+    def run_source(source):
+        source_started = time.monotonic()
+        run_scraper(source, search_term, min_price, max_price, results, max_pages, locations, sort=sort)
+        report(source, source_started)
+
+    # Εκκινήστε τα threads (daemon, ώστε ένας scraper που κόλλησε να μην κρατά τη διεργασία)
+    threads = {
+        source: threading.Thread(target=run_source, args=(source,), daemon=True)
+        for source in (sources or SCRAPERS) if source in SCRAPERS
+    }
+
+    for thread in threads.values():
+        thread.start()
+
+    for source, thread in threads.items():
+        thread.join(max(0.0, started + source_timeout(source, budget) - time.monotonic()))
+        if thread.is_alive():
+            metrics.inc("search_source_timeouts_total", source=source)
+            report(source, started, timed_out=True)
+
+    return complete_search(batches, sources_summary, started, on_record)
+
+
+async def http_fast_path_async(source, url, min_price, max_price, results=None, expect_products=True):
+    """Το http_fast_path χωρίς να μπλοκάρει το event loop, μέσα στο rate limit της πηγής.
+
+    Το loop δεν έχει tracker ανά πηγή, οπότε τα spans γράφονται απευθείας στο `results`.
+    Ένα rate_limit.Throttled περνά στον caller: η πηγή αποτυγχάνει χωρίς fallback στον Selenium.
+    """
+    try:
+        async with rate_limit.request_async(source) as outcome:
+            # Η αναμονή για το rate limit δεν μετρά στο http_fetch
+            started = time.perf_counter()
+            listings = await http_engine.fetch_listings_async(source, url)
+            outcome.report(len(listings) if expect_products else 1)
+        fetched = time.perf_counter()
+        products = listings_to_products(listings, min_price, max_price)
+        for phase, seconds in (("http_fetch", fetched - started), ("process", time.perf_counter() - fetched)):
+            metrics.record_span(phase, source, seconds)
+            if results is not None:
+                results.add_span(source, phase, seconds)
+    except rate_limit.Throttled:
+        # Δεν φταίει το HTTP: ο Selenium θα έκανε το ίδιο αίτημα στο ίδιο marketplace, οπότε η πηγή αποτυγχάνει
+        raise
+    except Exception as e:
+        logs.get_logger(source).warning("HTTP fast path error: %s", e)
+        products = []
+    
+    if not products:
+        metrics.inc("http_engine_fallbacks_total", source=source)
+        logs.get_logger(source).info("HTTP fast path found no products")
+    return products
+
+
+async def scrape_source_async(source, search_term, min_price, max_price, results, max_pages=1, sort=None, locations=None):
+    """Async HTTP fast path όπου υπάρχει, αλλιώς (ή αν δεν βρει τίποτα) ο Selenium scraper σε thread."""
+    use_http = source in SEARCH_URLS and http_engine.engine_for(source) != "selenium"
+    if use_http:
+        products = await http_fast_path_async(source, SEARCH_URLS[source](search_term, 1, min_price, max_price, sort), min_price, max_price, results)
+        if products or http_engine.engine_for(source) == "http":
+            if merge_pages(source, results, [products]):
+                # Σελίδες 2..N ως παράλληλα αιτήματα, ανά PAGE_CONCURRENCY
+                for first in range(2, max_pages + 1, PAGE_CONCURRENCY):
+                    if results.is_closed(source):
+                        break
+                    batch = await asyncio.gather(*(
+                        http_fast_path_async(source, SEARCH_URLS[source](search_term, page, min_price, max_price, sort), min_price, max_price, results,
+                                             expect_products=False)
+                        for page in range(first, min(first + PAGE_CONCURRENCY, max_pages + 1))
+                    ), return_exceptions=True)
+                    # Ένα Throttled σε κάποια σελίδα δεν χαλά τις υπόλοιπες: κρατάμε ό,τι ήρθε και η πηγή μένει partial
+                    errors = [page for page in batch if isinstance(page, BaseException)]
+                    for error in errors:
+                        if not isinstance(error, rate_limit.Throttled):
+                            raise error
+                    if not merge_pages(source, results, [page for page in batch if not isinstance(page, BaseException)]):
+                        break
+                    if errors:
+                        results.fail(source, str(errors[0]))
+                        break
+            return
+    
+    kwargs = {"use_http": False} if use_http else {}
+    await asyncio.get_running_loop().run_in_executor(
+        _scraper_executor,
+        lambda: run_scraper(source, search_term, min_price, max_price, results, max_pages, locations, sort=sort, **kwargs)
+    )
+
+
+async def search_sources_async(search_term, min_price, max_price, max_pages=1, on_record=None, sources=None, budget=None, sort=None, locations=None, results=None):
+    """Όλες οι πηγές ως coroutines σε ένα event loop.
+
+    Κάθε πηγή έχει τη δική της προθεσμία (SOURCE_DEADLINES, περιορισμένη από
+    το μερίδιό της στο `budget`) και όλες μαζί τη συνολική (`budget` ή
+    SEARCH_DEADLINE). Όποια πηγή αργεί ακυρώνεται και επιστρέφει ό,τι έχει
+    μαζέψει ως τότε στο collector. Πολλά searches μπορούν να τρέχουν ταυτόχρονα στο ίδιο loop.
+    """
+    started = time.monotonic()
+    deadline_at = started + (SEARCH_DEADLINE if budget is None else budget)
+    results = results if results is not None else ResultCollector()
+    batches = []
+    sources_summary = {}
+
+    async def run_source(source):
+        source_started = time.monotonic()
+        timeout = max(0.0, min(source_timeout(source, budget), deadline_at - source_started))
+        timed_out = False
+        try:
+            await asyncio.wait_for(scrape_source_async(source, search_term, min_price, max_price, results, max_pages, sort, locations), timeout)
+        except asyncio.TimeoutError:
+            # Ο Selenium scraper δεν διακόπτεται στη μέση· σταματά στο επόμενο σημείο ελέγχου
+            # και ό,τι προσθέσει μετά το κλείσιμο της πηγής αγνοείται
+            timed_out = True
+            metrics.inc("search_source_timeouts_total", source=source)
+            logs.get_logger(source).info("Deadline reached, returning partial results")
+        except Exception as e:
+            logs.get_logger(source).warning("Error: %s", e)
+            results.fail(source, str(e))
         
-        safe_print(f"Original min_price: {min_price}")
-        safe_print(f"Original max_price: {max_price}")
+        batch, summary = finish_source(source, results, source_started, timed_out)
+        batches.append(batch)
+        sources_summary[source] = summary
+        if on_record:
+            on_record(products_record(source, batch, summary))
+
+    await asyncio.gather(*(run_source(source) for source in (sources or SCRAPERS) if source in SCRAPERS))
+    return complete_search(batches, sources_summary, started, on_record)
+
+def serve_worker(offered=("json",)):
+    """Μακροχρόνια λειτουργία worker: δέχεται jobs ως JSON γραμμές στο stdin και απαντά με wire frames στο stdout.
+
+    Η μορφή των frames είναι η πρώτη από τις `offered` (του front end) που υποστηρίζει κι αυτή η διεργασία.
+    """
+    output_lock = threading.Lock()
+    job_lock = threading.Lock()  # Ένα search τη φορά ανά worker (τα jobs μοιράζονται τους drivers του pool)
+    job_thread = None
+    running = {}  # id -> ResultCollector του job που τρέχει, για το op "cancel"
+    fmt = wire.choose(offered)
+    # Το stdout είναι πλέον δυαδικό κανάλι· ένα αδέσποτο print() θα χάλαγε τα όρια των frames, οπότε πάει στο stderr
+    # (κρατάμε το wrapper και όχι μόνο το .buffer του: αν συλλεγόταν, θα έκλεινε και το buffer)
+    output = sys.stdout
+    sys.stdout = sys.stderr
+
+    def send(message, message_id=None):
+        with metrics.span("serialize", "worker"):
+            frame = wire.encode(message, fmt, message_id)
+        with output_lock:
+            output.buffer.write(frame)
+            output.buffer.flush()
+
+    def run_job(job, results):
+        job_id = job.get("id")
+        final = []
+
+        def forward(record):
+            # Τα products φεύγουν μόλις παραχθούν· το summary κρατιέται ως το τέλος του job
+            if record.get("type") == "summary":
+                final.append(record)
+            else:
+                send(record, job_id)
+
         try:
-            converted_min = float(min_price)
-            safe_print(f"Converted min_price: {converted_min}")
-        except ValueError as e:
-            safe_print(f"Failed to convert min_price: {e}")
+            products = search_sources(
+                job.get("searchTerm", ""),
+                job.get("minPrice", 0),
+                job.get("maxPrice", 10000),
+                job.get("maxPages", 1),
+                on_record=forward,
+                sources=job.get("sources"),
+                budget=float(job["budgetMs"]) / 1000 if job.get("budgetMs") else None,
+                sort=job.get("sort"),
+                locations=job.get("locations"),
+                results=results
+            )
+            if not isinstance(products, ProductBatch):
+                final.append({"type": "error", "error": "Invalid prices provided"})
+        except Exception as e:
+            log.exception("Job %s failed", job_id)
+            final.append({"type": "error", "error": str(e)})
+        finally:
+            # Με το τελικό record το pool θεωρεί τον worker ελεύθερο και του στέλνει το επόμενο job,
+            # οπότε το lock πρέπει να έχει ήδη αφεθεί (αλλιώς εκείνο παίρνει "Worker busy")
+            running.pop(job_id, None)
+            job_lock.release()
+            for record in final:
+                send(record, job_id)
+
+    if driver_pool.POOL_WARMUP:
+        driver_pool.warm_up()
+    send({"type": "ready", "pid": os.getpid(), "wire": fmt})
 
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
         try:
-            converted_max = float(max_price)
-            safe_print(f"Converted max_price: {converted_max}")
-        except ValueError as e:
-            safe_print(f"Failed to convert max_price: {e}")
-        
-        return all_products
+            message = json.loads(line)
+        except ValueError:
+            log.warning("Invalid worker message")
+            continue
+
+        op = message.get("op")
+        if op == "ping":
+            send({"type": "pong", "busy": job_lock.locked(), "metrics": metrics.snapshot()}, message.get("id"))
+        elif op == "search":
+            if not job_lock.acquire(blocking=False):
+                send({"type": "error", "error": "Worker busy"}, message.get("id"))
+                continue
+            results = ResultCollector()
+            running[message.get("id")] = results
+            job_thread = threading.Thread(target=run_job, args=(message, results), daemon=True)
+            job_thread.start()
+        elif op == "cancel":
+            # Το job τελειώνει κανονικά (με summary) και ο worker κρατά τους drivers του
+            results = running.get(message.get("job"))
+            if results is not None:
+                cancel_search(results)
+        elif op == "shutdown":
+            break
+
+    # Graceful shutdown: ολοκλήρωση του τρέχοντος job πριν την έξοδο (οι drivers κλείνουν στο atexit)
+    if job_thread is not None:
+        job_thread.join()
 
-    except ValueError:
-            safe_print(f"Error: Invalid prices provided. Please enter valid numbers for minimum and maximum prices.")
-            return None, None
 
 # Script execution
 if __name__ == "__main__":
+    if "--worker" in sys.argv[1:]:
+        # --wire=msgpack,json: οι μορφές που δέχεται το front end, κατά σειρά προτίμησης
+        offered = next((arg.split("=", 1)[1].split(",") for arg in sys.argv[1:] if arg.startswith("--wire=")), ["json"])
+        serve_worker(offered)
+        sys.exit(0)
+
+    ndjson = "--ndjson" in sys.argv[1:]
+    if ndjson:
+        sys.argv.remove("--ndjson")
+
     try:
         if len(sys.argv) < 4:
-            safe_print("❌ Not enough arguments provided")
+            log.error("Not enough arguments provided")
             print(json.dumps([]))
             sys.exit(0)
         
@@ -977,13 +1396,28 @@ if __name__ == "__main__":
         if len(sys.argv) >= 5:
             max_pages = sys.argv[4]
         
-        results = search_sources(search_term, min_price, max_price, max_pages)
+        # Προαιρετικά πόλεις του Facebook, χωρισμένες με κόμμα (π.χ. athens,thessaloniki)
+        locations = urls.parse_locations(sys.argv[5]) if len(sys.argv) >= 6 else None
+        
+        # Μια μεμονωμένη αναζήτηση δεν κερδίζει από το warm-up (θα άνοιγε και drivers που δεν θα χρησιμοποιήσει),
+        # εκτός αν ζητηθεί ρητά
+        if os.environ.get('DRIVER_POOL_WARMUP') == '1':
+            driver_pool.warm_up()
+        
+        if ndjson:
+            # Ένα record ανά γραμμή, μόλις τελειώνει κάθε πηγή
+            def print_record(record):
+                print(json.dumps(record, ensure_ascii=False), flush=True)
+
+            search_sources(search_term, min_price, max_price, max_pages, on_record=print_record, locations=locations)
+            sys.exit(0)
+        
+        results = search_sources(search_term, min_price, max_price, max_pages, locations=locations)
         
-        # Προστασία αν είναι None ή άδειο
-        if not results:
-            results = []
+        # Προστασία αν οι τιμές ήταν άκυρες
+        records = results.records() if isinstance(results, ProductBatch) else []
         
-        print(json.dumps(results, ensure_ascii=False))
+        print(json.dumps(records, ensure_ascii=False))
         sys.exit(0)  # ✅ Πάντα επιτυχία όταν φτάνει εδώ
 
     except Exception as e:
@@ -991,6 +1425,6 @@ if __name__ == "__main__":
             "error": str(e),
             "traceback": traceback.format_exc()
         }
-        safe_print(f"❌ Unhandled exception: {str(e)}")
+        log.exception("Unhandled exception: %s", e)
         print(json.dumps([]))  # ✅ Γυρνάει άδειο array στο output, για να μη σπάει το API
         sys.exit(0)  # ✅ Όχι αποτυχία, exit 0
\ No newline at end of file
@@ -0,0 +1,277 @@
+import os
+import time
+import asyncio
+import sqlite3
+import threading
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+
+import logs
+import metrics
+from results import SOURCES
+
+
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT', '1') == '1'
+# Κοινό αρχείο για όλες τις διεργασίες (workers, gunicorn) του ίδιου μηχανήματος
+RATE_LIMIT_PATH = os.environ.get('RATE_LIMIT_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rate_limit.sqlite3'))
+# Αιτήματα ανά δευτερόλεπτο και burst ανά marketplace, για όλες τις διεργασίες μαζί
+RATE_LIMITS = {
+    source: float(os.environ.get(f'RATE_LIMIT_{source.upper()}', default))
+    for source, default in (("skroutz", 2), ("vendora", 2), ("facebook", 0.5))
+}
+RATE_LIMIT_BURSTS = {
+    source: float(os.environ.get(f'RATE_LIMIT_BURST_{source.upper()}', default))
+    for source, default in (("skroutz", 5), ("vendora", 5), ("facebook", 2))
+}
+# Πάνω από τόση αναμονή (token ή θέση) το αίτημα δεν γίνεται καθόλου
+MAX_WAIT = float(os.environ.get('RATE_LIMIT_MAX_WAIT', 30))
+
+# AIMD ανά πηγή και διεργασία: +1 θέση ανά `limit` επιτυχίες, ×DECREASE όταν τα σφάλματα/άδεια
+# αποτελέσματα ξεπεράσουν το THRESHOLD στα τελευταία WINDOW αιτήματα (το πολύ μία μείωση ανά COOLDOWN)
+MAX_CONCURRENCY = {
+    source: int(os.environ.get(f'RATE_LIMIT_MAX_CONCURRENCY_{source.upper()}', default))
+    for source, default in (("skroutz", 8), ("vendora", 8), ("facebook", 4))
+}
+MIN_CONCURRENCY = 1
+WINDOW = int(os.environ.get('RATE_LIMIT_WINDOW', 20))
+THRESHOLD = float(os.environ.get('RATE_LIMIT_FAILURE_THRESHOLD', 0.3))
+DECREASE = float(os.environ.get('RATE_LIMIT_DECREASE', 0.5))
+COOLDOWN = float(os.environ.get('RATE_LIMIT_COOLDOWN', 10))
+
+log = logs.get_logger("ratelimit")
+
+
+class Throttled(Exception):
+    """A request to a marketplace would have waited longer than MAX_WAIT."""
+
+
+class SharedBuckets:
+    """Token buckets per source in SQLite, so every process on the host draws from the same ones.
+
+    take() reserves a token even when the bucket is empty (the balance goes
+    negative) and returns how long the caller must wait before using it: one
+    short IMMEDIATE transaction per request, no polling and no lock held while waiting.
+    """
+
+    def __init__(self, path=RATE_LIMIT_PATH, rates=RATE_LIMITS, bursts=RATE_LIMIT_BURSTS):
+        self.rates = rates
+        self.bursts = bursts
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS buckets (
+                source TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+        """)
+
+    def take(self, source, max_wait=MAX_WAIT):
+        """Seconds to wait before the request may go out, or None if that is more than `max_wait`."""
+        rate = self.rates.get(source)
+        if not rate:
+            return 0.0
+        burst = self.bursts.get(source, 1.0)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self._db.execute("SELECT tokens, updated FROM buckets WHERE source = ?", (source,)).fetchone()
+                tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+                wait = max(0.0, (1 - tokens) / rate)
+                if wait > max_wait:
+                    self._db.execute("ROLLBACK")
+                    return None
+                self._db.execute(
+                    "INSERT OR REPLACE INTO buckets (source, tokens, updated) VALUES (?, ?, ?)", (source, tokens - 1, now)
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return wait
+
+
+class AdaptiveLimit:
+    """AIMD concurrency limit for one source in this process.
+
+    Starts at the maximum. Every successful request adds 1/limit (one slot per
+    `limit` successes); when errors and empty results exceed `threshold` of the
+    last `window` outcomes, the limit is multiplied by `decrease`, at most once per `cooldown`.
+    """
+
+    def __init__(self, source, maximum, minimum=MIN_CONCURRENCY, window=WINDOW, threshold=THRESHOLD,
+                 decrease=DECREASE, cooldown=COOLDOWN):
+        self.source = source
+        self.maximum = maximum
+        self.minimum = minimum
+        self.threshold = threshold
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.limit = float(maximum)
+        self.in_flight = 0
+        self._outcomes = deque(maxlen=window)
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout=MAX_WAIT):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            self.in_flight += 1
+            self._publish()
+            return True
+
+    def release(self, outcome=None):
+        """Free the slot; `outcome` is "ok", "empty", "error" or None (no request was made)."""
+        with self._cond:
+            self.in_flight -= 1
+            if outcome is not None:
+                self._adapt(outcome == "ok")
+            self._publish()
+            self._cond.notify_all()
+
+    def _adapt(self, succeeded):
+        self._outcomes.append(succeeded)
+        failure_rate = self._outcomes.count(False) / len(self._outcomes)
+        now = time.monotonic()
+        if (len(self._outcomes) == self._outcomes.maxlen and failure_rate > self.threshold
+                and now - self._last_decrease >= self.cooldown):
+            previous = self.limit
+            self.limit = max(self.minimum, self.limit * self.decrease)
+            self._last_decrease = now
+            # Η επόμενη μείωση θέλει νέα στοιχεία, όχι τα ίδια σφάλματα ξανά
+            self._outcomes.clear()
+            metrics.inc("rate_limit_decreases_total", source=self.source)
+            log.warning("%s: %d%% failed or empty, concurrency %.1f -> %.1f", self.source, failure_rate * 100, previous, self.limit)
+        elif succeeded:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def _publish(self):
+        metrics.set_gauge("rate_limit_concurrency", round(self.limit, 2), source=self.source)
+        metrics.set_gauge("rate_limit_in_flight", self.in_flight, source=self.source)
+
+
+class Outcome:
+    """What the caller saw: report(count) after the request, or an exception."""
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = None
+
+    def report(self, count):
+        self.value = "ok" if count else "empty"
+
+    def fail(self):
+        self.value = "error"
+
+
+class Limiter:
+    """Shared token bucket plus per-process adaptive concurrency, per marketplace."""
+
+    def __init__(self, buckets, sources=SOURCES, max_wait=MAX_WAIT):
+        self.buckets = buckets
+        self.max_wait = max_wait
+        self.limits = {source: AdaptiveLimit(source, MAX_CONCURRENCY.get(source, 4)) for source in sources}
+
+    def acquire(self, source):
+        """Block until `source` has a free slot and a token; raises Throttled past max_wait."""
+        started = time.monotonic()
+        limit = self.limits.get(source)
+        if limit is not None and not limit.acquire(self.max_wait):
+            metrics.inc("rate_limit_throttled_total", source=source, reason="concurrency")
+            raise Throttled(f"{source}: no free request slot within {self.max_wait:.0f}s")
+        slot_wait = time.monotonic() - started
+        try:
+            wait = self.buckets.take(source, max(0.0, self.max_wait - (time.monotonic() - started)))
+        except BaseException:
+            if limit is not None:
+                limit.release()
+            raise
+        if wait is None:
+            if limit is not None:
+                limit.release()
+            metrics.inc("rate_limit_throttled_total", source=source, reason="rate")
+            raise Throttled(f"{source}: rate limit of {self.buckets.rates.get(source)}/s exceeded")
+        if wait:
+            time.sleep(wait)
+        # Μετρά μόνο η πραγματική αναμονή (θέση ή token), όχι το transaction του bucket
+        if wait or slot_wait >= 0.001:
+            metrics.inc("rate_limit_delayed_total", source=source)
+            metrics.record_span("rate_limit", source, time.monotonic() - started)
+
+    def release(self, source, outcome):
+        limit = self.limits.get(source)
+        if limit is not None:
+            limit.release(outcome)
+        if outcome in ("error", "empty"):
+            metrics.inc("rate_limit_failures_total", source=source, outcome=outcome)
+
+
+@contextmanager
+def request(source):
+    """One request (page, region or whole search) to a marketplace within its limits.
+
+    The body reports what came back with outcome.report(count); an exception
+    counts as an error (a cancellation does not count at all). Does nothing when RATE_LIMIT=0.
+    """
+    outcome = Outcome()
+    if limiter is None:
+        yield outcome
+        return
+    limiter.acquire(source)
+    try:
+        yield outcome
+    except Exception:
+        outcome.value = "error"
+        raise
+    finally:
+        limiter.release(source, outcome.value)
+
+
+@asynccontextmanager
+async def request_async(source):
+    """request() for coroutines: the wait happens in a thread, not on the event loop.
+
+    Cancelling the coroutine while it waits does not stop the thread, so a
+    slot the thread gets after that is given back there and then.
+    """
+    outcome = Outcome()
+    if limiter is None:
+        yield outcome
+        return
+    lock = threading.Lock()
+    state = {"acquired": False, "abandoned": False}
+
+    def acquire():
+        limiter.acquire(source)
+        with lock:
+            if state["abandoned"]:
+                limiter.release(source, None)
+            else:
+                state["acquired"] = True
+
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, acquire)
+    except asyncio.CancelledError:
+        with lock:
+            state["abandoned"] = True
+            # Το thread πρόλαβε τη θέση αλλά το αποτέλεσμα δεν έφτασε στον coroutine
+            if state["acquired"]:
+                limiter.release(source, None)
+        raise
+    try:
+        yield outcome
+    except Exception:
+        outcome.value = "error"
+        raise
+    finally:
+        limiter.release(source, outcome.value)
+
+
+limiter = Limiter(SharedBuckets()) if RATE_LIMIT_ENABLED else None
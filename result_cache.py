@@ -0,0 +1,197 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import metrics
+
+
+SOURCES = ("skroutz", "vendora", "facebook")
+
+CACHE_ENABLED = os.environ.get('RESULT_CACHE', '1') == '1'
+CACHE_BACKEND = os.environ.get('RESULT_CACHE_BACKEND', 'memory')  # memory | sqlite
+CACHE_PATH = os.environ.get('RESULT_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'result_cache.sqlite3'))
+CACHE_MAX_PRODUCTS = int(os.environ.get('RESULT_CACHE_MAX_PRODUCTS', 50000))
+CACHE_TTL = {
+    source: float(os.environ.get(f'RESULT_CACHE_TTL_{source.upper()}', default))
+    for source, default in (("skroutz", 900), ("vendora", 900), ("facebook", 300))
+}
+# Πόσο μετά το TTL μπορεί ένα αποτέλεσμα να σερβιριστεί ως stale όσο ανανεώνεται στο παρασκήνιο
+CACHE_STALE_TTL = {
+    source: float(os.environ.get(f'RESULT_CACHE_STALE_TTL_{source.upper()}', 3600))
+    for source in SOURCES
+}
+
+
+def normalize_term(term):
+    """Case-fold, strip (Greek) accents and collapse whitespace: 'Κινητό  Τηλέφωνο' -> 'κινητο τηλεφωνο'."""
+    text = unicodedata.normalize('NFD', (term or '').casefold())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(text.split())
+
+
+def filter_by_price(items, min_price, max_price):
+    return [item for item in items if min_price <= item['price'] <= max_price]
+
+
+class CacheEntry:
+    __slots__ = ("items", "min_price", "max_price", "pages", "stored")
+
+    def __init__(self, items, min_price, max_price, pages, stored):
+        self.items = items
+        self.min_price = min_price
+        self.max_price = max_price
+        self.pages = pages
+        self.stored = stored
+
+    def covers(self, min_price, max_price, pages):
+        return self.min_price <= min_price and max_price <= self.max_price and pages <= self.pages
+
+
+class SQLiteBackend:
+    """On-disk copy of the cache so a restarted worker process starts warm."""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                source TEXT NOT NULL,
+                term TEXT NOT NULL,
+                min_price REAL NOT NULL,
+                max_price REAL NOT NULL,
+                pages INTEGER NOT NULL,
+                stored REAL NOT NULL,
+                items TEXT NOT NULL,
+                PRIMARY KEY (source, term)
+            )
+        """)
+        self._db.commit()
+
+    def get(self, source, term):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT items, min_price, max_price, pages, stored FROM results WHERE source = ? AND term = ?",
+                (source, term)
+            ).fetchone()
+        if row is None:
+            return None
+        return CacheEntry(json.loads(row[0]), row[1], row[2], row[3], row[4])
+
+    def stored(self, source, term):
+        """When the entry was stored, without loading its items."""
+        with self._lock:
+            row = self._db.execute("SELECT stored FROM results WHERE source = ? AND term = ?", (source, term)).fetchone()
+        return row[0] if row is not None else None
+
+    def put(self, source, term, entry):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (source, term, min_price, max_price, pages, stored, items) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (source, term, entry.min_price, entry.max_price, entry.pages, entry.stored, json.dumps(entry.items, ensure_ascii=False))
+            )
+            self._db.commit()
+
+    def prune(self, source, older_than):
+        with self._lock:
+            self._db.execute("DELETE FROM results WHERE source = ? AND stored < ?", (source, older_than))
+            self._db.commit()
+
+
+class ResultCache:
+    """Per-source search results keyed on the normalized term, with TTL and LRU eviction.
+
+    Entries remember the price window and page count they were scraped with;
+    any narrower window is served from them by filtering, without re-scraping.
+    Past the (soft) TTL an entry is still served, marked stale, until
+    `stale_ttl` more seconds have gone by. A `scope` (e.g. the Facebook
+    locations) keeps results of the same term apart when they differ by more than price.
+    """
+
+    def __init__(self, ttl=CACHE_TTL, stale_ttl=CACHE_STALE_TTL, max_products=CACHE_MAX_PRODUCTS, backend=None):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_products = max_products
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._products = 0
+
+    def _max_age(self, source):
+        return self.ttl.get(source, 0) + self.stale_ttl.get(source, 0)
+
+    def _usable(self, source, entry):
+        return time.time() - entry.stored < self._max_age(source)
+
+    def _evict(self):
+        while self._products > self.max_products and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._products -= len(entry.items)
+            metrics.inc("result_cache_evictions_total")
+        metrics.set_gauge("result_cache_products", self._products)
+        metrics.set_gauge("result_cache_entries", len(self._entries))
+
+    def _remember(self, key, entry):
+        """Insert into the in-memory LRU (caller holds the lock)."""
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._products -= len(previous.items)
+        self._entries[key] = entry
+        self._products += len(entry.items)
+        self._evict()
+
+    @staticmethod
+    def _key(source, term, scope):
+        term = normalize_term(term)
+        return (source, f"{term}@{scope}" if scope else term)
+
+    def lookup(self, source, term, min_price, max_price, pages=1, scope=None):
+        """(items, stale) for the price window, or None on a miss."""
+        key = self._key(source, term, scope)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None and self.backend is not None:
+            entry = self.backend.get(*key)
+            if entry is not None and self._usable(source, entry):
+                with self._lock:
+                    self._remember(key, entry)
+
+        if entry is None or not self._usable(source, entry) or not entry.covers(min_price, max_price, pages):
+            metrics.inc("result_cache_misses_total", source=source)
+            return None
+        stale = time.time() - entry.stored >= self.ttl.get(source, 0)
+        metrics.inc("result_cache_stale_hits_total" if stale else "result_cache_hits_total", source=source)
+        return filter_by_price(entry.items, min_price, max_price), stale
+
+    def age(self, source, term, scope=None):
+        """Seconds since the entry for `term` was stored, or None when there is no entry."""
+        key = self._key(source, term, scope)
+        with self._lock:
+            entry = self._entries.get(key)
+        stored = entry.stored if entry is not None else None
+        if stored is None and self.backend is not None:
+            stored = self.backend.stored(*key)
+        return None if stored is None else time.time() - stored
+
+    def store(self, source, term, min_price, max_price, items, pages=1, scope=None):
+        key = self._key(source, term, scope)
+        entry = CacheEntry(items, min_price, max_price, pages, time.time())
+        with self._lock:
+            self._remember(key, entry)
+        if self.backend is not None:
+            self.backend.put(key[0], key[1], entry)
+            self.backend.prune(source, time.time() - self._max_age(source))
+
+
+def create_cache():
+    backend = SQLiteBackend(CACHE_PATH) if CACHE_BACKEND == 'sqlite' else None
+    return ResultCache(backend=backend)
+
+
+cache = create_cache() if CACHE_ENABLED else None
@@ -0,0 +1,234 @@
+import threading
+from array import array
+from operator import itemgetter
+from typing import NamedTuple, Optional
+
+from dedup import DedupIndex
+
+
+SOURCES = ("skroutz", "vendora", "facebook")
+# Κωδικός (θέση στο SOURCES) ανά πηγή, για τη στήλη sources του ProductBatch
+SOURCE_CODES = {source: code for code, source in enumerate(SOURCES)}
+
+
+class Product(NamedTuple):
+    """One listing as the scrapers produce it; still unpacks as (title, price, link, image)."""
+    title: str
+    price: float
+    link: str
+    image: Optional[str] = None
+
+
+class ProductBatch:
+    """Products of one or more sources as columns, from extraction to serialization.
+
+    Prices are a float array and sources a byte array of SOURCE_CODES, so a
+    batch holds four lists and two arrays instead of one dict per product,
+    and sorting compares floats from the price column. Output dicts are only
+    built by records(), at the point they are serialized.
+    """
+
+    __slots__ = ("titles", "prices", "links", "images", "sources")
+
+    def __init__(self, titles=None, prices=None, links=None, images=None, sources=None):
+        self.titles = titles if titles is not None else []
+        self.prices = prices if prices is not None else array('d')
+        self.links = links if links is not None else []
+        self.images = images if images is not None else []
+        self.sources = sources if sources is not None else array('B')
+
+    @classmethod
+    def from_products(cls, source, products):
+        """Batch of one source's (title, price, link, image) products."""
+        if not products:
+            return cls()
+        titles, prices, links, images = zip(*products)
+        return cls(list(titles), array('d', prices), list(links), list(images),
+                   array('B', [SOURCE_CODES[source]]) * len(titles))
+
+    @classmethod
+    def from_records(cls, records):
+        """Batch of output dicts (records(), cached or worker items)."""
+        batch = cls()
+        for record in records:
+            batch.append(record["source"], record["title"], record["price"], record["link"], record.get("imageUrl"))
+        return batch
+
+    def append(self, source, title, price, link, image=None):
+        self.titles.append(title)
+        self.prices.append(price)
+        self.links.append(link)
+        self.images.append(image)
+        self.sources.append(SOURCE_CODES[source])
+
+    def copy(self):
+        return ProductBatch(list(self.titles), array('d', self.prices), list(self.links), list(self.images), array('B', self.sources))
+
+    def products(self):
+        """Rows as Product tuples (without the source)."""
+        return [Product(*row) for row in zip(self.titles, self.prices, self.links, self.images)]
+
+    @classmethod
+    def concat(cls, batches):
+        merged = cls()
+        for batch in batches:
+            merged.titles.extend(batch.titles)
+            merged.prices.extend(batch.prices)
+            merged.links.extend(batch.links)
+            merged.images.extend(batch.images)
+            merged.sources.extend(batch.sources)
+        return merged
+
+    def __len__(self):
+        return len(self.prices)
+
+    def source(self, index):
+        return SOURCES[self.sources[index]]
+
+    def take(self, indices):
+        """A new batch with the rows at `indices`, in that order."""
+        indices = list(indices)
+        if len(indices) < 2:
+            # Το itemgetter με ένα όρισμα επιστρέφει το στοιχείο, όχι tuple
+            pick = lambda column: [column[index] for index in indices]
+        else:
+            pick = itemgetter(*indices)
+        return ProductBatch(
+            list(pick(self.titles)),
+            array('d', pick(self.prices.tolist())),
+            list(pick(self.links)),
+            list(pick(self.images)),
+            array('B', pick(self.sources.tolist())),
+        )
+
+    def sorted_by_price(self):
+        """Stable sort on the price column (ties keep source order, as the dict sort did)."""
+        # Η λίστα δίνει τα floats χωρίς νέο αντικείμενο ανά σύγκριση, σε αντίθεση με το array
+        prices = self.prices.tolist()
+        return self.take(sorted(range(len(prices)), key=prices.__getitem__))
+
+    def drop_near_duplicates(self, index=None):
+        """Keep the first of each group of cross-source duplicates (see dedup.drop_near_duplicates)."""
+        index = index if index is not None else DedupIndex()
+        kept = []
+        for row, (title, price, code) in enumerate(zip(self.titles, self.prices, self.sources)):
+            if index.add_unless_near_duplicate(SOURCES[code], title, price):
+                kept.append(row)
+        return self if len(kept) == len(self.prices) else self.take(kept)
+
+    def columns(self):
+        """Parallel lists under the records() keys; sources as codes into SOURCES."""
+        return {
+            "title": self.titles,
+            "price": self.prices.tolist(),
+            "link": self.links,
+            "source": self.sources.tolist(),
+            "imageUrl": self.images,
+        }
+
+    def records(self):
+        """Output dicts, as sent to clients."""
+        return [
+            {"title": title, "price": price, "link": link, "source": SOURCES[code], "imageUrl": image}
+            for title, price, link, image, code in zip(self.titles, self.prices, self.links, self.images, self.sources)
+        ]
+
+
+class ResultCollector:
+    """Products found by a single search, partitioned per source.
+
+    Each search creates its own collector and hands it to the scrapers, so
+    several searches can run in one process without sharing state. Adding is
+    thread-safe and a link is accepted once, compared on its canonical form
+    (tracking params stripped, item id) in an index shared by all sources.
+    A collector for one part of a search (a page, a region) takes the search's
+    collector as `parent`, so closing the parent stops it too.
+    """
+
+    def __init__(self, sources=SOURCES, parent=None):
+        self._lock = threading.Lock()
+        self._parent = parent
+        self._products = {source: ProductBatch() for source in sources}
+        self._waits = {source: 0.0 for source in sources}
+        self._spans = {}
+        self._closed = set()
+        self._errors = {}
+        self._index = DedupIndex()
+
+    def add(self, source, title, price, link, image=None):
+        """Add a product unless its link was already collected or the source is closed; returns whether it was added."""
+        with self._lock:
+            if source in self._closed or not self._index.add_link(link):
+                return False
+            self._index.add_image(image)
+            self._products.setdefault(source, ProductBatch()).append(source, title, price, link, image)
+            return True
+
+    def extend(self, source, products):
+        """Add (title, price, link, image) tuples; returns how many were new."""
+        return sum(self.add(source, *product) for product in products)
+
+    def has_link(self, link):
+        with self._lock:
+            return self._index.has_link(link)
+
+    def has_image(self, url):
+        """Whether a collected product already uses this image."""
+        with self._lock:
+            return self._index.has_image(url)
+
+    def close(self, source):
+        """Stop accepting products for a source (e.g. once its deadline has passed)."""
+        with self._lock:
+            self._closed.add(source)
+
+    def is_closed(self, source):
+        """Scrapers check this between pages/scrolls to stop early after a deadline."""
+        with self._lock:
+            if source in self._closed:
+                return True
+        return self._parent is not None and self._parent.is_closed(source)
+
+    def fail(self, source, message):
+        """Record why a source failed; the first error is kept."""
+        with self._lock:
+            self._errors.setdefault(source, message)
+
+    def error(self, source):
+        with self._lock:
+            return self._errors.get(source)
+
+    def add_wait(self, source, seconds):
+        with self._lock:
+            self._waits[source] = self._waits.get(source, 0.0) + seconds
+
+    def wait_seconds(self, source):
+        with self._lock:
+            return self._waits.get(source, 0.0)
+
+    def add_span(self, source, phase, seconds):
+        with self._lock:
+            phases = self._spans.setdefault(source, {})
+            phases[phase] = phases.get(phase, 0.0) + seconds
+
+    def span_seconds(self, source):
+        """Seconds spent per phase (page_load, scroll, extract, ...) by a source."""
+        with self._lock:
+            return dict(self._spans.get(source, {}))
+
+    def count(self, source):
+        with self._lock:
+            return len(self._products.get(source, ()))
+
+    def products(self, source):
+        """Snapshot of a source's products in insertion order."""
+        with self._lock:
+            batch = self._products.get(source)
+            return batch.products() if batch is not None else []
+
+    def batch(self, source):
+        """Snapshot of a source's products as a ProductBatch."""
+        with self._lock:
+            batch = self._products.get(source)
+            return batch.copy() if batch is not None else ProductBatch()
+
@@ -1,85 +1,403 @@
 from flask import Flask, request, jsonify, stream_with_context, Response
 from flask_cors import CORS
-import subprocess
-import threading
 import os
-import sys
 import json
-import traceback
+import time
+import threading
+
+import coalesce
+import dedup
+import jobs
+import listing_index
+import logs
+import metrics
+import prewarm
+import result_cache
+import urls
+import worker_pool
+from results import ProductBatch, SOURCES
 
 app = Flask(__name__)
 CORS(app)
 
-current_process = None
-process_lock = threading.Lock()
+logs.configure()
+log = logs.get_logger("api")
+
+def internal_client(kind, search_term):
+    """Client id of a search the front end starts itself; jobs never supersede these."""
+    return f"{jobs.INTERNAL_CLIENT_PREFIX}{kind}:{result_cache.normalize_term(search_term)}"
+
+
+def client_id():
+    """Identity used for superseding a client's own previous search, or None.
+
+    Only an explicit ?clientId= or X-Client-Id counts: clients behind the same
+    proxy or NAT share an address and would cancel each other's searches.
+    """
+    return request.args.get('clientId') or request.headers.get('X-Client-Id') or None
+
+
+STREAM_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'sse': 'text/event-stream'
+}
+# One object of parallel arrays (title[], price[], ...) instead of an object per product
+COLUMNAR_MIMETYPE = 'application/vnd.scraper.columnar+json'
+OUTPUT_FORMATS = ('json', 'ndjson', 'sse', 'columnar')
+
+
+def output_format():
+    """'json' (a single array), 'ndjson'/'sse' (incremental) or 'columnar', from ?format=, ?stream= or Accept."""
+    requested = (request.args.get('format') or request.args.get('stream') or '').lower()
+    if requested in OUTPUT_FORMATS:
+        return requested
+    accept = request.headers.get('Accept', '')
+    if 'text/event-stream' in accept:
+        return 'sse'
+    if 'application/x-ndjson' in accept:
+        return 'ndjson'
+    if COLUMNAR_MIMETYPE in accept:
+        return 'columnar'
+    return 'json'
+
+
+def encode_record(record, mode):
+    # A worker record that arrived as JSON and was not changed here is forwarded as received
+    line = getattr(record, 'raw', None) or json.dumps(record, ensure_ascii=False)
+    if mode == 'sse':
+        return f"event: {record.get('type', 'message')}\ndata: {line}\n\n"
+    return line + "\n"
+
+
+def overloaded_response(error):
+    response = jsonify({"error": str(error)})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+SEARCH_MODES = ('live', 'index')
+# Each page is another request to every marketplace, inside its rate limit
+MAX_PAGES = int(os.environ.get('SEARCH_MAX_PAGES', 5))
+
+# Sources whose results depend on the requested location
+LOCATED_SOURCES = ("facebook",)
+
+
+def cacheable(sort):
+    """Results in a non-default order are a different page set, so they bypass the cache."""
+    return result_cache.cache is not None and sort in (None, "relevance")
+
+
+def cache_scope(source, locations):
+    """Location-bound sources are cached per set of locations; the others ignore them."""
+    if source not in LOCATED_SOURCES:
+        return None
+    return ",".join(locations or [urls.DEFAULT_LOCATION])
+
+
+def start_search(client, search_term, max_pages, sources, scrape_window, budget_ms=None, sort=None, locations=None):
+    """Attach to an identical in-flight search, or start one that fills the cache.
+
+    The budget is part of the identity: a budgeted search must not wait on an
+    unbudgeted flight, and an unbudgeted one must not get deadline-truncated sources.
+    """
+    key = (result_cache.normalize_term(search_term), max_pages, tuple(sources), scrape_window, sort, tuple(locations or ()), budget_ms)
+
+    def store(record):
+        # Empty batches are usually blocks or scraper errors, and partial ones would pass for complete
+        # (a source cut off by the budget comes back partial or timed_out, never complete)
+        if (cacheable(sort) and record.get("type") == "products" and record.get("items")
+                and record.get("status", "complete") == "complete"):
+            result_cache.cache.store(record["source"], search_term, scrape_window[0], scrape_window[1], record["items"], max_pages,
+                                     scope=cache_scope(record["source"], locations))
+
+    params = {
+        "searchTerm": search_term,
+        "minPrice": str(scrape_window[0]),
+        "maxPrice": str(scrape_window[1]),
+        "maxPages": str(max_pages),
+        "sources": list(sources)
+    }
+    if budget_ms is not None:
+        params["budgetMs"] = budget_ms
+    if sort is not None:
+        params["sort"] = sort
+    if locations:
+        params["locations"] = list(locations)
+    return coalesce.flights.run(key, client, params, on_record=store)
+
+
+def refresh_in_background(search_term, max_pages, sources, locations=None):
+    """Stale-while-revalidate: re-scrape stale sources without holding up the response."""
+    def refresh():
+        try:
+            flight = start_search(internal_client("refresh", search_term), search_term, max_pages, sources, (0.0, float('inf')),
+                                  locations=locations)
+            metrics.inc("result_cache_refreshes_total")
+            for _ in flight.subscribe():
+                pass
+        except jobs.Overloaded:
+            metrics.inc("result_cache_refreshes_skipped_total")
+
+    threading.Thread(target=refresh, daemon=True).start()
+
+
+def refresh_index_term(query):
+    """Live search of a stale index term; the worker that scrapes it writes the results into the index."""
+    try:
+        flight = start_search(internal_client("index", query), query, 1, result_cache.SOURCES, (0.0, float('inf')))
+        for _ in flight.subscribe():
+            pass
+    except jobs.Overloaded:
+        metrics.inc("listing_index_refreshes_skipped_total")
+
+
+index_refresher = listing_index.Refresher(listing_index.index, refresh_index_term) if listing_index.index is not None else None
+if index_refresher is not None:
+    index_refresher.start()
+
+
+def prewarm_term(query, sources):
+    """One prewarm scrape into the result cache: {source: (status, count)} of the sources that ran."""
+    try:
+        flight = start_search(internal_client("prewarm", query), query, prewarm.PREWARM_PAGES, sources, (0.0, float('inf')))
+    except jobs.Overloaded:
+        return {}
+    results = {}
+    for record in flight.subscribe():
+        if record.get("type") == "products":
+            results[record["source"]] = (record.get("status", "complete"), len(record.get("items", [])))
+    return results
+
+
+def prewarm_age(source, query):
+    return result_cache.cache.age(source, query, scope=cache_scope(source, None))
+
+
+def create_prewarm_scheduler():
+    return prewarm.Scheduler(prewarm_stats or prewarm.TermStats(), prewarm_term, prewarm_age)
+
+
+# Opened here rather than when prewarm is imported, so only a process that counts searches opens the table
+prewarm_stats = prewarm.TermStats() if prewarm.PREWARM in ('inline', 'record') else None
+prewarm_scheduler = None
+if prewarm.PREWARM == 'inline' and result_cache.cache is not None:
+    prewarm_scheduler = create_prewarm_scheduler()
+    prewarm_scheduler.start()
+elif prewarm_stats is not None:
+    # The counts reach the prewarm process through the shared table
+    prewarm_stats.start_flushing()
+
+
+def search_records(flight, min_price, max_price, cached, pending=(), deadline=None, timings=False):
+    """Cached sources first, then the flight's records as they arrive, then one summary.
+
+    A listing cross-posted on several sources is only sent with the first one.
+    Sources in `pending` that have not reported by `deadline` are summarized as timed_out.
+    With `timings`, each source's summary carries its per-phase times (phasesMs).
+    """
+    started = time.monotonic()
+    sources = {}
+    seen = dedup.DedupIndex()
+
+    for source, items in cached.items():
+        items = dedup.drop_near_duplicates(items, seen)
+        sources[source] = {"status": "complete", "count": len(items), "elapsedMs": 0, "cached": True}
+        yield {"type": "products", "source": source, "items": items, "status": "complete", "cached": True}
+
+    if flight is not None:
+        for reply in flight.subscribe(deadline):
+            if reply.get("type") == "error":
+                yield reply
+                return
+            if reply.get("type") != "products":
+                continue
+
+            # Records are shared between coalesced requests, so each one filters a copy
+            received = reply.get("items", [])
+            items = result_cache.filter_by_price(received, min_price, max_price)
+            items = dedup.drop_near_duplicates(items, seen)
+            sources[reply.get("source")] = {
+                "status": reply.get("status", "complete"),
+                "count": len(items),
+                "elapsedMs": reply.get("elapsedMs"),
+                "waitMs": reply.get("waitMs")
+            }
+            if timings and reply.get("phasesMs"):
+                sources[reply.get("source")]["phasesMs"] = reply["phasesMs"]
+            # Both filters only drop items, so an equal count means the record is unchanged
+            yield reply if len(items) == len(received) else dict(reply, items=items)
+
+    for source in pending:
+        if source not in sources:
+            sources[source] = {"status": "timed_out", "count": 0, "elapsedMs": int((time.monotonic() - started) * 1000)}
+
+    yield {
+        "type": "summary",
+        "count": sum(summary["count"] for summary in sources.values()),
+        "elapsedMs": int((time.monotonic() - started) * 1000),
+        "sources": sources
+    }
+
 
 @app.route('/search', methods=['GET'])
 def search_products():
-    global current_process
-
+    started = time.monotonic()
     search_term = request.args.get('searchTerm', '')
-    min_price = request.args.get('minPrice', 0)
-    max_price = request.args.get('maxPrice', 10000)
-    max_pages = request.args.get('maxPages', 1)
+    max_pages = request.args.get('maxPages', 1, type=int)
+    if not 1 <= max_pages <= MAX_PAGES:
+        return jsonify({"error": f"maxPages must be between 1 and {MAX_PAGES}"}), 400
+    try:
+        min_price = float(request.args.get('minPrice', 0))
+        max_price = float(request.args.get('maxPrice', 10000))
+    except ValueError:
+        return jsonify({"error": "Invalid prices provided"}), 400
+    # Optional latency budget: sources that miss it come back partial/timed_out instead of holding the response
+    budget_ms = request.args.get('budgetMs', type=int)
+    if budget_ms is not None and budget_ms <= 0:
+        return jsonify({"error": "budgetMs must be a positive number of milliseconds"}), 400
+    deadline = started + budget_ms / 1000 if budget_ms is not None else None
+    sort = request.args.get('sort')
+    if sort is not None and sort not in urls.SORT_ORDERS:
+        return jsonify({"error": f"sort must be one of {', '.join(urls.SORT_ORDERS)}"}), 400
+    # Facebook location(s); several comma-separated cities are searched in parallel and merged
+    location = request.args.get('location')
+    locations = urls.parse_locations(location) or None
+    if location is not None and locations is None:
+        return jsonify({"error": "location must name at least one city"}), 400
+    # Optional per-source phase timings in the summary (and the envelope form of a plain response)
+    timings = request.args.get('timings', '').lower() in ('1', 'true', 'yes')
+    # live: the marketplaces (through the result cache); index: only the local listing index, no scraping
+    search_mode = request.args.get('mode', 'live').lower()
+    if search_mode not in SEARCH_MODES:
+        return jsonify({"error": f"mode must be one of {', '.join(SEARCH_MODES)}"}), 400
+    if search_mode == 'index' and listing_index.index is None:
+        return jsonify({"error": "The listing index is disabled"}), 404
 
-    print(f"Received search request: Term={search_term}, Min Price={min_price}, Max Price={max_price}")
+    log.info("Received search request: term=%r min=%s max=%s", search_term, min_price, max_price)
+    if prewarm_stats is not None:
+        # Every variant (pages, sort, location) counts for the term; prewarming fills the default one
+        prewarm_stats.record(search_term)
+
+    cached = {}
+    stale = []
+    if search_mode == 'index':
+        # Index results go out like cache hits: per source, complete, already in price order
+        with metrics.span("index_lookup", "api"):
+            cached = listing_index.index.search(search_term, min_price, max_price)
+    elif cacheable(sort):
+        with metrics.span("cache_lookup", "api"):
+            for source in result_cache.SOURCES:
+                hit = result_cache.cache.lookup(source, search_term, min_price, max_price, max_pages,
+                                                scope=cache_scope(source, locations))
+                if hit is not None:
+                    cached[source] = hit[0]
+                    if hit[1]:
+                        stale.append(source)
+    missing = [] if search_mode == 'index' else [source for source in result_cache.SOURCES if source not in cached]
+
+    # The price window is pushed into the marketplaces' own filters; the cache entry remembers
+    # it, so narrower ranges later are still served from the cache
+    scrape_window = (min_price, max_price)
+
+    flight = None
+    if missing:
+        try:
+            # Only this client's previous (superseded) search is cancelled
+            flight = start_search(client_id(), search_term, max_pages, missing, scrape_window, budget_ms, sort, locations)
+        except jobs.Overloaded as e:
+            return overloaded_response(e)
+    if stale:
+        refresh_in_background(search_term, max_pages, stale, locations)
+
+    fmt = output_format()
+    mode = fmt if fmt in STREAM_MIMETYPES else None
 
     @stream_with_context
     def generate():
-        global current_process
         try:
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            scraper_path = os.path.join(script_dir, 'project.py')
-
-            # Kill previous process if running
-            with process_lock:
-                if current_process:
-                    try:
-                        print("Killing previous process...")
-                        current_process.kill()
-                    except Exception as e:
-                        print(f"Error killing previous process: {e}")
-                    finally:
-                        current_process = None
-
-                current_process = subprocess.Popen(
-                    [sys.executable, scraper_path, search_term, str(min_price), str(max_price), str(max_pages)],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    encoding='utf-8'
-                )
-
-            stdout, stderr = current_process.communicate()
-            return_code = current_process.returncode
-
-            print("Subprocess STDOUT:", stdout)
-            print("Subprocess STDERR:", stderr)
-            print("Subprocess Return Code:", return_code)
-
-            with process_lock:
-                current_process = None
-
-            if return_code != 0:
-                yield json.dumps({"error": f"Subprocess failed with code {return_code}: {stderr}"}, ensure_ascii=False) + "\n"
-                return
+            products = []
+            summary = None
+            for record in search_records(flight, min_price, max_price, cached, missing, deadline, timings):
+                if record.get("type") == "error":
+                    log.warning("Search error: %s", record.get('error'))
+                    error = {"error": f"Scraper failed: {record.get('error')}"}
+                    yield encode_record(dict(error, type="error"), mode) if mode else json.dumps(error, ensure_ascii=False) + "\n"
+                    return
 
-            try:
-                products = json.loads(stdout)
-                yield json.dumps(products, ensure_ascii=False) + "\n"
-            except json.JSONDecodeError as e:
-                print(f"JSON Decode Error: {e}")
-                print(f"Raw output: {stdout}")
-                yield json.dumps({"error": "Invalid JSON returned from scraper"}, ensure_ascii=False) + "\n"
-                return
+                if mode:
+                    # Forward every record as soon as it is available
+                    if record.get("type") == "summary" and flight is not None and flight.job is not None:
+                        record["jobId"] = flight.job.id
+                    yield encode_record(record, mode)
+                elif record.get("type") == "products":
+                    products.extend(record.get("items", []))
+                elif record.get("type") == "summary":
+                    summary = record
+
+            if not mode:
+                batch = ProductBatch.from_records(products).sorted_by_price()
+                with metrics.span("serialize", "api"):
+                    if fmt == 'columnar':
+                        # Sources are codes into sourceNames; the summary is always included
+                        body = json.dumps({
+                            "count": len(batch),
+                            "budgetMs": budget_ms,
+                            "elapsedMs": int((time.monotonic() - started) * 1000),
+                            "sources": summary["sources"] if summary else {},
+                            "sourceNames": SOURCES,
+                            "columns": batch.columns()
+                        }, ensure_ascii=False) + "\n"
+                    elif budget_ms is None and not timings:
+                        body = json.dumps(batch.records(), ensure_ascii=False) + "\n"
+                    else:
+                        # With a budget the client needs to know which sources are incomplete
+                        body = json.dumps({
+                            "products": batch.records(),
+                            "budgetMs": budget_ms,
+                            "elapsedMs": int((time.monotonic() - started) * 1000),
+                            "sources": summary["sources"] if summary else {}
+                        }, ensure_ascii=False) + "\n"
+                yield body
+
+        except worker_pool.WorkerUnavailable as e:
+            yield json.dumps({"error": str(e)}, ensure_ascii=False) + "\n"
+            return
 
         except Exception as e:
-            print("Unhandled exception in generate():")
-            traceback.print_exc()
+            log.exception("Unhandled exception in generate()")
             yield json.dumps({"error": str(e)}, ensure_ascii=False) + "\n"
             return
 
-    return Response(generate(), mimetype='application/json')
+    mimetype = COLUMNAR_MIMETYPE if fmt == 'columnar' else STREAM_MIMETYPES.get(mode, 'application/json')
+    response = Response(generate(), mimetype=mimetype)
+    if mode:
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+    if flight is not None and flight.job is not None:
+        response.headers['X-Job-Id'] = flight.job.id
+    return response
+
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    return jsonify(metrics.snapshot())
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus text format: this process plus every scraper worker (labelled worker="N")."""
+    snapshots = [({"process": "api"}, metrics.snapshot())]
+    snapshots.extend(({"process": "worker", **labels}, snapshot) for labels, snapshot in worker_pool.pool.metrics())
+    return Response(metrics.prometheus(snapshots), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/health', methods=['GET'])
+def health():
+    status = worker_pool.pool.health()
+    healthy = all(worker["alive"] for worker in status["workers"])
+    return jsonify(status), (200 if healthy else 503)
 
 
 if __name__ == '__main__':
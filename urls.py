@@ -0,0 +1,91 @@
+import os
+import math
+from urllib.parse import urlencode, quote
+
+
+# Base URLs των πηγών (μπορούν να δείχνουν σε τοπικό fixture site για δοκιμές)
+SKROUTZ_BASE_URL = os.environ.get('SKROUTZ_BASE_URL', 'https://www.skroutz.gr')
+VENDORA_BASE_URL = os.environ.get('VENDORA_BASE_URL', 'https://vendora.gr')
+FACEBOOK_BASE_URL = os.environ.get('FACEBOOK_BASE_URL', 'https://www.facebook.com')
+
+# Πόλη του Facebook Marketplace όταν το request δεν ορίζει τοποθεσία
+DEFAULT_LOCATION = os.environ.get('FACEBOOK_LOCATION', 'athens')
+# Μέγιστος αριθμός πόλεων σε ένα multi-region search
+MAX_LOCATIONS = int(os.environ.get('FACEBOOK_MAX_LOCATIONS', 8))
+
+# relevance = η προεπιλεγμένη σειρά κάθε marketplace (χωρίς param)
+SORT_ORDERS = ("relevance", "price_asc", "price_desc", "newest")
+
+SKROUTZ_SORTS = {
+    "price_asc": ("price", "asc"),
+    "price_desc": ("price", "desc"),
+    "newest": ("created_at", "desc"),
+}
+VENDORA_SORTS = {
+    "price_asc": "price_asc",
+    "price_desc": "price_desc",
+    "newest": "newest",
+}
+FACEBOOK_SORTS = {
+    "price_asc": "price_ascend",
+    "price_desc": "price_descend",
+    "newest": "creation_time_descend",
+}
+
+
+def price_bounds(min_price, max_price):
+    """Whole-euro bounds rounded outwards, or None where there is no bound to push."""
+    low = math.floor(min_price) if min_price is not None and min_price > 0 else None
+    high = math.ceil(max_price) if max_price is not None and math.isfinite(max_price) else None
+    return low, high
+
+
+def parse_locations(value):
+    """'Athens, thessaloniki,athens' -> ['athens', 'thessaloniki']; [] when nothing usable is given."""
+    locations = []
+    for location in (value or "").split(","):
+        location = location.strip().lower()
+        if location and location not in locations:
+            locations.append(location)
+    return locations[:MAX_LOCATIONS]
+
+
+def build(base_url, path, params):
+    """Join base + path with the params that have a value."""
+    query = urlencode([(name, value) for name, value in params if value is not None])
+    return f"{base_url}{path}?{query}"
+
+
+def skroutz(search_term, page=1, min_price=None, max_price=None, sort=None):
+    low, high = price_bounds(min_price, max_price)
+    order_by, order_dir = SKROUTZ_SORTS.get(sort, (None, None))
+    return build(SKROUTZ_BASE_URL, "/skoop", [
+        ("keyphrase", search_term),
+        ("price_min", low),
+        ("price_max", high),
+        ("order_by", order_by),
+        ("order_dir", order_dir),
+        ("page", page if page > 1 else None),
+    ])
+
+
+def vendora(search_term, page=1, min_price=None, max_price=None, sort=None):
+    low, high = price_bounds(min_price, max_price)
+    return build(VENDORA_BASE_URL, "/items", [
+        ("q", search_term),
+        ("price_from", low),
+        ("price_to", high),
+        ("sort", VENDORA_SORTS.get(sort)),
+        ("page", page if page > 1 else None),
+    ])
+
+
+def facebook(search_term, location=DEFAULT_LOCATION, min_price=None, max_price=None, sort=None):
+    """Το Facebook δεν έχει σελίδες στο URL· η τοποθεσία είναι μέρος του path."""
+    low, high = price_bounds(min_price, max_price)
+    return build(FACEBOOK_BASE_URL, f"/marketplace/{quote(location, safe='')}/search", [
+        ("query", search_term),
+        ("minPrice", low),
+        ("maxPrice", high),
+        ("sortBy", FACEBOOK_SORTS.get(sort)),
+    ])
@@ -0,0 +1,109 @@
+import os
+import time
+import threading
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+
+import metrics
+
+
+# Μέγιστη διάρκεια (δευτερόλεπτα) μιας αναμονής ανά πηγή
+WAIT_LIMITS = {
+    source: float(os.environ.get(f'WAIT_MAX_{source.upper()}', default))
+    for source, default in (("skroutz", 2), ("vendora", 3), ("facebook", 5))
+}
+# Πόση ησυχία (χωρίς αλλαγές DOM και νέα αιτήματα δικτύου) σημαίνει ότι η σελίδα "κάθισε"
+IDLE_MS = int(os.environ.get('WAIT_IDLE_MS', 300))
+
+# Περιμένει μέσα στη σελίδα με MutationObserver: τελειώνει όταν υπάρχουν τουλάχιστον
+# minCount στοιχεία του selector και το DOM/δίκτυο μείνει ήσυχο για idleMs, ή στο maxMs.
+SETTLE_SCRIPT = """
+    const [selector, scrollTo, idleMs, maxMs, minCount] = arguments;
+    const done = arguments[arguments.length - 1];
+    const root = document.body || document.documentElement;
+    const count = () => document.querySelectorAll(selector).length;
+    const height = () => (document.body || document.documentElement).scrollHeight;
+    const resources = () => performance.getEntriesByType('resource').length;
+
+    const startCount = count();
+    const startHeight = height();
+    const started = performance.now();
+    let lastChange = started;
+    let lastResources = resources();
+
+    const observer = new MutationObserver(() => { lastChange = performance.now(); });
+    observer.observe(root, {childList: true, subtree: true});
+    if (scrollTo !== null) window.scrollTo(0, height() * scrollTo);
+
+    const timer = setInterval(() => {
+        const now = performance.now();
+        const currentResources = resources();
+        if (currentResources !== lastResources) {
+            lastResources = currentResources;
+            lastChange = now;
+        }
+        const current = count();
+        const settled = current >= minCount && now - lastChange >= idleMs;
+        const timedOut = now - started >= maxMs;
+        if (settled || timedOut) {
+            clearInterval(timer);
+            observer.disconnect();
+            done({
+                count: current,
+                grew: current > startCount || height() > startHeight,
+                waitedMs: Math.round(now - started),
+                timedOut: !settled
+            });
+        }
+    }, 50);
+"""
+
+# Κάθε πηγή ενός search τρέχει στο δικό της thread, οπότε ο χρόνος αναμονής αναφέρεται ανά thread
+_local = threading.local()
+
+
+def track(on_wait):
+    """Report every wait made by the current thread to on_wait(seconds); None stops reporting.
+
+    Returns the previous callback, so nested trackers can restore it.
+    """
+    previous = getattr(_local, "on_wait", None)
+    _local.on_wait = on_wait
+    return previous
+
+
+def _record(source, seconds):
+    on_wait = getattr(_local, "on_wait", None)
+    if on_wait is not None:
+        on_wait(seconds)
+    metrics.observe("scraper_wait_seconds", seconds, source=source)
+
+
+def settle(driver, source, selector, min_count=0, scroll_to=None, idle_ms=IDLE_MS, limit=None):
+    """Optionally scroll, then wait until `selector` matches `min_count` nodes and the page goes quiet.
+
+    Returns {"count", "grew", "waitedMs", "timedOut"}; never waits longer than the source's limit.
+    """
+    limit = WAIT_LIMITS.get(source, 5) if limit is None else limit
+    started = time.monotonic()
+    try:
+        driver.set_script_timeout(limit + 5)
+        return driver.execute_async_script(SETTLE_SCRIPT, selector, scroll_to, idle_ms, int(limit * 1000), min_count)
+    except Exception:
+        return {"count": 0, "grew": False, "waitedMs": int((time.monotonic() - started) * 1000), "timedOut": True}
+    finally:
+        _record(source, time.monotonic() - started)
+
+
+def until_gone(driver, source, element, limit=None):
+    """Wait until an element (e.g. a dismissed dialog) is hidden or removed."""
+    limit = WAIT_LIMITS.get(source, 5) if limit is None else limit
+    started = time.monotonic()
+    try:
+        WebDriverWait(driver, limit, poll_frequency=0.1).until(EC.invisibility_of_element(element))
+        return True
+    except TimeoutException:
+        return False
+    finally:
+        _record(source, time.monotonic() - started)
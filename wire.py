@@ -0,0 +1,108 @@
+import os
+import struct
+
+try:
+    import ujson as json
+except ImportError:
+    import json
+
+try:
+    import msgpack
+except ImportError:  # προαιρετικό: χωρίς αυτό το πρωτόκολλο μένει σε JSON
+    msgpack = None
+
+
+# auto (json) | msgpack (όπου είναι εγκατεστημένο, αλλιώς json) | json
+WIRE_FORMAT = os.environ.get('SCRAPER_WIRE_FORMAT', 'auto').lower()
+
+# Σε σειρά προτίμησης. Οι clients παίρνουν πάντα JSON: ένα JSON frame προωθείται όπως ήρθε (Record.raw),
+# ενώ ένα msgpack frame πρέπει να ξανακωδικοποιηθεί, οπότε το msgpack δεν κερδίζει τίποτα εκτός αν ζητηθεί ρητά
+FORMATS = ("json", "msgpack")
+CODES = {"json": b"j", "msgpack": b"m"}
+NAMES = {code: name for name, code in CODES.items()}
+
+# Μήκος payload, codec, μήκος του id· μετά το id (utf-8) και το payload
+HEADER = struct.Struct(">I1sH")
+
+
+class ProtocolError(Exception):
+    """The worker's output is not a valid frame; the stream cannot be resynchronized."""
+
+
+class Record(dict):
+    """A decoded message; `raw` is its JSON text when it arrived as JSON, else None.
+
+    The front end forwards `raw` to clients as is instead of encoding the record
+    again, so a Record must not be modified: derive a new one with dict(record, ...).
+    """
+    __slots__ = ("raw",)
+
+
+def available(fmt):
+    return fmt == "json" or (fmt == "msgpack" and msgpack is not None)
+
+
+def offered(preference=None):
+    """The formats this side proposes, best first (the front end passes them to each worker)."""
+    preference = (preference or WIRE_FORMAT).lower()
+    formats = FORMATS if preference == "auto" else (preference, "json")
+    return [fmt for fmt in dict.fromkeys(formats) if fmt in FORMATS and available(fmt)]
+
+
+def choose(proposed):
+    """The worker's side of the negotiation: the first proposed format it can speak."""
+    for fmt in proposed:
+        if fmt in FORMATS and available(fmt):
+            return fmt
+    return "json"
+
+
+def encode(message, fmt, message_id=None):
+    """One frame: header, routing id and the message in `fmt`."""
+    if fmt == "msgpack":
+        payload = msgpack.packb(message, use_bin_type=True)
+    else:
+        payload = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    key = (message_id or "").encode("utf-8")
+    return HEADER.pack(len(payload), CODES[fmt], len(key)) + key + payload
+
+
+def decode(code, payload):
+    fmt = NAMES.get(code)
+    if fmt == "msgpack" and msgpack is not None:
+        record = Record(msgpack.unpackb(payload, raw=False))
+        record.raw = None
+    elif fmt == "json":
+        text = payload.decode("utf-8")
+        record = Record(json.loads(text))
+        record.raw = text
+    else:
+        raise ProtocolError(f"Unsupported frame codec {code!r}")
+    return record
+
+
+def _read_exactly(stream, size):
+    data = stream.read(size)
+    if len(data) != size:
+        # EOF στη μέση ενός frame: η διεργασία τερμάτισε
+        return None
+    return data
+
+
+def read_frame(stream):
+    """(message_id or None, Record) of the next frame, or None at the end of the stream.
+
+    Each frame says its own codec, so the reader decodes whatever the worker chose.
+    """
+    header = _read_exactly(stream, HEADER.size)
+    if header is None:
+        return None
+    size, code, key_size = HEADER.unpack(header)
+    key = _read_exactly(stream, key_size) if key_size else b""
+    payload = _read_exactly(stream, size) if key is not None else None
+    if payload is None:
+        return None
+    try:
+        return key.decode("utf-8") or None, decode(code, payload)
+    except ValueError as e:
+        raise ProtocolError(f"Undecodable {NAMES.get(code, code)} frame: {e}") from e
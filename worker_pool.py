@@ -0,0 +1,372 @@
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import signal
+import itertools
+import threading
+import subprocess
+
+import logs
+import metrics
+import wire
+
+
+WORKER_COUNT = int(os.environ.get('SCRAPER_WORKERS', 2))
+HEALTH_INTERVAL = float(os.environ.get('SCRAPER_WORKER_HEALTH_INTERVAL', 10))
+PING_TIMEOUT = float(os.environ.get('SCRAPER_WORKER_PING_TIMEOUT', 5))
+STARTUP_TIMEOUT = float(os.environ.get('SCRAPER_WORKER_STARTUP_TIMEOUT', 120))
+JOB_TIMEOUT = float(os.environ.get('SCRAPER_JOB_TIMEOUT', 300))
+# Μετά από cancel, πόσο περιμένει το τέλος του job πριν τερματίσει τον worker
+CANCEL_TIMEOUT = float(os.environ.get('SCRAPER_CANCEL_TIMEOUT', 10))
+SHUTDOWN_TIMEOUT = float(os.environ.get('SCRAPER_WORKER_SHUTDOWN_TIMEOUT', 30))
+# Πόσο περιμένει το /metrics το snapshot κάθε worker
+METRICS_PING_TIMEOUT = float(os.environ.get('SCRAPER_WORKER_METRICS_TIMEOUT', 1))
+
+SCRAPER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'project.py')
+
+log = logs.get_logger("workers")
+
+# Μηνύματα που κλείνουν ένα job
+TERMINAL_TYPES = ("summary", "error")
+# Μπαίνει στην ουρά ενός job από το cancel(), για να ξυπνήσει το run()
+CANCELLING = object()
+
+
+class WorkerUnavailable(Exception):
+    """No worker could be leased within the wait time."""
+
+
+class Worker:
+    """A long-running `project.py --worker` process.
+
+    Jobs go in as JSON lines on its stdin; replies come back on its stdout as
+    wire frames, in the format the worker picked from the ones offered here.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.process = subprocess.Popen(
+            [sys.executable, SCRAPER_PATH, '--worker', f"--wire={','.join(wire.offered())}"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            # Δική του process group, ώστε το kill() να παίρνει μαζί geckodriver και Firefox
+            start_new_session=True
+        )
+        self.ready = threading.Event()
+        self.wire = None  # Η μορφή που διάλεξε ο worker (από το ready)
+        self.jobs = 0
+        self.last_pong = None
+        self.last_metrics = None  # Το snapshot των metrics του worker από το τελευταίο pong
+        self.dirty = False  # Έμεινε job στη μέση: ο worker πρέπει να αντικατασταθεί
+        self.exited = threading.Event()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending = {}
+        self._job = None  # Το id του search που τρέχει
+        self._ids = itertools.count(1)
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+    def alive(self):
+        return not self.exited.is_set() and self.process.poll() is None
+
+    def _read(self):
+        while True:
+            try:
+                frame = wire.read_frame(self.process.stdout)
+            except wire.ProtocolError as e:
+                # Μετά από ένα χαλασμένο frame τα όρια των επόμενων είναι άγνωστα: ο worker αντικαθίσταται
+                log.warning("Worker %d: %s", self.index, e)
+                self.kill()
+                break
+            if frame is None:
+                break
+            message_id, message = frame
+
+            if message.get("type") == "ready":
+                self.wire = message.get("wire")
+                self.ready.set()
+                continue
+
+            with self._lock:
+                replies = self._pending.get(message_id)
+            if replies is not None:
+                replies.put(message)
+
+        # EOF: η διεργασία τερμάτισε (το wait() εδώ τη μαζεύει, ώστε να μην το κάνει το kill)
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+        self.exited.set()
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for replies in pending:
+            replies.put({"type": "error", "error": "Worker process exited"})
+
+    def _write(self, message):
+        line = (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._write_lock:
+            self.process.stdin.write(line)
+            self.process.stdin.flush()
+
+    def request(self, message):
+        """Send a message; returns its id and the queue that receives the replies."""
+        message_id = f"{self.pid}-{next(self._ids)}"
+        replies = queue.Queue()
+        with self._lock:
+            self._pending[message_id] = replies
+        try:
+            self._write(dict(message, id=message_id))
+        except (OSError, ValueError):
+            replies.put({"type": "error", "error": "Worker process is not accepting jobs"})
+        return message_id, replies
+
+    def forget(self, message_id):
+        with self._lock:
+            self._pending.pop(message_id, None)
+
+    def ping(self, timeout=PING_TIMEOUT):
+        message_id, replies = self.request({"op": "ping"})
+        try:
+            reply = replies.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        finally:
+            self.forget(message_id)
+        if reply.get("type") != "pong":
+            return None
+        self.last_pong = time.time()
+        self.last_metrics = reply.get("metrics")
+        return reply
+
+    def run(self, params, timeout=JOB_TIMEOUT, cancelled=None):
+        """Run a search job and yield every reply until the terminal one.
+
+        Once `cancelled` (a threading.Event) is set and cancel() is called, the
+        job has CANCEL_TIMEOUT to end; after that the worker is marked dirty.
+        """
+        if not self.ready.wait(STARTUP_TIMEOUT):
+            self.dirty = True
+            yield {"type": "error", "error": "Worker did not start in time"}
+            return
+
+        self.jobs += 1
+        message_id, replies = self.request(dict(params, op="search"))
+        with self._lock:
+            self._job = message_id
+        # Ένα cancel πριν από το request δεν βρήκε job να σταματήσει
+        if cancelled is not None and cancelled.is_set():
+            self.cancel()
+        finished = False
+        cancelling = False
+        try:
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    reply = replies.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    if cancelling:
+                        yield {"type": "error", "error": "Search cancelled"}
+                    else:
+                        yield {"type": "error", "error": f"Search timed out after {timeout}s"}
+                    return
+                if reply is CANCELLING:
+                    cancelling = True
+                    deadline = min(deadline, time.monotonic() + CANCEL_TIMEOUT)
+                    continue
+                if reply.get("type") in TERMINAL_TYPES:
+                    finished = True
+                yield reply
+                if finished:
+                    return
+        finally:
+            with self._lock:
+                self._job = None
+            self.forget(message_id)
+            if not finished:
+                self.dirty = True
+
+    def cancel(self):
+        """Ask the worker to stop its current search early; the search still ends with a summary."""
+        with self._lock:
+            message_id = self._job
+            replies = self._pending.get(message_id) if message_id is not None else None
+        if replies is None:
+            return
+        try:
+            self._write({"op": "cancel", "job": message_id})
+        except (OSError, ValueError):
+            pass
+        replies.put(CANCELLING)
+
+    def stop(self):
+        """Ask the worker to finish its current job and exit."""
+        try:
+            self._write({"op": "shutdown"})
+            self.process.stdin.close()
+        except (OSError, ValueError):
+            pass
+
+    def kill(self):
+        """SIGKILL the worker's process group, browsers included; does not wait for it to exit."""
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except OSError:
+            # Η group δεν υπάρχει πια
+            pass
+
+
+class WorkerPool:
+    """N warm scraper workers with health checks and automatic restarts."""
+
+    def __init__(self, size=WORKER_COUNT):
+        self.size = size
+        self._workers = []
+        self._idle = []
+        self._cond = threading.Condition()
+        self._started = False
+        self._stopping = threading.Event()
+        self._monitor = None
+
+    def start(self):
+        with self._cond:
+            if self._started:
+                return
+            self._started = True
+            for index in range(self.size):
+                worker = Worker(index)
+                self._workers.append(worker)
+                self._idle.append(worker)
+            self._update_gauges()
+        self._monitor = threading.Thread(target=self._watch, daemon=True)
+        self._monitor.start()
+
+    def _update_gauges(self):
+        metrics.set_gauge("scraper_workers", len(self._workers))
+        metrics.set_gauge("scraper_workers_idle", len(self._idle))
+
+    def _replace(self, worker, reason):
+        """Kill a worker and start a fresh one in its slot (caller holds the lock).
+
+        Nothing here waits for the old process: its reader thread reaps it.
+        """
+        worker.kill()
+        log.warning("Restarting worker %d (pid %d): %s", worker.index, worker.pid, reason)
+        replacement = Worker(worker.index)
+        self._workers[worker.index] = replacement
+        metrics.inc("scraper_worker_restarts_total", reason=reason)
+        return replacement
+
+    def _watch(self):
+        while not self._stopping.wait(HEALTH_INTERVAL):
+            with self._cond:
+                workers = list(self._workers)
+            for worker in workers:
+                if worker.alive() and worker.ready.is_set() and worker.ping() is None:
+                    # Δεν απαντά: τον σκοτώνουμε και θα αντικατασταθεί παρακάτω ή στο release
+                    worker.kill()
+            with self._cond:
+                if self._stopping.is_set():
+                    return
+                for position, worker in enumerate(self._idle):
+                    if not worker.alive():
+                        self._idle[position] = self._replace(worker, "died")
+
+    def acquire(self, timeout=None):
+        if not self._started:
+            self.start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._idle:
+                if self._stopping.is_set():
+                    raise WorkerUnavailable("Worker pool is shutting down")
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise WorkerUnavailable(f"No scraper worker available after {timeout}s")
+                self._cond.wait(remaining)
+            worker = self._idle.pop()
+            if not worker.alive():
+                worker = self._replace(worker, "died")
+            self._update_gauges()
+            return worker
+
+    def release(self, worker):
+        with self._cond:
+            if self._stopping.is_set():
+                return
+            if worker.dirty:
+                worker = self._replace(worker, "cancelled")
+            elif not worker.alive():
+                worker = self._replace(worker, "died")
+            self._idle.append(worker)
+            self._update_gauges()
+            self._cond.notify()
+
+    def search(self, params, timeout=JOB_TIMEOUT, lease_timeout=None):
+        """Run a search on the next free worker, yielding its replies."""
+        worker = self.acquire(lease_timeout)
+        try:
+            metrics.inc("scraper_jobs_total")
+            yield from worker.run(params, timeout)
+        finally:
+            self.release(worker)
+
+    def health(self):
+        with self._cond:
+            workers = list(self._workers)
+            idle = len(self._idle)
+        return {
+            "size": self.size,
+            "idle": idle,
+            "workers": [{
+                "index": worker.index,
+                "pid": worker.pid,
+                "alive": worker.alive(),
+                "ready": worker.ready.is_set(),
+                "wire": worker.wire,
+                "jobs": worker.jobs,
+                "lastPong": worker.last_pong
+            } for worker in workers]
+        }
+
+    def metrics(self, timeout=METRICS_PING_TIMEOUT):
+        """(labels, snapshot) per worker, pinged now; a worker that does not answer in time reports its last snapshot."""
+        with self._cond:
+            workers = list(self._workers)
+        snapshots = []
+        for worker in workers:
+            if worker.alive() and worker.ready.is_set():
+                worker.ping(timeout)
+            if worker.last_metrics is not None:
+                snapshots.append(({"worker": str(worker.index)}, worker.last_metrics))
+        return snapshots
+
+    def shutdown(self, timeout=SHUTDOWN_TIMEOUT):
+        """Graceful shutdown: workers finish their current job, stragglers are killed."""
+        with self._cond:
+            if not self._started or self._stopping.is_set():
+                return
+            self._stopping.set()
+            workers = list(self._workers)
+            self._cond.notify_all()
+        for worker in workers:
+            worker.stop()
+        deadline = time.monotonic() + timeout
+        for worker in workers:
+            try:
+                worker.process.wait(timeout=max(0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                worker.kill()
+
+
+pool = WorkerPool()
+atexit.register(pool.shutdown)